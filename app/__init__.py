@@ -6,12 +6,25 @@ from rq import Queue
 from . import routes
 from .redis_client import analytics_redis
 from .logging_config import setup_logging
+from .utils import (
+    drain_ingest_buffer,
+    schedule_periodic_aggregations,
+    schedule_periodic_cleanup,
+    schedule_dictionary_training,
+    schedule_funnel_updates,
+    schedule_topk_trim
+)
+from .auth import apply_rate_limit_headers
+from .metrics import record_request_metrics, watch_queue
+from .tracing import begin_request_trace, apply_server_timing, finish_request_trace
+from .profiling import begin_request_profile, finish_request_profile
 
 # Configure logging before importing other modules
 logger = setup_logging()
 
 # Create the RQ queue for analytics background processing
 analytics_queue = Queue('analytics-processing-queue', connection=analytics_redis._redis)
+watch_queue(analytics_queue)
 
 # Create the Flask application for the Event Analytics Platform
 def create_app() -> Flask:
@@ -24,15 +37,46 @@ def create_app() -> Flask:
     # Register blueprint
     app.register_blueprint(routes.analytics_bp)
     
+    # Report rate limit state on every response
+    app.after_request(apply_rate_limit_headers)
+    
+    # Trace Redis usage per request: Server-Timing headers and /metrics
+    app.before_request(begin_request_trace)
+    app.after_request(apply_server_timing)
+    app.after_request(record_request_metrics)
+    app.teardown_request(finish_request_trace)
+    
+    # Sample the stacks of requests selected for profiling (X-Profile or PROFILE_SAMPLE_RATE)
+    app.before_request(begin_request_profile)
+    app.after_request(finish_request_profile)
+    
     # Attach Redis and RQ to app context
     app.analytics_redis = analytics_redis 
     app.analytics_queue = analytics_queue
     
+    # Kick off the self-rescheduling aggregation job (rollups, dashboard snapshot)
+    schedule_periodic_aggregations(analytics_queue)
+    
+    # Kick off the self-rescheduling retention job (drops expired event partitions)
+    schedule_periodic_cleanup(analytics_queue)
+    
+    # Periodically retrain the per-event_type compression dictionaries
+    schedule_dictionary_training(analytics_queue)
+    
+    # Fold closed event partitions into the registered funnels' incremental state
+    schedule_funnel_updates(analytics_queue)
+    
+    # Keep the top-K hour buckets within their capacity
+    schedule_topk_trim(analytics_queue)
+    
     # Register shutdown handler
     def cleanup_on_shutdown():
         """Clean up resources on application shutdown"""
         try:
             logger.info("Shutting down Analytics Platform...")
+            drained = drain_ingest_buffer()
+            if drained:
+                logger.info(f"Flushed {drained} buffered events")
             analytics_redis.close()
             logger.info("Redis connections closed")
         except Exception as e:
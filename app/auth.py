@@ -1,10 +1,19 @@
 import os
+import json
+import hmac
+import math
 import time
+import secrets
 import hashlib
 import logging
+import threading
+from collections import OrderedDict
 from functools import wraps
-from typing import Optional, Dict, Set
-from flask import request, jsonify, current_app
+from typing import Optional, Dict, List, Set, Tuple, NamedTuple
+from flask import request, jsonify, current_app, g
+
+from .redis_client import analytics_redis
+from .metrics import RATE_LIMIT_REJECTIONS
 
 logger = logging.getLogger(__name__)
 
@@ -16,66 +25,188 @@ class RateLimitError(Exception):
     """Exception raised for rate limit violations"""
     pass
 
-# Simple in-memory rate limiting (for production, use Redis)
+# Sliding-window counter rate limiter, evaluated atomically in Redis.
+# State per client is one hash holding the current window index and the request
+# counts of the current and previous windows, so each check is O(1) in time and
+# memory and limits are shared by every worker and host. The previous window's
+# count is weighted by how much of it still overlaps the sliding window.
+RATE_LIMIT_SCRIPT = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local index = math.floor(now / window)
+local elapsed = now - index * window
+
+local state = redis.call('HMGET', key, 'index', 'current', 'previous')
+local stored_index = tonumber(state[1])
+local current = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+if stored_index ~= index then
+    if stored_index == index - 1 then
+        previous = current
+    else
+        previous = 0
+    end
+    current = 0
+end
+
+local estimate = previous * (1 - elapsed / window) + current
+if estimate + 1 > limit then
+    local retry_after
+    if current + 1 <= limit and previous > 0 then
+        -- Wait until enough of the previous window slides out
+        retry_after = window * (1 - (limit - current - 1) / previous) - elapsed
+    else
+        -- Wait for the next window, then for enough of this one to slide out
+        retry_after = window - elapsed
+        if current > 0 and limit >= 1 then
+            retry_after = retry_after + math.max(window * (1 - (limit - 1) / current), 0)
+        end
+    end
+    return {0, 0, math.ceil(math.max(retry_after, 0.001) * 1000)}
+end
+
+current = current + 1
+redis.call('HSET', key, 'index', index, 'current', current, 'previous', previous)
+redis.call('PEXPIRE', key, window * 2000)
+return {1, math.floor(limit - estimate - 1), 0}
+"""
+
+class RateLimitResult(NamedTuple):
+    """Outcome of a rate limit check"""
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds until a request would be allowed (0 when allowed)
+
 class RateLimiter:
-    def __init__(self):
-        self.requests: Dict[str, list] = {}
-        self.cleanup_interval = 60  # seconds
-        self.last_cleanup = time.time()
+    """
+    Distributed sliding-window rate limiter backed by a single atomic Lua script.
+    Fails open (allows the request) if Redis is unavailable so that a Redis outage
+    does not take authentication down with it.
+    """
+    
+    def __init__(self, key_prefix: str = 'ratelimit'):
+        self.key_prefix = key_prefix
+        self._script = analytics_redis.register_script(RATE_LIMIT_SCRIPT)
+    
+    def check(self, key: str, limit: int, window: int) -> RateLimitResult:
+        """Count a request against the limit and return the outcome"""
+        try:
+            allowed, remaining, retry_after_ms = analytics_redis.run_script(
+                self._script,
+                keys=[f'{self.key_prefix}:{key}'],
+                args=[limit, window]
+            )
+            if not allowed:
+                RATE_LIMIT_REJECTIONS.inc()
+            return RateLimitResult(bool(allowed), limit, max(int(remaining), 0), int(retry_after_ms) / 1000)
+        except Exception as e:
+            logger.error(f"Rate limiter unavailable, allowing request for {key}: {e}")
+            return RateLimitResult(True, limit, limit, 0)
     
     def is_allowed(self, key: str, limit: int, window: int) -> bool:
         """Check if request is within rate limit"""
-        current_time = time.time()
-        
-        # Cleanup old entries periodically
-        if current_time - self.last_cleanup > self.cleanup_interval:
-            self._cleanup_old_entries(current_time, window)
-            self.last_cleanup = current_time
-        
-        # Get or create request list for this key
-        if key not in self.requests:
-            self.requests[key] = []
-        
-        # Remove old requests outside the window
-        self.requests[key] = [
-            req_time for req_time in self.requests[key]
-            if current_time - req_time < window
-        ]
-        
-        # Check if under limit
-        if len(self.requests[key]) >= limit:
-            return False
-        
-        # Add current request
-        self.requests[key].append(current_time)
-        return True
-    
-    def _cleanup_old_entries(self, current_time: float, window: int):
-        """Remove old entries to prevent memory growth"""
-        for key in list(self.requests.keys()):
-            self.requests[key] = [
-                req_time for req_time in self.requests[key]
-                if current_time - req_time < window
-            ]
-            # Remove empty lists
-            if not self.requests[key]:
-                del self.requests[key]
+        return self.check(key, limit, window).allowed
 
 # Global rate limiter instance
 rate_limiter = RateLimiter()
 
-# API Keys configuration
+# API key storage: keys live in Redis as HMAC-SHA256 digests so they can be
+# created and revoked without a redeploy; plaintext keys are never stored
+API_KEYS_HASH = 'api_keys'  # digest -> JSON key metadata
+API_KEY_IDS_HASH = 'api_keys:ids'  # key_id -> digest
+API_KEY_INVALIDATION_CHANNEL = 'api_keys:invalidate'
+API_KEY_HASH_SECRET = os.getenv('API_KEY_HASH_SECRET', 'dev-api-key-hash-secret').encode('utf-8')
+
+# In-process lookup cache so authentication normally costs no Redis round trip
+API_KEY_CACHE_SIZE = int(os.getenv('API_KEY_CACHE_SIZE', 1024))
+API_KEY_CACHE_TTL = float(os.getenv('API_KEY_CACHE_TTL', 60))  # seconds
+API_KEY_NEGATIVE_CACHE_TTL = float(os.getenv('API_KEY_NEGATIVE_CACHE_TTL', 10))  # seconds for invalid keys
+
+# Seconds the invalidation listener waits per poll; below the pool's 5s socket_timeout
+API_KEY_LISTENER_POLL_SECONDS = 1.0
+
+class _TTLCache:
+    """Small thread-safe LRU cache whose entries expire after a per-entry TTL"""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a lookup racing one does not cache a stale value
+        self.generation = 0
+    
+    def get(self, key: str) -> Tuple[bool, Optional[Dict]]:
+        """Return (hit, value); value is None for cached negative lookups"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+    
+    def put(self, key: str, value: Optional[Dict], ttl: float, generation: Optional[int] = None):
+        """
+        Store a value (or a negative result) for ttl seconds. With the generation
+        read before the value was loaded, nothing is stored if an invalidation ran since.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, key: Optional[str] = None):
+        """Drop one entry, or every entry when key is None"""
+        with self._lock:
+            self.generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
 class APIKeyManager:
+    """
+    API key store backed by Redis with an in-process TTL cache.
+    Revocations and new keys are broadcast over pub/sub so every process drops
+    its cached entry immediately; the cache TTL bounds staleness if a message is missed.
+    """
+    
     def __init__(self):
-        self.api_keys = self._load_api_keys()
+        self._cache = _TTLCache(API_KEY_CACHE_SIZE)
+        self._bootstrap_keys = self._load_api_keys()
+        self._listener: Optional[threading.Thread] = None
+        self._listener_pid: Optional[int] = None
+        self._listener_lock = threading.Lock()
+        self._seeded = False
+        self._seed_bootstrap_keys()
+    
+    @staticmethod
+    def hash_key(api_key: str) -> str:
+        """Keyed hash of an API key as stored in Redis"""
+        return hmac.new(API_KEY_HASH_SECRET, api_key.encode('utf-8'), hashlib.sha256).hexdigest()
+    
+    @staticmethod
+    def key_id_for(digest: str) -> str:
+        """Public identifier of a key, safe to log and use in admin endpoints"""
+        return digest[:16]
     
     def _load_api_keys(self) -> Dict[str, Dict]:
-        """Load API keys from environment or configuration"""
+        """Load bootstrap API keys from environment or configuration, indexed by digest"""
         # Default admin key from environment
         admin_key = os.getenv('ANALYTICS_ADMIN_KEY', 'dev-key-analytics-2024')
         
-        # In production, these would come from a database
-        return {
+        keys = {
             admin_key: {
                 'name': 'Admin Key',
                 'permissions': ['read', 'write', 'admin'],
@@ -90,14 +221,150 @@ class APIKeyManager:
                 'created_at': time.time()
             }
         }
+        
+        bootstrap = {}
+        for api_key, key_info in keys.items():
+            digest = self.hash_key(api_key)
+            bootstrap[digest] = {'key_id': self.key_id_for(digest), **key_info}
+        return bootstrap
+    
+    def _seed_bootstrap_keys(self):
+        """Store bootstrap keys in Redis unless they already exist (or were revoked)"""
+        try:
+            with analytics_redis.pipeline(transaction=False) as pipe:
+                for digest, key_info in self._bootstrap_keys.items():
+                    pipe.hsetnx(API_KEY_IDS_HASH, key_info['key_id'], digest)
+                results = pipe.execute()
+            
+            # Only write metadata for keys whose ID was new, so revoked bootstrap keys stay revoked
+            with analytics_redis.pipeline(transaction=False) as pipe:
+                for (digest, key_info), created in zip(self._bootstrap_keys.items(), results):
+                    if created:
+                        pipe.hset(API_KEYS_HASH, digest, json.dumps(key_info))
+                if len(pipe):
+                    pipe.execute()
+            self._seeded = True
+        except Exception as e:
+            logger.warning(f"Could not seed bootstrap API keys into Redis: {e}")
+    
+    def _ensure_listener(self):
+        """Start the pub/sub invalidation listener lazily in each process"""
+        if self._listener is not None and self._listener_pid == os.getpid() and self._listener.is_alive():
+            return
+        with self._listener_lock:
+            if self._listener is None or self._listener_pid != os.getpid() or not self._listener.is_alive():
+                self._cache.invalidate()
+                self._listener_pid = os.getpid()
+                self._listener = threading.Thread(
+                    target=self._listen_for_invalidations,
+                    name='api-key-invalidation-listener',
+                    daemon=True
+                )
+                self._listener.start()
+    
+    def _listen_for_invalidations(self):
+        """
+        Drop cached entries named on the invalidation channel, reconnecting on failure.
+        Messages are polled with a timeout shorter than the pool's socket_timeout, so
+        an idle subscription never times out; the whole cache is only cleared after
+        a real disconnect, when messages may have been missed.
+        """
+        backoff = 1.0
+        while True:
+            pubsub = analytics_redis._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(API_KEY_INVALIDATION_CHANNEL)
+                # Anything cached before the subscription may have missed a message
+                self._cache.invalidate()
+                backoff = 1.0
+                while True:
+                    message = pubsub.get_message(timeout=API_KEY_LISTENER_POLL_SECONDS)
+                    if message and message.get('type') == 'message':
+                        self._cache.invalidate(message['data'].decode('utf-8'))
+            except Exception as e:
+                logger.warning(f"API key invalidation listener disconnected: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                pubsub.close()
     
     def validate_key(self, api_key: str) -> Optional[Dict]:
-        """Validate API key and return key info"""
+        """
+        Validate API key and return key info. Raises AuthenticationError if the
+        key is not cached and the key store cannot be reached.
+        """
         if not api_key:
             return None
         
-        # Simple validation (in production, use hashed keys)
-        return self.api_keys.get(api_key)
+        self._ensure_listener()
+        if not self._seeded:
+            # Redis was unavailable at startup; seed the bootstrap keys now
+            self._seed_bootstrap_keys()
+        
+        digest = self.hash_key(api_key)
+        hit, key_info = self._cache.get(digest)
+        if hit:
+            return key_info
+        
+        # Read before the lookup: a revocation landing meanwhile keeps its result out of the cache
+        generation = self._cache.generation
+        try:
+            raw = analytics_redis.hget(API_KEYS_HASH, digest)
+        except Exception as e:
+            # Fail closed: only keys already cached stay usable while the store is unreachable,
+            # so a key revoked in the store is never accepted again
+            logger.error(f"API key store unavailable, rejecting uncached key: {e}")
+            raise AuthenticationError("API key store unavailable")
+        
+        key_info = json.loads(raw) if raw else None
+        self._cache.put(digest, key_info, API_KEY_CACHE_TTL if key_info else API_KEY_NEGATIVE_CACHE_TTL, generation)
+        return key_info
+    
+    def create_key(self, name: str, permissions: List[str], rate_limit: int) -> Tuple[str, Dict]:
+        """
+        Create a new API key. Returns the plaintext key, which is not stored and
+        cannot be retrieved again, together with its metadata.
+        """
+        api_key = f"ak_{secrets.token_urlsafe(32)}"
+        digest = self.hash_key(api_key)
+        key_info = {
+            'key_id': self.key_id_for(digest),
+            'name': name,
+            'permissions': permissions,
+            'rate_limit': rate_limit,
+            'created_at': time.time()
+        }
+        with analytics_redis.pipeline() as pipe:
+            pipe.hset(API_KEYS_HASH, digest, json.dumps(key_info))
+            pipe.hset(API_KEY_IDS_HASH, key_info['key_id'], digest)
+            # Clear any negative cache entry other processes may hold for this digest
+            pipe.publish(API_KEY_INVALIDATION_CHANNEL, digest)
+            pipe.execute()
+        
+        logger.info(f"Created API key {key_info['key_id']} ({name})")
+        return api_key, key_info
+    
+    def revoke_key(self, key_id: str) -> bool:
+        """Revoke a key by its key_id and invalidate it in every process. Returns False if unknown."""
+        digest = analytics_redis.hget(API_KEY_IDS_HASH, key_id)
+        if not digest:
+            return False
+        digest = digest.decode('utf-8')
+        
+        with analytics_redis.pipeline() as pipe:
+            pipe.hdel(API_KEYS_HASH, digest)
+            # Keep the ID mapping with empty digest so a bootstrap key is not re-seeded
+            pipe.hset(API_KEY_IDS_HASH, key_id, '')
+            pipe.publish(API_KEY_INVALIDATION_CHANNEL, digest)
+            pipe.execute()
+        self._cache.invalidate(digest)
+        
+        logger.info(f"Revoked API key {key_id}")
+        return True
+    
+    def list_keys(self) -> List[Dict]:
+        """Return metadata for every active key"""
+        return [json.loads(raw) for raw in analytics_redis.hvals(API_KEYS_HASH)]
     
     def has_permission(self, key_info: Dict, permission: str) -> bool:
         """Check if API key has specific permission"""
@@ -135,16 +402,22 @@ def require_auth(permission: str = 'read'):
                 # Extract API key
                 api_key = extract_api_key()
                 if not api_key:
-                    logger.warning(f"Missing API key for {request.endpoint}")
+                    logger.warning("Missing API key for %s", request.endpoint)
                     return jsonify({
                         'error': 'Authentication required',
                         'message': 'API key must be provided in Authorization header or X-API-Key header'
                     }), 401
                 
                 # Validate API key
-                key_info = api_key_manager.validate_key(api_key)
+                try:
+                    key_info = api_key_manager.validate_key(api_key)
+                except AuthenticationError:
+                    return jsonify({
+                        'error': 'Authentication unavailable',
+                        'message': 'Unable to verify the API key, try again shortly'
+                    }), 503
                 if not key_info:
-                    logger.warning(f"Invalid API key attempted: {api_key[:8]}...")
+                    logger.warning("Invalid API key attempted: %s...", api_key[:8])
                     return jsonify({
                         'error': 'Invalid API key',
                         'message': 'The provided API key is not valid'
@@ -152,18 +425,20 @@ def require_auth(permission: str = 'read'):
                 
                 # Check permissions
                 if not api_key_manager.has_permission(key_info, permission):
-                    logger.warning(f"Insufficient permissions for key {key_info['name']}: required {permission}")
+                    logger.warning("Insufficient permissions for key %s: required %s", key_info['name'], permission)
                     return jsonify({
                         'error': 'Insufficient permissions',
                         'message': f'This API key does not have {permission} permission'
                     }), 403
                 
                 # Rate limiting
-                client_id = f"key_{hashlib.md5(api_key.encode()).hexdigest()[:8]}"
+                client_id = f"key_{key_info['key_id']}"
                 rate_limit = key_info.get('rate_limit', 100)
                 
-                if not rate_limiter.is_allowed(client_id, rate_limit, 3600):  # 1 hour window
-                    logger.warning(f"Rate limit exceeded for {client_id}")
+                limit_result = rate_limiter.check(client_id, rate_limit, 3600)  # 1 hour window
+                g.rate_limit = limit_result
+                if not limit_result.allowed:
+                    logger.warning("Rate limit exceeded for %s", client_id)
                     return jsonify({
                         'error': 'Rate limit exceeded',
                         'message': f'Rate limit of {rate_limit} requests per hour exceeded'
@@ -172,9 +447,9 @@ def require_auth(permission: str = 'read'):
                 # Add key info to request context
                 request.api_key_info = key_info
                 
-                logger.debug(f"Authenticated request for {key_info['name']} with {permission} permission")
+                logger.debug("Authenticated request for %s with %s permission", key_info['name'], permission)
                 return f(*args, **kwargs)
-                
+            
             except Exception as e:
                 logger.error(f"Authentication error: {e}")
                 return jsonify({
@@ -197,10 +472,12 @@ def rate_limit(requests_per_hour: int = 100):
             # Get client identifier
             client_id = request.remote_addr
             if hasattr(request, 'api_key_info'):
-                client_id = f"key_{hashlib.md5(extract_api_key().encode()).hexdigest()[:8]}"
+                client_id = f"key_{request.api_key_info['key_id']}"
             
-            if not rate_limiter.is_allowed(client_id, requests_per_hour, 3600):
-                logger.warning(f"Rate limit exceeded for {client_id}")
+            limit_result = rate_limiter.check(client_id, requests_per_hour, 3600)
+            g.rate_limit = limit_result
+            if not limit_result.allowed:
+                logger.warning("Rate limit exceeded for %s", client_id)
                 return jsonify({
                     'error': 'Rate limit exceeded',
                     'message': f'Rate limit of {requests_per_hour} requests per hour exceeded'
@@ -210,11 +487,25 @@ def rate_limit(requests_per_hour: int = 100):
         return decorated_function
     return decorator
 
+def apply_rate_limit_headers(response):
+    """
+    after_request hook adding X-RateLimit-* headers for rate-limited requests
+    and Retry-After when the request was rejected.
+    """
+    limit_result = g.get('rate_limit')
+    if limit_result is not None:
+        response.headers['X-RateLimit-Limit'] = str(limit_result.limit)
+        response.headers['X-RateLimit-Remaining'] = str(limit_result.remaining)
+        if not limit_result.allowed:
+            response.headers['Retry-After'] = str(max(math.ceil(limit_result.retry_after), 1))
+    return response
+
 def get_client_info() -> Dict:
     """Get information about the current authenticated client"""
     if hasattr(request, 'api_key_info'):
         return {
             'authenticated': True,
+            'key_id': request.api_key_info.get('key_id'),
             'key_name': request.api_key_info['name'],
             'permissions': request.api_key_info['permissions'],
             'rate_limit': request.api_key_info['rate_limit']
@@ -0,0 +1,368 @@
+import os
+import re
+import json
+import struct
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Tuple, List
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ───────────────────────────────────────
+# Event Codec Configuration
+# ───────────────────────────────────────
+
+# Codec used for newly written events: 'json' or 'binary'. Reads always accept both,
+# so switch to 'binary' once every process runs a version that can decode it.
+EVENT_CODEC = os.getenv('EVENT_CODEC', 'json').lower()
+
+# JSON payloads are recognised by their first byte; binary payloads start with their format version
+JSON_MARKER = ord('{')
+
+# Strings interned by binary format version 1: top-level fields, event types, common
+# property keys, ID prefixes and low-cardinality property values. The table is frozen
+# once released; adding strings means adding a new format version with a longer table.
+_STRING_TABLE_V1 = (
+    # Event record fields
+    'event_id', 'event_type', 'user_id', 'session_id', 'timestamp', 'properties', 'last_enriched',
+    # ID prefixes
+    'evt_', 'sess_', 'user_', 'txn_',
+    # Event types
+    'page_view', 'button_click', 'form_submit', 'feature_used', 'user_registered',
+    'purchase_completed', 'session_start', 'logout', 'error_occurred', 'video_played',
+    # Common property keys
+    'user_agent', 'device_type', 'browser', 'country', 'city', 'page_url', 'page_title',
+    'referrer', 'load_time', 'viewport_width', 'viewport_height', 'button_text', 'button_id',
+    'element_position', 'campaign_source', 'user_tier', 'feature_name', 'feature_category',
+    'form_name', 'form_id', 'transaction_id', 'revenue', 'currency', 'product_id',
+    'product_name', 'payment_method', 'discount_code', 'discount_amount', 'is_first_purchase',
+    'billing_country', 'signup_method', 'plan_selected', 'referral_source', 'registration_method',
+    'signup_source', 'user_type', 'referral_code', 'email_domain', 'account_creation_time',
+    'utm_source', 'utm_medium', 'utm_campaign', 'entry_page', 'traffic_source',
+    'session_duration', 'pages_viewed', 'actions_taken', 'last_page', 'logout_method',
+    'video_title', 'video_duration', 'watched_duration', 'completion_rate', 'video_quality',
+    'autoplay', 'error_type', 'error_message', 'error_code', 'stack_trace', 'user_plan',
+    'company_size', 'file_type', 'priority',
+    # Device, browser and platform values
+    'desktop', 'mobile', 'tablet', 'Chrome', 'Safari', 'Firefox', 'Edge',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64)',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X)',
+    # Countries and currencies
+    'US', 'UK', 'CA', 'DE', 'FR', 'JP', 'AU', 'BR', 'SE', 'NL', 'USD', 'EUR', 'GBP', 'CAD',
+    # Pages and referrers
+    '/', '/dashboard', '/pricing', '/features', '/about', '/contact', '/login', '/signup',
+    '/settings', '/billing', '/reports', '/integrations', '/support', '/onboarding', '/analytics',
+    'google.com', 'facebook.com', 'twitter.com', 'direct',
+    # Buttons and positions
+    'Sign Up', 'Learn More', 'Get Started', 'Contact Us', 'header', 'sidebar', 'footer', 'main',
+    # Purchases and plans
+    'Basic Plan', 'Pro Plan', 'Enterprise Plan', 'credit_card', 'paypal', 'stripe', 'invoice',
+    'free', 'basic', 'pro', 'enterprise', 'monthly', 'annual',
+    # Registration and acquisition
+    'email', 'google', 'facebook', 'organic', 'paid_ads', 'referral', 'social',
+    'organic_search', 'cpc', 'individual', 'business',
+    # Misc
+    'manual', 'timeout', 'validation_error', 'server_error', 'permission_denied', 'network_error',
+    'high', 'medium', 'low', 'csv', 'pdf', '1080p', '720p',
+)
+
+# Value type tags of the binary format
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _REF, _LIST, _DICT, _DATETIME, _HEX_ID, _DIGIT_ID, _DECIMAL = range(13)
+
+# Strings that can be packed more tightly than UTF-8
+_HEX_ID_PATTERN = re.compile(r'([A-Za-z]+_)((?:[0-9a-f]{2}){4,})')
+_DIGIT_ID_PATTERN = re.compile(r'([A-Za-z]+_)([0-9]{1,18})')
+
+# Largest number of decimal places stored as a scaled integer instead of a double
+_MAX_DECIMAL_PLACES = 6
+
+_EPOCH = datetime(1970, 1, 1)
+_DOUBLE = struct.Struct('<d')
+
+# ───────────────────────────────────────
+# Codecs
+# ───────────────────────────────────────
+
+class JSONEventCodec:
+    """Events as UTF-8 JSON, the original storage format"""
+    
+    name = 'json'
+    
+    def encode(self, event: Dict[str, Any]) -> bytes:
+        return json.dumps(event).encode('utf-8')
+    
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        return json.loads(data)
+
+class BinaryEventCodec:
+    """
+    Compact tagged binary encoding of JSON-compatible events. Strings found in the
+    version's string table are written as a table index, ISO timestamps as integer
+    microseconds, prefixed hex/decimal IDs as packed numbers and short decimals as
+    scaled integers; anything else falls back to inline UTF-8 or a raw double.
+    Decoding always yields exactly what json.loads(json.dumps(event)) would.
+    """
+    
+    name = 'binary'
+    
+    def __init__(self, version: int, string_table: Tuple[str, ...]):
+        self.version = version
+        self._strings = string_table
+        self._index = {value: index for index, value in enumerate(string_table)}
+    
+    # Encoding
+    
+    def encode(self, event: Dict[str, Any]) -> bytes:
+        buf = bytearray((self.version,))
+        self._write_value(buf, event)
+        return bytes(buf)
+    
+    def _write_text(self, buf: bytearray, value: str) -> None:
+        """Write a string as a table reference (index + 1) or 0 followed by inline UTF-8"""
+        index = self._index.get(value)
+        if index is not None:
+            _write_varint(buf, index + 1)
+            return
+        raw = value.encode('utf-8')
+        buf.append(0)
+        _write_varint(buf, len(raw))
+        buf += raw
+    
+    def _write_str(self, buf: bytearray, value: str) -> None:
+        index = self._index.get(value)
+        if index is not None:
+            buf.append(_REF)
+            _write_varint(buf, index)
+            return
+        
+        if len(value) in (19, 26) and value[10:11] == 'T':
+            micros = _iso_to_micros(value)
+            if micros is not None:
+                buf.append(_DATETIME)
+                _write_varint(buf, _zigzag(micros))
+                return
+        
+        match = _HEX_ID_PATTERN.fullmatch(value)
+        if match:
+            digits = bytes.fromhex(match.group(2))
+            buf.append(_HEX_ID)
+            self._write_text(buf, match.group(1))
+            _write_varint(buf, len(digits))
+            buf += digits
+            return
+        
+        match = _DIGIT_ID_PATTERN.fullmatch(value)
+        if match:
+            buf.append(_DIGIT_ID)
+            self._write_text(buf, match.group(1))
+            buf.append(len(match.group(2)))
+            _write_varint(buf, int(match.group(2)))
+            return
+        
+        raw = value.encode('utf-8')
+        buf.append(_STR)
+        _write_varint(buf, len(raw))
+        buf += raw
+    
+    def _write_float(self, buf: bytearray, value: float) -> None:
+        text = repr(value)
+        point = text.find('.')
+        places = len(text) - point - 1 if point >= 0 and 'e' not in text else -1
+        if 0 <= places <= _MAX_DECIMAL_PLACES:
+            scaled = round(value * 10 ** places)
+            if repr(scaled / 10 ** places) == text:
+                buf.append(_DECIMAL)
+                buf.append(places)
+                _write_varint(buf, _zigzag(scaled))
+                return
+        buf.append(_FLOAT)
+        buf += _DOUBLE.pack(value)
+    
+    def _write_value(self, buf: bytearray, value: Any) -> None:
+        if isinstance(value, str):
+            self._write_str(buf, value)
+        elif value is None:
+            buf.append(_NONE)
+        elif value is True:
+            buf.append(_TRUE)
+        elif value is False:
+            buf.append(_FALSE)
+        elif isinstance(value, int):
+            buf.append(_INT)
+            _write_varint(buf, _zigzag(value))
+        elif isinstance(value, float):
+            self._write_float(buf, value)
+        elif isinstance(value, dict):
+            buf.append(_DICT)
+            _write_varint(buf, len(value))
+            for key, item in value.items():
+                if not isinstance(key, str):
+                    raise TypeError(f"Binary event codec requires string keys, got {type(key).__name__}")
+                self._write_text(buf, key)
+                self._write_value(buf, item)
+        elif isinstance(value, (list, tuple)):
+            buf.append(_LIST)
+            _write_varint(buf, len(value))
+            for item in value:
+                self._write_value(buf, item)
+        else:
+            raise TypeError(f"Binary event codec cannot encode {type(value).__name__}")
+    
+    # Decoding
+    
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        value, pos = self._read_value(data, 1)
+        if pos != len(data):
+            raise ValueError(f"Trailing bytes after binary event payload ({len(data) - pos})")
+        return value
+    
+    def _read_text(self, data: bytes, pos: int) -> Tuple[str, int]:
+        ref, pos = _read_varint(data, pos)
+        if ref:
+            return self._strings[ref - 1], pos
+        length, pos = _read_varint(data, pos)
+        return data[pos:pos + length].decode('utf-8'), pos + length
+    
+    def _read_value(self, data: bytes, pos: int) -> Tuple[Any, int]:
+        tag = data[pos]
+        pos += 1
+        if tag == _REF:
+            index, pos = _read_varint(data, pos)
+            return self._strings[index], pos
+        if tag == _STR:
+            length, pos = _read_varint(data, pos)
+            return data[pos:pos + length].decode('utf-8'), pos + length
+        if tag == _INT:
+            value, pos = _read_varint(data, pos)
+            return _unzigzag(value), pos
+        if tag == _DECIMAL:
+            places = data[pos]
+            value, pos = _read_varint(data, pos + 1)
+            return _unzigzag(value) / 10 ** places, pos
+        if tag == _DICT:
+            count, pos = _read_varint(data, pos)
+            result = {}
+            for _ in range(count):
+                key, pos = self._read_text(data, pos)
+                result[key], pos = self._read_value(data, pos)
+            return result, pos
+        if tag == _DATETIME:
+            value, pos = _read_varint(data, pos)
+            return (_EPOCH + timedelta(microseconds=_unzigzag(value))).isoformat(), pos
+        if tag == _HEX_ID:
+            prefix, pos = self._read_text(data, pos)
+            length, pos = _read_varint(data, pos)
+            return prefix + data[pos:pos + length].hex(), pos + length
+        if tag == _DIGIT_ID:
+            prefix, pos = self._read_text(data, pos)
+            width = data[pos]
+            value, pos = _read_varint(data, pos + 1)
+            return f'{prefix}{value:0{width}d}', pos
+        if tag == _NONE:
+            return None, pos
+        if tag == _TRUE:
+            return True, pos
+        if tag == _FALSE:
+            return False, pos
+        if tag == _FLOAT:
+            return _DOUBLE.unpack_from(data, pos)[0], pos + _DOUBLE.size
+        if tag == _LIST:
+            count, pos = _read_varint(data, pos)
+            items: List[Any] = []
+            for _ in range(count):
+                item, pos = self._read_value(data, pos)
+                items.append(item)
+            return items, pos
+        raise ValueError(f"Unknown binary event value tag {tag}")
+
+# ───────────────────────────────────────
+# Encoding Helpers
+# ───────────────────────────────────────
+
+def _write_varint(buf: bytearray, value: int) -> None:
+    while value > 0x7f:
+        buf.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def _zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+def _iso_to_micros(value: str):
+    """Microseconds since the epoch of a naive ISO timestamp, if it round-trips exactly"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None or parsed.isoformat() != value:
+        return None
+    delta = parsed - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+# ───────────────────────────────────────
+# Codec Registry
+# ───────────────────────────────────────
+
+json_codec = JSONEventCodec()
+
+# Binary codecs by format version (the first byte of their payloads)
+BINARY_CODECS = {
+    1: BinaryEventCodec(1, _STRING_TABLE_V1),
+}
+
+# Codec selected by EVENT_CODEC for new writes
+_CODECS = {
+    'json': json_codec,
+    'binary': BINARY_CODECS[max(BINARY_CODECS)],
+}
+
+if EVENT_CODEC not in _CODECS:
+    raise ValueError(f"EVENT_CODEC must be one of: {', '.join(_CODECS)}")
+
+write_codec = _CODECS[EVENT_CODEC]
+
+def encode_event(event: Dict[str, Any]) -> bytes:
+    """
+    Encode an event with the configured codec. Events the binary format cannot
+    represent (e.g. non-string property keys, or strings holding lone surrogates
+    that are not valid UTF-8) are stored as JSON instead.
+    """
+    try:
+        return write_codec.encode(event)
+    except (TypeError, UnicodeEncodeError) as e:
+        logger.debug("Falling back to JSON encoding for event %s: %s", event.get('event_id'), e)
+        return json_codec.encode(event)
+
+def decode_event(data: bytes) -> Dict[str, Any]:
+    """
+    Decode a stored event in any supported format, dispatching on its first byte.
+    Raises ValueError for payloads in an unknown format.
+    """
+    if not data:
+        raise ValueError("Empty event payload")
+    marker = data[0]
+    if marker == JSON_MARKER:
+        return json_codec.decode(data)
+    codec = BINARY_CODECS.get(marker)
+    if codec is None:
+        raise ValueError(f"Unknown event payload format {marker:#04x}")
+    try:
+        return codec.decode(data)
+    except (IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"Corrupt binary event payload: {e}")
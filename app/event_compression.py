@@ -0,0 +1,382 @@
+import os
+import json
+import time
+import zlib
+import random
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from redis import ConnectionError, TimeoutError
+
+from .redis_client import analytics_redis
+from .timeseries import to_epoch
+from .event_codec import write_codec, decode_event
+from .exceptions import AnalyticsPlatformError, RedisConnectionError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ───────────────────────────────────────
+# Compression Configuration
+# ───────────────────────────────────────
+
+# Encoded payloads at least this large are compressed (0 disables compression)
+COMPRESSION_THRESHOLD = int(os.getenv('EVENT_COMPRESSION_THRESHOLD', 1024))  # bytes
+
+# With a trained dictionary for the event type, payloads down to this size are compressed too
+COMPRESSION_DICT_THRESHOLD = int(os.getenv('EVENT_COMPRESSION_DICT_THRESHOLD', 256))  # bytes
+
+# zlib level: 1 is fastest, 9 smallest
+COMPRESSION_LEVEL = int(os.getenv('EVENT_COMPRESSION_LEVEL', 6))
+
+# Payload markers; they sit above the event codec's format bytes ('{' and binary versions)
+MARKER_ZLIB = 0xF0
+MARKER_ZLIB_DICT = 0xF1
+
+# Trained per-event_type dictionaries. Dictionaries are immutable and referenced by ID
+# from compressed payloads; the current ID per event type is what new writes use.
+DICTIONARY_KEY = 'event_dicts'
+DICTIONARY_META_KEY = 'event_dicts:meta'
+CURRENT_DICTIONARY_KEY = 'event_dicts:current'
+DICTIONARY_ID_KEY = 'event_dicts:next_id'
+
+# zlib only uses the last 32 KB of a preset dictionary
+DICTIONARY_MAX_BYTES = int(os.getenv('EVENT_COMPRESSION_DICT_MAX_BYTES', 32768))
+
+# Recent events sampled per event type when training a dictionary
+DICTIONARY_SAMPLE_SIZE = int(os.getenv('EVENT_COMPRESSION_DICT_SAMPLES', 500))
+
+# Seconds between periodic dictionary training runs
+DICTIONARY_TRAIN_INTERVAL = int(os.getenv('EVENT_COMPRESSION_TRAIN_INTERVAL', 86400))
+
+# How often a process reloads the current dictionary assignments
+DICTIONARY_REFRESH_INTERVAL = float(os.getenv('EVENT_COMPRESSION_DICT_REFRESH', 60))
+
+# Dictionaries kept in process memory for decompression
+DICTIONARY_CACHE_SIZE = 256
+
+# ───────────────────────────────────────
+# Metrics
+# ───────────────────────────────────────
+
+class CompressionStats:
+    """Per-process compression counters used to tune the threshold"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        self.below_threshold = 0
+        self.compressed = 0
+        self.compressed_with_dictionary = 0
+        self.not_beneficial = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compress_seconds = 0.0
+        self.decompressed = 0
+        self.decompress_seconds = 0.0
+    
+    def record_compress(self, size_in: int, size_out: int, seconds: float, used_dictionary: bool, kept: bool):
+        with self._lock:
+            self.compress_seconds += seconds
+            if not kept:
+                self.not_beneficial += 1
+                return
+            self.compressed += 1
+            self.compressed_with_dictionary += used_dictionary
+            self.bytes_in += size_in
+            self.bytes_out += size_out
+    
+    def record_below_threshold(self):
+        with self._lock:
+            self.below_threshold += 1
+    
+    def record_decompress(self, seconds: float):
+        with self._lock:
+            self.decompressed += 1
+            self.decompress_seconds += seconds
+    
+    def snapshot(self) -> Dict[str, Any]:
+        attempts = self.compressed + self.not_beneficial
+        return {
+            'threshold_bytes': COMPRESSION_THRESHOLD,
+            'below_threshold': self.below_threshold,
+            'compressed': self.compressed,
+            'compressed_with_dictionary': self.compressed_with_dictionary,
+            'not_beneficial': self.not_beneficial,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'compression_ratio': round(self.bytes_in / self.bytes_out, 3) if self.bytes_out else None,
+            'avg_compress_us': round(self.compress_seconds / attempts * 1e6, 2) if attempts else None,
+            'decompressed': self.decompressed,
+            'avg_decompress_us': round(self.decompress_seconds / self.decompressed * 1e6, 2) if self.decompressed else None,
+        }
+
+compression_stats = CompressionStats()
+
+def get_compression_stats() -> Dict[str, Any]:
+    """Return this process's compression counters and the stored dictionaries"""
+    try:
+        return {**compression_stats.snapshot(), 'dictionaries': list_dictionaries()}
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while listing compression dictionaries: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+
+# ───────────────────────────────────────
+# Dictionary Registry
+# ───────────────────────────────────────
+
+class _DictionaryRegistry:
+    """
+    Process-local view of the trained dictionaries: the current dictionary ID per
+    event type (reloaded every DICTIONARY_REFRESH_INTERVAL seconds) and an LRU of
+    dictionary contents by ID, which never change once written.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current: Dict[str, int] = {}
+        self._loaded_at = 0.0
+        self._contents: 'OrderedDict[int, bytes]' = OrderedDict()
+    
+    def current(self, event_type: str) -> Optional[Tuple[int, bytes]]:
+        """Current (dictionary ID, contents) for an event type, if one is trained"""
+        if time.monotonic() - self._loaded_at > DICTIONARY_REFRESH_INTERVAL:
+            self._reload()
+        dictionary_id = self._current.get(event_type)
+        if dictionary_id is None:
+            return None
+        contents = self.get(dictionary_id)
+        return (dictionary_id, contents) if contents is not None else None
+    
+    def get(self, dictionary_id: int) -> Optional[bytes]:
+        """Dictionary contents by ID, loaded from Redis on a cache miss"""
+        with self._lock:
+            contents = self._contents.get(dictionary_id)
+            if contents is not None:
+                self._contents.move_to_end(dictionary_id)
+                return contents
+        
+        contents = analytics_redis.hget(DICTIONARY_KEY, str(dictionary_id))
+        if contents is None:
+            return None
+        with self._lock:
+            self._contents[dictionary_id] = contents
+            if len(self._contents) > DICTIONARY_CACHE_SIZE:
+                self._contents.popitem(last=False)
+        return contents
+    
+    def _reload(self):
+        self._loaded_at = time.monotonic()
+        try:
+            raw = analytics_redis.hgetall(CURRENT_DICTIONARY_KEY)
+            self._current = {event_type.decode('utf-8'): int(value) for event_type, value in raw.items()}
+        except (ConnectionError, TimeoutError) as e:
+            # Keep compressing with the dictionaries already known
+            logger.warning(f"Could not reload compression dictionaries: {e}")
+    
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+dictionaries = _DictionaryRegistry()
+
+# ───────────────────────────────────────
+# Compression
+# ───────────────────────────────────────
+
+def _compress(data: bytes, dictionary: Optional[bytes]) -> bytes:
+    if dictionary is None:
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, -15)
+    else:
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, -15, zdict=dictionary)
+    return compressor.compress(data) + compressor.flush()
+
+def _decompress(data: bytes, dictionary: Optional[bytes]) -> bytes:
+    if dictionary is None:
+        decompressor = zlib.decompressobj(-15)
+    else:
+        decompressor = zlib.decompressobj(-15, zdict=dictionary)
+    return decompressor.decompress(data) + decompressor.flush()
+
+def compress_payload(event_type: str, data: bytes) -> bytes:
+    """
+    Compress an encoded event payload if it reaches COMPRESSION_THRESHOLD, or
+    COMPRESSION_DICT_THRESHOLD when the event type has a trained dictionary.
+    Payloads that do not shrink are returned unchanged.
+    """
+    if not COMPRESSION_THRESHOLD or len(data) < min(COMPRESSION_THRESHOLD, COMPRESSION_DICT_THRESHOLD):
+        compression_stats.record_below_threshold()
+        return data
+    
+    start = time.perf_counter()
+    trained = dictionaries.current(event_type)
+    if trained is None and len(data) < COMPRESSION_THRESHOLD:
+        compression_stats.record_below_threshold()
+        return data
+    
+    if trained is None:
+        compressed = bytes((MARKER_ZLIB,)) + _compress(data, None)
+    else:
+        dictionary_id, dictionary = trained
+        compressed = bytes((MARKER_ZLIB_DICT,)) + dictionary_id.to_bytes(4, 'big') + _compress(data, dictionary)
+    
+    kept = len(compressed) < len(data)
+    compression_stats.record_compress(len(data), len(compressed), time.perf_counter() - start, trained is not None, kept)
+    return compressed if kept else data
+
+def decompress_payload(data: bytes) -> bytes:
+    """Undo compress_payload; payloads without a compression marker are returned unchanged"""
+    if not data or data[0] not in (MARKER_ZLIB, MARKER_ZLIB_DICT):
+        return data
+    
+    start = time.perf_counter()
+    try:
+        if data[0] == MARKER_ZLIB:
+            result = _decompress(data[1:], None)
+        else:
+            dictionary_id = int.from_bytes(data[1:5], 'big')
+            dictionary = dictionaries.get(dictionary_id)
+            if dictionary is None:
+                raise ValueError(f"Compression dictionary {dictionary_id} is missing")
+            result = _decompress(data[5:], dictionary)
+    except zlib.error as e:
+        raise ValueError(f"Corrupt compressed event payload: {e}")
+    
+    compression_stats.record_decompress(time.perf_counter() - start)
+    return result
+
+# ───────────────────────────────────────
+# Dictionary Training
+# ───────────────────────────────────────
+
+def build_dictionary(samples: List[bytes]) -> bytes:
+    """
+    Build a preset dictionary from sample payloads. zlib favours matches near the
+    end of the dictionary, so the most common distinct payload fragments go last.
+    """
+    counts: Dict[bytes, int] = {}
+    for sample in samples:
+        counts[sample] = counts.get(sample, 0) + 1
+    ordered = sorted(counts, key=counts.get)
+    
+    dictionary = b''.join(ordered)
+    return dictionary[-DICTIONARY_MAX_BYTES:]
+
+def _average_size(payloads: List[bytes], dictionary: Optional[bytes]) -> float:
+    return sum(len(_compress(payload, dictionary)) for payload in payloads) / len(payloads)
+
+def _sample_recent_payloads(partition_keys: List[str]) -> Dict[str, List[bytes]]:
+    """Re-encode up to DICTIONARY_SAMPLE_SIZE recent events per event type with the write codec"""
+    samples: Dict[str, List[bytes]] = {}
+    for key in partition_keys:
+        cursor = 0
+        while True:
+            cursor, entries = analytics_redis.hscan(key, cursor=cursor, count=1000)
+            for raw in entries.values():
+                try:
+                    event = decode_event(decompress_payload(raw))
+                except ValueError:
+                    continue
+                bucket = samples.setdefault(event['event_type'], [])
+                if len(bucket) < DICTIONARY_SAMPLE_SIZE:
+                    bucket.append(write_codec.encode(event))
+            if cursor == 0 or all(len(bucket) >= DICTIONARY_SAMPLE_SIZE for bucket in samples.values()):
+                break
+    return samples
+
+def train_dictionaries(partition_keys: List[str]) -> Dict[str, Any]:
+    """
+    Background job to train one compression dictionary per event type from recent
+    events. Each candidate is evaluated on held-out samples and only installed when
+    it compresses them better than the current dictionary (or no dictionary).
+    """
+    try:
+        samples = _sample_recent_payloads(partition_keys)
+        results = {}
+        
+        for event_type, payloads in samples.items():
+            if len(payloads) < 10:
+                results[event_type] = {'status': 'skipped', 'samples': len(payloads)}
+                continue
+            
+            random.shuffle(payloads)
+            holdout = payloads[:max(len(payloads) // 5, 1)]
+            candidate = build_dictionary(payloads[len(holdout):])
+            
+            current = dictionaries.current(event_type)
+            baseline = _average_size(holdout, current[1] if current else None)
+            trained = _average_size(holdout, candidate)
+            if trained >= baseline:
+                results[event_type] = {'status': 'kept_current', 'avg_bytes': round(baseline, 1)}
+                continue
+            
+            now = to_epoch(datetime.utcnow())
+            dictionary_id = int(analytics_redis.incr(DICTIONARY_ID_KEY))
+            with analytics_redis.pipeline() as pipe:
+                pipe.hset(DICTIONARY_KEY, str(dictionary_id), candidate)
+                pipe.hset(DICTIONARY_META_KEY, str(dictionary_id), json.dumps({
+                    'event_type': event_type,
+                    'created_at': now,
+                    'bytes': len(candidate),
+                    'samples': len(payloads)
+                }))
+                pipe.hset(CURRENT_DICTIONARY_KEY, event_type, dictionary_id)
+                if current:
+                    # Events keep referencing the replaced dictionary until they expire
+                    pipe.hset(DICTIONARY_META_KEY, str(current[0]), json.dumps({
+                        **_dictionary_meta(current[0]),
+                        'superseded_at': now
+                    }))
+                pipe.execute()
+            
+            results[event_type] = {
+                'status': 'trained',
+                'dictionary_id': dictionary_id,
+                'avg_bytes_before': round(baseline, 1),
+                'avg_bytes_after': round(trained, 1)
+            }
+        
+        dictionaries.invalidate()
+        logger.info(f"Compression dictionary training completed: {results}")
+        return results
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while training compression dictionaries: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to train compression dictionaries: {e}")
+        raise AnalyticsPlatformError(f"Compression dictionary training failed: {e}")
+
+def _dictionary_meta(dictionary_id: int) -> Dict[str, Any]:
+    raw = analytics_redis.hget(DICTIONARY_META_KEY, str(dictionary_id))
+    return json.loads(raw) if raw else {}
+
+def list_dictionaries() -> List[Dict[str, Any]]:
+    """Metadata of every stored dictionary, flagging the ones currently used for writes"""
+    current = {int(value) for value in analytics_redis.hvals(CURRENT_DICTIONARY_KEY)}
+    dictionaries_meta = []
+    for dictionary_id, raw in analytics_redis.hgetall(DICTIONARY_META_KEY).items():
+        meta = json.loads(raw)
+        meta['dictionary_id'] = int(dictionary_id)
+        meta['current'] = meta['dictionary_id'] in current
+        dictionaries_meta.append(meta)
+    return sorted(dictionaries_meta, key=lambda meta: meta['dictionary_id'])
+
+def prune_dictionaries(now: int, max_age: int) -> int:
+    """
+    Delete dictionaries that were superseded more than max_age seconds ago; no
+    stored event can reference them any more. Returns the number deleted.
+    """
+    stale = [
+        str(meta['dictionary_id']) for meta in list_dictionaries()
+        if not meta['current'] and meta.get('superseded_at', now) + max_age < now
+    ]
+    if stale:
+        with analytics_redis.pipeline() as pipe:
+            pipe.hdel(DICTIONARY_KEY, *stale)
+            pipe.hdel(DICTIONARY_META_KEY, *stale)
+            pipe.execute()
+    return len(stale)
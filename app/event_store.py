@@ -0,0 +1,320 @@
+import os
+import time
+import uuid
+import random
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from redis import ConnectionError, TimeoutError
+
+from .redis_client import analytics_redis, record_decode_time, DATA_RETENTION
+from .timeseries import to_epoch
+from .event_codec import encode_event, decode_event
+from .event_compression import compress_payload, decompress_payload, prune_dictionaries
+from .exceptions import AnalyticsPlatformError, RedisConnectionError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ───────────────────────────────────────
+# Event Partition Configuration
+# ───────────────────────────────────────
+
+# Event payloads are stored in one hash per time partition. The partition start is
+# embedded in the event ID, so a lookup is a single HGET and retention drops whole hashes.
+EVENT_PARTITION_SECONDS = int(os.getenv('EVENT_PARTITION_SECONDS', 3600))  # 1 hour
+
+# Partitions also carry an absolute TTL this long after their retention ends,
+# so they are reclaimed even if the cleanup job stops running
+EVENT_PARTITION_GRACE = int(os.getenv('EVENT_PARTITION_GRACE', 86400))  # 1 day
+
+EVENT_PARTITION_PREFIX = 'events:p:'
+
+# Sorted set of partition key -> partition end timestamp, used to find expired partitions
+EVENT_PARTITION_INDEX = 'events:partitions'
+
+# Storage used before partitioning: a per-event key (SET EX) and, before that,
+# a single hash of every event. Both are still read for old event IDs.
+EVENT_KEY_PREFIX = 'event:'
+LEGACY_EVENTS_HASH = 'analytics_events'
+LEGACY_PRUNE_CURSOR_KEY = f'{LEGACY_EVENTS_HASH}:prune_cursor'
+
+# Maximum legacy hash entries inspected per cleanup run
+LEGACY_PRUNE_BATCH = int(os.getenv('LEGACY_EVENTS_PRUNE_BATCH', 10000))
+
+# Partitioned IDs are 'evt_' + 8 hex digits of partition start + 12 random hex digits
+_PARTITIONED_ID_LENGTH = 24
+
+# ───────────────────────────────────────
+# Event ID and Partition Helpers
+# ───────────────────────────────────────
+
+def partition_start(event_time: datetime) -> int:
+    """Start timestamp of the partition an event time falls into"""
+    epoch = to_epoch(event_time)
+    return epoch - epoch % EVENT_PARTITION_SECONDS
+
+def new_event_id(event_time: datetime, rng: Optional[random.Random] = None) -> str:
+    """
+    Generate an event ID that encodes the start of the event's partition.
+    The random part comes from rng when given, so seeded generators produce stable IDs.
+    """
+    suffix = f'{rng.getrandbits(48):012x}' if rng is not None else uuid.uuid4().hex[:12]
+    return f"evt_{partition_start(event_time):08x}{suffix}"
+
+def event_partition(event_id: str) -> Optional[int]:
+    """Partition start encoded in an event ID, or None for IDs issued before partitioning"""
+    if len(event_id) != _PARTITIONED_ID_LENGTH or not event_id.startswith('evt_'):
+        return None
+    try:
+        return int(event_id[4:12], 16)
+    except ValueError:
+        return None
+
+def partition_key(start: int) -> str:
+    """Redis key of the partition hash starting at the given timestamp"""
+    return f'{EVENT_PARTITION_PREFIX}{start}'
+
+def _event_key(event_id: str) -> str:
+    """Redis key holding a single pre-partitioning event payload"""
+    return f'{EVENT_KEY_PREFIX}{event_id}'
+
+def _partition_expire_at(start: int) -> int:
+    """Absolute backstop expiry of a partition"""
+    return start + EVENT_PARTITION_SECONDS + DATA_RETENTION['events'] + EVENT_PARTITION_GRACE
+
+def encode_payload(event_data: Dict[str, Any]) -> bytes:
+    """Encode an event with the configured codec, compressing it if it is large"""
+    return compress_payload(event_data['event_type'], encode_event(event_data))
+
+def decode_payload(raw: bytes) -> Dict[str, Any]:
+    """
+    Decode a stored event payload in any supported encoding; raises ValueError if unreadable.
+    The time taken is added to the current request's trace.
+    """
+    started = time.perf_counter()
+    try:
+        return decode_event(decompress_payload(raw))
+    finally:
+        record_decode_time(time.perf_counter() - started)
+
+# ───────────────────────────────────────
+# Write Path
+# ───────────────────────────────────────
+
+def queue_event_payload(pipe, event_data: Dict[str, Any]) -> None:
+    """
+    Queue the write of an event payload into its partition hash.
+    The partition's backstop TTL and index entry are sent once per partition per process.
+    """
+    start = event_partition(event_data['event_id'])
+    key = partition_key(start)
+    pipe.hset(key, event_data['event_id'], encode_payload(event_data))
+    pipe.expireat(key, _partition_expire_at(start))
+    pipe.zadd_once(EVENT_PARTITION_INDEX, {key: start + EVENT_PARTITION_SECONDS})
+
+def update_event_payload(event_data: Dict[str, Any]) -> None:
+    """
+    Overwrite a stored event payload in place. Events from before partitioning are
+    kept under their per-event key (preserving its TTL) and removed from the legacy hash.
+    """
+    event_id = event_data['event_id']
+    start = event_partition(event_id)
+    
+    with analytics_redis.pipeline() as pipe:
+        if start is not None:
+            key = partition_key(start)
+            pipe.hset(key, event_id, encode_payload(event_data))
+            # Re-send the backstop TTL in case the partition was dropped concurrently
+            pipe.expireat(key, _partition_expire_at(start), force=True)
+        else:
+            pipe.set(_event_key(event_id), encode_payload(event_data), keepttl=True)
+            pipe.expire_nx(_event_key(event_id), DATA_RETENTION['events'])
+            pipe.hdel(LEGACY_EVENTS_HASH, event_id)
+        pipe.execute()
+
+# ───────────────────────────────────────
+# Read Path
+# ───────────────────────────────────────
+
+def fetch_raw_events(event_ids: List[str]) -> List[Optional[bytes]]:
+    """
+    Fetch raw event payloads in input order. A single partitioned ID is one HGET;
+    multiple IDs are read with one HMGET per partition in a single pipeline.
+    Older IDs are looked up by per-event key, then in the legacy hash.
+    """
+    if len(event_ids) == 1 and event_partition(event_ids[0]) is not None:
+        return [analytics_redis.hget(partition_key(event_partition(event_ids[0])), event_ids[0])]
+    
+    indexes_by_partition: Dict[int, List[int]] = {}
+    unpartitioned: List[int] = []
+    for index, event_id in enumerate(event_ids):
+        start = event_partition(event_id)
+        if start is None:
+            unpartitioned.append(index)
+        else:
+            indexes_by_partition.setdefault(start, []).append(index)
+    
+    raw_events: List[Optional[bytes]] = [None] * len(event_ids)
+    with analytics_redis.pipeline(transaction=False) as pipe:
+        for start, indexes in indexes_by_partition.items():
+            pipe.hmget(partition_key(start), [event_ids[index] for index in indexes])
+        if unpartitioned:
+            pipe.mget([_event_key(event_ids[index]) for index in unpartitioned])
+            pipe.hmget(LEGACY_EVENTS_HASH, [event_ids[index] for index in unpartitioned])
+        results = pipe.execute()
+    
+    for indexes, values in zip(indexes_by_partition.values(), results):
+        for index, raw in zip(indexes, values):
+            raw_events[index] = raw
+    
+    if unpartitioned:
+        per_event, legacy = results[-2], results[-1]
+        for index, raw, legacy_raw in zip(unpartitioned, per_event, legacy):
+            raw_events[index] = raw if raw is not None else legacy_raw
+    
+    return raw_events
+
+def _decode_entries(key: str, entries: Dict[bytes, bytes], events: List[Dict[str, Any]]) -> None:
+    """Decode one HSCAN page of a partition onto events, skipping unreadable payloads"""
+    for event_id, raw in entries.items():
+        try:
+            events.append(decode_payload(raw))
+        except ValueError as e:
+            logger.warning(f"Skipping unreadable event {event_id} in {key}: {e}")
+
+def read_partition_events(start: int, batch_size: int = 1000) -> List[Dict[str, Any]]:
+    """
+    Decode every event stored in the partition starting at the given timestamp,
+    read with HSCAN in batches. Unreadable payloads are skipped.
+    """
+    key = partition_key(start)
+    events = []
+    cursor = 0
+    while True:
+        cursor, entries = analytics_redis.hscan(key, cursor=cursor, count=batch_size)
+        _decode_entries(key, entries, events)
+        if cursor == 0:
+            return events
+
+def indexed_partitions(since: int, until: int) -> List[int]:
+    """Starts of the stored partitions overlapping [since, until), oldest first, from the partition index"""
+    keys = analytics_redis.zrangebyscore(EVENT_PARTITION_INDEX, f'({since}', f'({until + EVENT_PARTITION_SECONDS}')
+    return sorted(int(key.decode('utf-8')[len(EVENT_PARTITION_PREFIX):]) for key in keys)
+
+def read_partitions_events(starts: List[int], batch_size: int = 1000) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Decode the events of several partitions. The first HSCAN page of every
+    partition is read in one pipelined round trip; only partitions holding more
+    than one page are then read on, a page per round trip.
+    """
+    with analytics_redis.pipeline(transaction=False) as pipe:
+        for start in starts:
+            pipe.hscan(partition_key(start), cursor=0, count=batch_size)
+        pages = pipe.execute()
+    
+    partitions = {}
+    for start, (cursor, entries) in zip(starts, pages):
+        key = partition_key(start)
+        events = partitions[start] = []
+        _decode_entries(key, entries, events)
+        while cursor != 0:
+            cursor, entries = analytics_redis.hscan(key, cursor=cursor, count=batch_size)
+            _decode_entries(key, entries, events)
+    return partitions
+
+# ───────────────────────────────────────
+# Retention
+# ───────────────────────────────────────
+
+def drop_expired_partitions(now: Optional[int] = None) -> Dict[str, int]:
+    """
+    Drop every partition whose newest event is older than the event retention.
+    Each drop is a single UNLINK of the partition hash; returns the number of
+    partitions and events dropped and the approximate bytes freed.
+    """
+    now = to_epoch(datetime.utcnow()) if now is None else now
+    cutoff = now - DATA_RETENTION['events']
+    stats = {'partitions_dropped': 0, 'events_dropped': 0, 'bytes_freed': 0}
+    
+    expired = [key.decode('utf-8') for key in analytics_redis.zrangebyscore(EVENT_PARTITION_INDEX, '-inf', cutoff)]
+    if not expired:
+        return stats
+    
+    for key in expired:
+        stats['bytes_freed'] += analytics_redis.memory_usage(key)
+    
+    with analytics_redis.pipeline(transaction=False) as pipe:
+        for key in expired:
+            pipe.hlen(key)
+        stats['events_dropped'] = sum(pipe.execute())
+    
+    with analytics_redis.pipeline() as pipe:
+        pipe.unlink(*expired)
+        pipe.zrem(EVENT_PARTITION_INDEX, *expired)
+        stats['partitions_dropped'] = pipe.execute()[0]
+    
+    logger.info(f"Dropped {len(expired)} expired event partitions: {stats}")
+    return stats
+
+def prune_legacy_events(now: Optional[int] = None) -> Dict[str, int]:
+    """
+    Remove events older than the retention from the pre-partitioning hash, whose
+    TTL was re-armed on every write and so never expired. Scans at most
+    LEGACY_PRUNE_BATCH entries per run, resuming from the stored cursor.
+    """
+    now = to_epoch(datetime.utcnow()) if now is None else now
+    cutoff = now - DATA_RETENTION['events']
+    stats = {'legacy_events_removed': 0, 'legacy_bytes_freed': 0}
+    
+    if not analytics_redis.exists(LEGACY_EVENTS_HASH):
+        return stats
+    
+    cursor = int(analytics_redis.get(LEGACY_PRUNE_CURSOR_KEY) or 0)
+    bytes_before = analytics_redis.memory_usage(LEGACY_EVENTS_HASH)
+    
+    expired_ids = []
+    scanned = 0
+    while scanned < LEGACY_PRUNE_BATCH:
+        cursor, entries = analytics_redis.hscan(LEGACY_EVENTS_HASH, cursor=cursor, count=1000)
+        scanned += len(entries)
+        for event_id, raw in entries.items():
+            try:
+                timestamp = decode_payload(raw)['timestamp']
+                expired = to_epoch(datetime.fromisoformat(timestamp)) < cutoff
+            except (ValueError, KeyError, TypeError):
+                # Unreadable payloads can never be served, so they are removed too
+                expired = True
+            if expired:
+                expired_ids.append(event_id)
+        if cursor == 0:
+            break
+    
+    if expired_ids:
+        stats['legacy_events_removed'] = analytics_redis.hdel(LEGACY_EVENTS_HASH, *expired_ids)
+        stats['legacy_bytes_freed'] = max(bytes_before - analytics_redis.memory_usage(LEGACY_EVENTS_HASH), 0)
+    analytics_redis.set(LEGACY_PRUNE_CURSOR_KEY, cursor)
+    
+    return stats
+
+def recent_partition_keys(count: int) -> List[str]:
+    """Keys of the most recent event partitions, newest first"""
+    return [key.decode('utf-8') for key in analytics_redis.zrevrange(EVENT_PARTITION_INDEX, 0, count - 1)]
+
+def enforce_event_retention() -> Dict[str, int]:
+    """
+    Apply the event retention to partitioned and legacy event storage, and delete
+    compression dictionaries no longer referenced by any retained event.
+    """
+    try:
+        now = to_epoch(datetime.utcnow())
+        stats = {**drop_expired_partitions(now), **prune_legacy_events(now)}
+        max_age = DATA_RETENTION['events'] + EVENT_PARTITION_SECONDS + EVENT_PARTITION_GRACE
+        stats['dictionaries_pruned'] = prune_dictionaries(now, max_age)
+        return stats
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while enforcing event retention: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to enforce event retention: {e}")
+        raise AnalyticsPlatformError(f"Event retention failed: {e}")
@@ -0,0 +1,19 @@
+class AnalyticsPlatformError(Exception):
+    """Custom exception for Analytics Platform operations"""
+    pass
+
+class EventNotFoundError(AnalyticsPlatformError):
+    """Exception raised when an event is not found"""
+    pass
+
+class RedisConnectionError(AnalyticsPlatformError):
+    """Exception raised when Redis connection fails"""
+    pass
+
+class IngestBackpressureError(AnalyticsPlatformError):
+    """Exception raised when the write-behind ingest buffer is full"""
+    pass
+
+class InvalidQueryError(AnalyticsPlatformError):
+    """Exception raised when analytics query parameters are invalid"""
+    pass
@@ -0,0 +1,545 @@
+"""
+Ordered funnel analysis.
+
+A funnel is an ordered list of steps (an event_type plus optional property
+predicates), a conversion window and a unit (session or user). A unit enters
+the funnel with a first-step event and converts through later steps only in
+order and within the window of its entry. Results count, per UTC day of entry,
+the units that reached each step; a unit entering on several days counts once
+per day.
+
+Every unit carries, per entry day, the furthest step reached and the latest
+entry time still alive at each intermediate step (a later entry dominates an
+earlier one at the same step, since its window ends later). Applying events in
+time order to this state is exact and needs O(steps) memory per unit.
+
+Funnels are registered when first queried. A background job folds closed event
+partitions into per-unit state and per-day step counts kept in Redis, so a
+query only replays the partitions after the stored cursor on top of them.
+Funnels the worker has not caught up with are evaluated by scanning the event
+partitions of the queried range directly. Results are cached per definition
+and range for FUNNEL_CACHE_TTL seconds.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime, timedelta, date
+from typing import Dict, Any, List, Optional, Tuple
+from redis import ConnectionError, TimeoutError
+
+from .redis_client import analytics_redis
+from .timeseries import to_epoch
+from .event_store import (
+    partition_start,
+    read_partition_events,
+    read_partitions_events,
+    indexed_partitions,
+    EVENT_PARTITION_SECONDS
+)
+from .exceptions import AnalyticsPlatformError, RedisConnectionError, InvalidQueryError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ───────────────────────────────────────
+# Funnel Configuration
+# ───────────────────────────────────────
+
+FUNNEL_UNITS = ('session', 'user')
+FUNNEL_MIN_STEPS = 2
+FUNNEL_MAX_STEPS = int(os.getenv('FUNNEL_MAX_STEPS', 10))
+
+# Conversion window limits (seconds) and the default when a definition omits it
+FUNNEL_DEFAULT_WINDOW = 1800
+FUNNEL_MAX_WINDOW = 7 * 86400
+
+# Entry days a query may cover, counted back from today; also the worker's backfill
+FUNNEL_MAX_RANGE_DAYS = int(os.getenv('FUNNEL_MAX_RANGE_DAYS', 30))
+
+# Seconds query results are cached per funnel definition and range
+FUNNEL_CACHE_TTL = int(os.getenv('FUNNEL_CACHE_TTL', 60))
+
+# Seconds after a partition ends before the worker folds it into the stored state;
+# events written into a partition after that are only seen by scans
+FUNNEL_LATENESS = int(os.getenv('FUNNEL_LATENESS', 300))
+
+# Non-empty partitions folded per funnel per worker run, bounding each run during backfill
+FUNNEL_PARTITIONS_PER_RUN = int(os.getenv('FUNNEL_PARTITIONS_PER_RUN', 168))
+
+# Events a synchronous range scan reads at most; a scan stopping there reports the time it reached
+FUNNEL_SCAN_MAX_EVENTS = int(os.getenv('FUNNEL_SCAN_MAX_EVENTS', 200000))
+
+# Partitions whose first page of events a scan reads per pipelined round trip
+FUNNEL_SCAN_PARTITIONS_PER_READ = 24
+
+# Registered funnels; definitions not queried for FUNNEL_IDLE_TTL seconds are dropped
+MAX_FUNNELS = int(os.getenv('MAX_FUNNELS', 50))
+FUNNEL_IDLE_TTL = int(os.getenv('FUNNEL_IDLE_TTL', 7 * 86400))
+
+# Hash of funnel ID -> definition JSON
+FUNNEL_REGISTRY_KEY = 'funnels'
+
+# Set when stored funnel state may have missed back-dated events; the worker rebuilds it
+FUNNEL_RESET_KEY = 'funnels:reset'
+
+# Held by the worker while it updates funnel state
+FUNNEL_UPDATE_LOCK_KEY = 'funnels:update_lock'
+FUNNEL_UPDATE_LOCK_TTL = 600
+
+def funnel_key(funnel_id: str, part: str) -> str:
+    """
+    Key of one part of a funnel's stored state: 'meta' (cursor, last query time),
+    'units' (unit -> state JSON), 'expiry' (unit -> time its attempts end) and
+    'counts' ('YYYY-MM-DD:step' -> units).
+    """
+    return f'funnel:{funnel_id}:{part}'
+
+# ───────────────────────────────────────
+# Definitions
+# ───────────────────────────────────────
+
+def normalize_funnel(payload: Any) -> Dict[str, Any]:
+    """
+    Validate a funnel definition and return its canonical form:
+    {'steps': [{'event_type', 'where': {property: [values]}}], 'window': seconds, 'by': unit}.
+    A predicate value may be a single value or a list of accepted values.
+    """
+    if not isinstance(payload, dict):
+        raise InvalidQueryError("Funnel definition must be a JSON object")
+    
+    steps = payload.get('steps')
+    if not isinstance(steps, list) or not FUNNEL_MIN_STEPS <= len(steps) <= FUNNEL_MAX_STEPS:
+        raise InvalidQueryError(f"steps must be a list of {FUNNEL_MIN_STEPS} to {FUNNEL_MAX_STEPS} steps")
+    
+    normalized_steps = []
+    for number, step in enumerate(steps, start=1):
+        if not isinstance(step, dict) or not isinstance(step.get('event_type'), str) or not step['event_type'].strip():
+            raise InvalidQueryError(f"Step {number} must be an object with a non-empty event_type")
+        where = step.get('where', {})
+        if not isinstance(where, dict):
+            raise InvalidQueryError(f"Step {number}: where must be an object of property predicates")
+        normalized_steps.append({
+            'event_type': step['event_type'].strip(),
+            'where': {
+                prop: sorted(values if isinstance(values, list) else [values], key=json.dumps)
+                for prop, values in sorted(where.items())
+            }
+        })
+    
+    window = payload.get('window', FUNNEL_DEFAULT_WINDOW)
+    if not isinstance(window, int) or isinstance(window, bool) or not 1 <= window <= FUNNEL_MAX_WINDOW:
+        raise InvalidQueryError(f"window must be a number of seconds between 1 and {FUNNEL_MAX_WINDOW}")
+    
+    by = payload.get('by', 'session')
+    if by not in FUNNEL_UNITS:
+        raise InvalidQueryError(f"by must be one of: {', '.join(FUNNEL_UNITS)}")
+    
+    return {'steps': normalized_steps, 'window': window, 'by': by}
+
+def funnel_id(definition: Dict[str, Any]) -> str:
+    """Stable ID of a canonical funnel definition"""
+    canonical = json.dumps(definition, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]
+
+def _matches(step: Dict[str, Any], event: Dict[str, Any]) -> bool:
+    if event.get('event_type') != step['event_type']:
+        return False
+    properties = event.get('properties') or {}
+    return all(properties.get(prop) in values for prop, values in step['where'].items())
+
+# ───────────────────────────────────────
+# Evaluation
+# ───────────────────────────────────────
+
+class FunnelEvaluator:
+    """
+    Applies events, in time order, to the per-unit state of one funnel.
+    A unit's state maps entry day -> [furthest step, latest live entry time at
+    step 1, ..., at step n-1]. New furthest steps are added to counts, keyed
+    (entry day, step). Units whose state changed are tracked in `changed`.
+    """
+    
+    def __init__(self, definition: Dict[str, Any], states: Optional[Dict[str, Dict[str, list]]] = None):
+        self.steps = definition['steps']
+        self.window = definition['window']
+        self.unit_field = 'session_id' if definition['by'] == 'session' else 'user_id'
+        self.states = states if states is not None else {}
+        self.counts: Dict[Tuple[str, int], int] = {}
+        self.changed = set()
+        self.events = 0
+    
+    def apply(self, event: Dict[str, Any]) -> None:
+        unit = event.get(self.unit_field)
+        if unit is None:
+            return
+        self.events += 1
+        epoch = to_epoch(datetime.fromisoformat(event['timestamp']))
+        state = self.states.get(unit)
+        last = len(self.steps) - 1
+        
+        if state:
+            for day, attempt in state.items():
+                # Deepest step first, so one event never advances an attempt twice
+                for step in range(min(attempt[0], last), 0, -1):
+                    started = attempt[step]
+                    if started is None or epoch - started > self.window or not _matches(self.steps[step], event):
+                        continue
+                    if step + 1 <= last:
+                        attempt[step + 1] = max(attempt[step + 1] or started, started)
+                    if step + 1 > attempt[0]:
+                        attempt[0] = step + 1
+                        self._reached(day, step + 1)
+                    self.changed.add(unit)
+        
+        if _matches(self.steps[0], event):
+            day = datetime.utcfromtimestamp(epoch).strftime('%Y-%m-%d')
+            if state is None:
+                state = self.states[unit] = {}
+            attempt = state.get(day)
+            if attempt is None:
+                attempt = state[day] = [0] + [None] * last
+            if last:
+                attempt[1] = epoch
+            if attempt[0] < 1:
+                attempt[0] = 1
+                self._reached(day, 1)
+            self.changed.add(unit)
+    
+    def _reached(self, day: str, step: int) -> None:
+        self.counts[(day, step)] = self.counts.get((day, step), 0) + 1
+    
+    def _day_expiry(self, day: str, attempt: list) -> int:
+        # The day is remembered until it ends, so a unit entering again that day is not counted twice
+        day_end = to_epoch(datetime.strptime(day, '%Y-%m-%d')) + 86400
+        if attempt[0] >= len(self.steps):
+            return day_end
+        return max([day_end] + [started + self.window for started in attempt[1:] if started is not None])
+    
+    def prune(self, unit: str, now: int) -> Optional[int]:
+        """
+        Forget the unit's entry days that no event from `now` on can change.
+        Returns when the remaining state can be forgotten, or None if nothing remains.
+        """
+        state = self.states.get(unit, {})
+        expiries = {day: self._day_expiry(day, attempt) for day, attempt in state.items()}
+        for day, expires_at in expiries.items():
+            if expires_at < now:
+                del state[day]
+        return max(expiries[day] for day in state) if state else None
+
+def _apply_partition(evaluator: FunnelEvaluator, start: int, events: Optional[List[Dict[str, Any]]] = None,
+                     since: Optional[int] = None, until: Optional[int] = None) -> None:
+    """Apply one partition's events in time order, optionally restricted to [since, until)"""
+    events = read_partition_events(start) if events is None else events
+    events.sort(key=lambda event: (event['timestamp'], event['event_id']))
+    for event in events:
+        if since is not None or until is not None:
+            epoch = to_epoch(datetime.fromisoformat(event['timestamp']))
+            if (since is not None and epoch < since) or (until is not None and epoch >= until):
+                continue
+        evaluator.apply(event)
+
+def _day_bounds(start_day: date, end_day: date) -> Tuple[int, int]:
+    return (
+        to_epoch(datetime.combine(start_day, datetime.min.time())),
+        to_epoch(datetime.combine(end_day + timedelta(days=1), datetime.min.time()))
+    )
+
+def _scan_range(definition: Dict[str, Any], start_day: date, end_day: date, now: int) -> Tuple[FunnelEvaluator, Optional[int]]:
+    """
+    Evaluate entries on the given days from the event partitions alone, oldest
+    first, stopping after FUNNEL_SCAN_MAX_EVENTS events. Only the partitions in
+    the partition index are read, FUNNEL_SCAN_PARTITIONS_PER_READ per round trip.
+    Returns the evaluator and, for a truncated scan, the time up to which events were applied.
+    """
+    range_start, range_end = _day_bounds(start_day, end_day)
+    until = min(range_end + definition['window'], now + 1)
+    evaluator = FunnelEvaluator(definition)
+    starts = indexed_partitions(range_start, until)
+    scanned = 0
+    for offset in range(0, len(starts), FUNNEL_SCAN_PARTITIONS_PER_READ):
+        if scanned >= FUNNEL_SCAN_MAX_EVENTS:
+            return evaluator, starts[offset]
+        partitions = read_partitions_events(starts[offset:offset + FUNNEL_SCAN_PARTITIONS_PER_READ])
+        for start, events in partitions.items():
+            if scanned >= FUNNEL_SCAN_MAX_EVENTS:
+                return evaluator, start
+            scanned += len(events)
+            _apply_partition(evaluator, start, events, since=range_start, until=until)
+    return evaluator, None
+
+def _decode_states(units: List[str], raw_states: List[Optional[bytes]]) -> Dict[str, Dict[str, list]]:
+    return {unit: json.loads(raw) for unit, raw in zip(units, raw_states) if raw}
+
+def _replay_tail(definition: Dict[str, Any], fid: str, cursor: int, now: int) -> Optional[Tuple[FunnelEvaluator, Dict[bytes, bytes]]]:
+    """
+    Replay the partitions from the stored cursor to now on top of the stored
+    state of the units they touch, without writing anything back. Returns the
+    evaluator and the stored counts, or None if the worker moved the cursor meanwhile.
+    """
+    tail = read_partitions_events(indexed_partitions(cursor, now + 1))
+    unit_field = 'session_id' if definition['by'] == 'session' else 'user_id'
+    units = sorted({event[unit_field] for events in tail.values() for event in events if event.get(unit_field)})
+    
+    with analytics_redis.pipeline() as pipe:
+        pipe.hget(funnel_key(fid, 'meta'), 'cursor')
+        pipe.hgetall(funnel_key(fid, 'counts'))
+        if units:
+            pipe.hmget(funnel_key(fid, 'units'), units)
+        results = pipe.execute()
+    
+    if results[0] is None or int(results[0]) != cursor:
+        return None
+    
+    evaluator = FunnelEvaluator(definition, _decode_states(units, results[2]) if units else {})
+    for start, events in tail.items():
+        _apply_partition(evaluator, start, events)
+    return evaluator, results[1]
+
+def _summarize(definition: Dict[str, Any], counts: Dict[Tuple[str, int], int], start_day: date, end_day: date) -> List[Dict[str, Any]]:
+    """Per-step totals over the entry days of the range, with step-to-step conversion"""
+    days = {(start_day + timedelta(days=i)).isoformat() for i in range((end_day - start_day).days + 1)}
+    totals = [0] * len(definition['steps'])
+    for (day, step), count in counts.items():
+        if day in days:
+            totals[step - 1] += count
+    
+    summary = []
+    for index, step in enumerate(definition['steps']):
+        previous = totals[index - 1] if index else totals[0]
+        summary.append({
+            'step': index + 1,
+            'event_type': step['event_type'],
+            'where': step['where'],
+            'count': totals[index],
+            'conversion_from_previous': round(totals[index] / previous * 100, 2) if previous else 0,
+            'conversion_from_start': round(totals[index] / totals[0] * 100, 2) if totals[0] else 0
+        })
+    return summary
+
+def _register(fid: str, definition: Dict[str, Any], now: int) -> Optional[int]:
+    """
+    Register a funnel for incremental updates (if there is room) and record the
+    query time. Returns the stored cursor, or None if the funnel is not tracked.
+    """
+    meta_key = funnel_key(fid, 'meta')
+    with analytics_redis.pipeline(transaction=False) as pipe:
+        pipe.hget(meta_key, 'cursor')
+        pipe.hlen(FUNNEL_REGISTRY_KEY)
+        pipe.get(FUNNEL_RESET_KEY)
+        cursor, registered, reset_pending = pipe.execute()
+    
+    if cursor is None and registered >= MAX_FUNNELS:
+        return None
+    
+    with analytics_redis.pipeline() as pipe:
+        if cursor is None:
+            pipe.hset(FUNNEL_REGISTRY_KEY, fid, json.dumps(definition))
+            pipe.hsetnx(meta_key, 'cursor', _backfill_start(now))
+        pipe.hset(meta_key, 'last_queried', now)
+        pipe.execute()
+    
+    if cursor is None:
+        logger.info(f"Registered funnel {fid} for incremental evaluation")
+        return None
+    return None if reset_pending else int(cursor)
+
+def evaluate_funnel(definition: Dict[str, Any], start_day: date, end_day: date) -> Dict[str, Any]:
+    """
+    Count the units entering a (normalized) funnel on each day of the inclusive
+    range and how far they got. Uses the stored incremental state when replaying
+    its tail is cheaper than scanning the range, and caches the result.
+    """
+    today = datetime.utcnow().date()
+    if end_day < start_day:
+        raise InvalidQueryError("'to' must not be earlier than 'from'")
+    if end_day > today or start_day < today - timedelta(days=FUNNEL_MAX_RANGE_DAYS - 1):
+        raise InvalidQueryError(f"Funnel ranges must lie within the last {FUNNEL_MAX_RANGE_DAYS} days")
+    
+    fid = funnel_id(definition)
+    cache_key = funnel_key(fid, f'result:{start_day.isoformat()}:{end_day.isoformat()}')
+    try:
+        cached = analytics_redis.get(cache_key)
+        if cached:
+            return {**json.loads(cached), 'cached': True}
+        
+        started = time.perf_counter()
+        now = int(time.time())
+        cursor = _register(fid, definition, now)
+        range_start, range_end = _day_bounds(start_day, end_day)
+        scan_cost = min(range_end + definition['window'], now) - range_start
+        
+        replayed = None
+        scanned_through = None
+        if cursor is not None and now - cursor < scan_cost:
+            replayed = _replay_tail(definition, fid, cursor, now)
+        
+        if replayed is not None:
+            evaluator, stored_counts = replayed
+            counts = dict(evaluator.counts)
+            for field, value in stored_counts.items():
+                day, step = field.decode('utf-8').rsplit(':', 1)
+                counts[(day, int(step))] = counts.get((day, int(step)), 0) + int(value)
+            method = 'incremental'
+        else:
+            evaluator, scanned_through = _scan_range(definition, start_day, end_day, now)
+            counts = evaluator.counts
+            method = 'scan'
+        
+        steps = _summarize(definition, counts, start_day, end_day)
+        result = {
+            'funnel_id': fid,
+            'definition': definition,
+            'from': start_day.isoformat(),
+            'to': end_day.isoformat(),
+            'steps': steps,
+            'overall_conversion': steps[-1]['conversion_from_start'],
+            'evaluation': method,
+            'events_scanned': evaluator.events,
+            'truncated': scanned_through is not None,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+            'computed_at': datetime.utcnow().isoformat()
+        }
+        if scanned_through is not None:
+            result['scanned_through'] = datetime.utcfromtimestamp(scanned_through).isoformat()
+        analytics_redis.set(cache_key, json.dumps(result), ex=FUNNEL_CACHE_TTL)
+        logger.info(f"Evaluated funnel {fid} by {method} over {evaluator.events} events")
+        return {**result, 'cached': False}
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while evaluating funnel {fid}: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except AnalyticsPlatformError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to evaluate funnel {fid}: {e}")
+        raise AnalyticsPlatformError(f"Funnel evaluation failed: {e}")
+
+# ───────────────────────────────────────
+# Incremental Updates (worker)
+# ───────────────────────────────────────
+
+def _backfill_start(now: int) -> int:
+    """First partition folded into a newly registered funnel: the start of the oldest queryable day"""
+    oldest_day = datetime.utcfromtimestamp(now).date() - timedelta(days=FUNNEL_MAX_RANGE_DAYS - 1)
+    return partition_start(datetime.combine(oldest_day, datetime.min.time()))
+
+def invalidate_funnels() -> None:
+    """Have the worker rebuild every funnel's state, e.g. after back-dated events were written"""
+    analytics_redis.set(FUNNEL_RESET_KEY, 1)
+
+def _reset_funnel(fid: str, now: int) -> None:
+    with analytics_redis.pipeline() as pipe:
+        pipe.unlink(funnel_key(fid, 'units'), funnel_key(fid, 'expiry'), funnel_key(fid, 'counts'))
+        pipe.hset(funnel_key(fid, 'meta'), 'cursor', _backfill_start(now))
+        pipe.execute()
+
+def _drop_funnel(fid: str) -> None:
+    with analytics_redis.pipeline() as pipe:
+        pipe.unlink(*(funnel_key(fid, part) for part in ('meta', 'units', 'expiry', 'counts')))
+        pipe.hdel(FUNNEL_REGISTRY_KEY, fid)
+        pipe.execute()
+
+def _fold_partition(fid: str, definition: Dict[str, Any], start: int) -> int:
+    """
+    Fold one closed partition into a funnel's stored state: per-unit state,
+    unit expiry, day counts and the cursor are written in one transaction.
+    Units whose attempts can no longer advance are removed. Returns the events applied.
+    """
+    events = read_partition_events(start)
+    unit_field = 'session_id' if definition['by'] == 'session' else 'user_id'
+    units = sorted({event[unit_field] for event in events if event.get(unit_field)})
+    stored = analytics_redis.hmget(funnel_key(fid, 'units'), units) if units else []
+    evaluator = FunnelEvaluator(definition, _decode_states(units, stored))
+    _apply_partition(evaluator, start, events)
+    
+    partition_end = start + EVENT_PARTITION_SECONDS
+    expired = analytics_redis.zrangebyscore(funnel_key(fid, 'expiry'), '-inf', f'({partition_end}')
+    ended = {unit.decode('utf-8') for unit in expired} - evaluator.changed
+    
+    with analytics_redis.pipeline() as pipe:
+        for unit in evaluator.changed:
+            expires_at = evaluator.prune(unit, partition_end)
+            if expires_at is None:
+                ended.add(unit)
+                continue
+            pipe.hset(funnel_key(fid, 'units'), unit, json.dumps(evaluator.states[unit]))
+            pipe.zadd(funnel_key(fid, 'expiry'), {unit: expires_at})
+        if ended:
+            pipe.hdel(funnel_key(fid, 'units'), *ended)
+            pipe.zrem(funnel_key(fid, 'expiry'), *ended)
+        for (day, step), count in evaluator.counts.items():
+            pipe.hincrby(funnel_key(fid, 'counts'), f'{day}:{step}', count)
+        pipe.hset(funnel_key(fid, 'meta'), 'cursor', partition_end)
+        pipe.execute()
+    return evaluator.events
+
+def _prune_counts(fid: str, now: int) -> None:
+    """Delete day counts older than the queryable range"""
+    oldest = (datetime.utcfromtimestamp(now).date() - timedelta(days=FUNNEL_MAX_RANGE_DAYS - 1)).isoformat()
+    expired = [field for field in analytics_redis.hkeys(funnel_key(fid, 'counts')) if field.decode('utf-8') < oldest]
+    if expired:
+        analytics_redis.hdel(funnel_key(fid, 'counts'), *expired)
+
+def update_funnels() -> Dict[str, Any]:
+    """
+    Worker entry point: fold every closed partition past each registered funnel's
+    cursor into its stored state, at most FUNNEL_PARTITIONS_PER_RUN per funnel.
+    Funnels not queried for FUNNEL_IDLE_TTL are dropped. Returns per-run statistics.
+    """
+    stats = {'funnels': 0, 'partitions': 0, 'events': 0, 'dropped': 0, 'reset': False}
+    try:
+        if not analytics_redis.set(FUNNEL_UPDATE_LOCK_KEY, 1, ex=FUNNEL_UPDATE_LOCK_TTL, nx=True):
+            logger.info("Funnel update already running, skipping")
+            return stats
+        
+        try:
+            now = int(time.time())
+            registry = analytics_redis.hgetall(FUNNEL_REGISTRY_KEY)
+            reset = analytics_redis.get(FUNNEL_RESET_KEY) is not None
+            
+            for fid_bytes, raw_definition in registry.items():
+                fid = fid_bytes.decode('utf-8')
+                definition = json.loads(raw_definition)
+                meta = analytics_redis.hgetall(funnel_key(fid, 'meta'))
+                last_queried = int(meta.get(b'last_queried', 0))
+                if now - last_queried > FUNNEL_IDLE_TTL:
+                    _drop_funnel(fid)
+                    stats['dropped'] += 1
+                    continue
+                
+                if reset or b'cursor' not in meta:
+                    _reset_funnel(fid, now)
+                    cursor = _backfill_start(now)
+                else:
+                    cursor = int(meta[b'cursor'])
+                
+                # Only partitions closed for FUNNEL_LATENESS are folded; queries replay the rest.
+                # Empty partitions are cheap and do not count towards the per-run limit.
+                folded = 0
+                while cursor + EVENT_PARTITION_SECONDS + FUNNEL_LATENESS <= now and folded < FUNNEL_PARTITIONS_PER_RUN:
+                    applied = _fold_partition(fid, definition, cursor)
+                    cursor += EVENT_PARTITION_SECONDS
+                    folded += 1 if applied else 0
+                    stats['events'] += applied
+                _prune_counts(fid, now)
+                stats['funnels'] += 1
+                stats['partitions'] += folded
+            
+            if reset:
+                analytics_redis.unlink(FUNNEL_RESET_KEY)
+                stats['reset'] = True
+        finally:
+            analytics_redis.unlink(FUNNEL_UPDATE_LOCK_KEY)
+        
+        logger.info(f"Funnel update completed: {stats}")
+        return stats
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while updating funnels: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to update funnels: {e}")
+        raise AnalyticsPlatformError(f"Funnel update failed: {e}")
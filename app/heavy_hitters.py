@@ -0,0 +1,217 @@
+"""
+Top-K (heavy hitter) tracking for high-cardinality properties.
+
+For every property listed in TOPK_PROPERTIES, each event increments its value's
+score in a sorted set per UTC hour, on the event's existing pipeline. A
+periodic worker job trims every hour bucket back to its TOPK_BUCKET_CAPACITY
+highest-scoring values, so memory stays bounded however many distinct values
+(pages, referrers) arrive. The top values over a window are the ZUNIONSTORE of
+its hour buckets.
+
+Trimming makes counts lower bounds. When a bucket is trimmed, the highest score
+removed is added to that bucket's error counter. A value's count over a window
+is at most its reported count plus the sum of the window's error counters
+(reported as max_error), and it is exact while no bucket of the window has
+been trimmed.
+"""
+import os
+import uuid
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from redis import ConnectionError, TimeoutError
+
+from .redis_client import analytics_redis
+from .timeseries import to_epoch
+from .property_index import index_value
+from .exceptions import AnalyticsPlatformError, RedisConnectionError, InvalidQueryError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ───────────────────────────────────────
+# Top-K Configuration
+# ───────────────────────────────────────
+
+# Properties whose most frequent values are tracked per hour
+TOPK_PROPERTIES = tuple(
+    prop.strip() for prop in os.getenv('TOPK_PROPERTIES', 'page_url,referrer,product_name').split(',')
+    if prop.strip()
+)
+
+# Values kept per property and hour after each trim
+TOPK_BUCKET_CAPACITY = int(os.getenv('TOPK_BUCKET_CAPACITY', 1000))
+
+# Hours of buckets kept; also the longest window that can be queried
+TOPK_RETENTION_HOURS = int(os.getenv('TOPK_RETENTION_HOURS', 168))
+
+# Values returned per query by default
+TOPK_DEFAULT_K = 10
+
+# Seconds a query's scratch union lives if the connection drops before it is unlinked
+TOPK_SCRATCH_TTL = 60
+
+# KEYS: bucket, its error counter
+# ARGV: capacity
+# Removes all but the `capacity` highest-scoring values and adds the highest
+# removed score to the error counter, which expires with the bucket.
+# Returns the number of values removed
+TRIM_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local removed = redis.call('ZRANGE', KEYS[1], -(capacity + 1), -(capacity + 1), 'WITHSCORES')
+if #removed == 0 then
+    return 0
+end
+local count = redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -(capacity + 1))
+redis.call('INCRBY', KEYS[2], math.floor(tonumber(removed[2])))
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl > 0 then
+    redis.call('PEXPIRE', KEYS[2], ttl)
+end
+return count
+"""
+
+_trim_bucket_script = analytics_redis.register_script(TRIM_BUCKET_SCRIPT)
+
+def topk_key(prop: str, hour: datetime) -> str:
+    """Sorted set of value -> count for one property in one UTC hour"""
+    return f"topk:{prop}:{hour.strftime('%Y-%m-%d-%H')}"
+
+def topk_error_key(prop: str, hour: datetime) -> str:
+    """Upper bound on the count any value lost to trimming in one bucket"""
+    return f'{topk_key(prop, hour)}:error'
+
+def _window_hours(hours: int, now: Optional[datetime] = None) -> List[datetime]:
+    """Starts of the last `hours` hour buckets, the current (partial) hour included"""
+    current = (now or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+    return [current - timedelta(hours=i) for i in range(hours)]
+
+def parse_window(window: str) -> int:
+    """Number of hours in a window such as '24h' or '7d'"""
+    try:
+        value, unit = int(window[:-1]), window[-1:]
+    except ValueError:
+        raise InvalidQueryError("window must look like '24h' or '7d'")
+    hours = {'h': value, 'd': value * 24}.get(unit)
+    if hours is None:
+        raise InvalidQueryError("window must look like '24h' or '7d'")
+    if not 1 <= hours <= TOPK_RETENTION_HOURS:
+        raise InvalidQueryError(f"window must be between 1h and {TOPK_RETENTION_HOURS}h")
+    return hours
+
+# ───────────────────────────────────────
+# Write Path
+# ───────────────────────────────────────
+
+def queue_top_value_writes(pipe, properties: Dict[str, Any], event_time: datetime) -> None:
+    """Queue the score increments for an event's tracked property values onto a pipeline"""
+    if not properties:
+        return
+    
+    hour = event_time.replace(minute=0, second=0, microsecond=0)
+    expire_at = None
+    for prop in TOPK_PROPERTIES:
+        value = index_value(properties.get(prop))
+        if value is None:
+            continue
+        if expire_at is None:
+            expire_at = to_epoch(hour) + 3600 + TOPK_RETENTION_HOURS * 3600
+        key = topk_key(prop, hour)
+        pipe.zincrby(key, 1, value)
+        pipe.expireat(key, expire_at)
+
+def trim_top_values(now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Trim every retained hour bucket that holds more than TOPK_BUCKET_CAPACITY
+    values. One pipelined ZCARD per bucket finds them; each is trimmed atomically
+    by a Lua script. Returns the number of buckets trimmed and values removed.
+    """
+    buckets = [(prop, hour) for prop in TOPK_PROPERTIES for hour in _window_hours(TOPK_RETENTION_HOURS, now)]
+    stats = {'buckets_trimmed': 0, 'values_removed': 0}
+    try:
+        with analytics_redis.pipeline(transaction=False) as pipe:
+            for prop, hour in buckets:
+                pipe.zcard(topk_key(prop, hour))
+            sizes = pipe.execute()
+        
+        full = [bucket for bucket, size in zip(buckets, sizes) if size > TOPK_BUCKET_CAPACITY]
+        if not full:
+            return stats
+        
+        with analytics_redis.pipeline(transaction=False) as pipe:
+            for prop, hour in full:
+                pipe.run_script(_trim_bucket_script, [topk_key(prop, hour), topk_error_key(prop, hour)], [TOPK_BUCKET_CAPACITY])
+            removed = pipe.execute()
+        
+        stats['buckets_trimmed'] = len(full)
+        stats['values_removed'] = sum(removed)
+        logger.info(f"Trimmed {stats['buckets_trimmed']} top-K buckets, removing {stats['values_removed']} values")
+        return stats
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while trimming top-K buckets: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to trim top-K buckets: {e}")
+        raise AnalyticsPlatformError(f"Top-K trim failed: {e}")
+
+# ───────────────────────────────────────
+# Read Path
+# ───────────────────────────────────────
+
+def _queue_window_reads(pipe, prop: str, hours: List[datetime], k: int) -> None:
+    """Queue the six commands reading the top `k` values of a property over the given hour buckets"""
+    scratch_key = f'topk:scratch:{uuid.uuid4().hex}'
+    pipe.zunionstore(scratch_key, [topk_key(prop, hour) for hour in hours])
+    pipe.expire(scratch_key, TOPK_SCRATCH_TTL)
+    pipe.zrevrange(scratch_key, 0, k - 1, withscores=True)
+    pipe.zcard(scratch_key)
+    pipe.unlink(scratch_key)
+    pipe.mget([topk_error_key(prop, hour) for hour in hours])
+
+def _window_result(results: list) -> Dict[str, Any]:
+    _, _, top, tracked, _, errors = results
+    return {
+        'values': [{'value': value.decode('utf-8'), 'count': int(score)} for value, score in top],
+        'values_tracked': tracked,
+        'max_error': sum(int(error) for error in errors if error)
+    }
+
+def top_values(prop: str, hours: int, k: int = TOPK_DEFAULT_K) -> Dict[str, Any]:
+    """The `k` most frequent values of a tracked property over the last `hours` hours"""
+    if prop not in TOPK_PROPERTIES:
+        raise InvalidQueryError(f"property must be one of: {', '.join(TOPK_PROPERTIES)}")
+    if not 1 <= k <= TOPK_BUCKET_CAPACITY:
+        raise InvalidQueryError(f"k must be between 1 and {TOPK_BUCKET_CAPACITY}")
+    
+    window = _window_hours(hours)
+    try:
+        with analytics_redis.pipeline(transaction=False) as pipe:
+            _queue_window_reads(pipe, prop, window, k)
+            results = pipe.execute()
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while reading top {prop} values: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to read top {prop} values: {e}")
+        raise AnalyticsPlatformError(f"Top-K query failed: {e}")
+    
+    return {
+        'property': prop,
+        'window_hours': hours,
+        'from': window[-1].isoformat(),
+        'k': k,
+        **_window_result(results)
+    }
+
+def top_values_summary(hours: int = 24, k: int = 5) -> Dict[str, List[Dict[str, Any]]]:
+    """Top `k` values of every tracked property over the last `hours` hours, read in one pipeline"""
+    window = _window_hours(hours)
+    with analytics_redis.pipeline(transaction=False) as pipe:
+        for prop in TOPK_PROPERTIES:
+            _queue_window_reads(pipe, prop, window, k)
+        results = pipe.execute()
+    return {
+        prop: _window_result(results[i * 6:(i + 1) * 6])['values']
+        for i, prop in enumerate(TOPK_PROPERTIES)
+    }
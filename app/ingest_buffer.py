@@ -0,0 +1,186 @@
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+# Configure logging for ingest buffering
+logger = logging.getLogger(__name__)
+
+class IngestBufferFullError(Exception):
+    """Exception raised when the ingest buffer cannot accept more events"""
+    pass
+
+class IngestBuffer:
+    """
+    Bounded in-process write-behind buffer for event ingestion.
+    Events are appended to a queue and a background flusher thread drains them
+    into Redis in size- or time-bounded batches through the supplied flush function.
+    """
+    
+    def __init__(self, flush_fn: Callable[[List[Any]], None], max_size: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 0.05,
+                 put_timeout: float = 0.0, max_retries: int = 3):
+        self.flush_fn = flush_fn
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=max_size)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        
+        # Counters
+        self._enqueued_total = 0
+        self._flushed_total = 0
+        self._dropped_total = 0
+        self._rejected_total = 0
+        self._flush_count = 0
+        self._flush_latency_total = 0.0
+        self._last_flush_latency = 0.0
+        self._max_flush_latency = 0.0
+    
+    def _ensure_started(self):
+        """Start the flusher thread lazily, restarting it in forked worker processes"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        
+        with self._lock:
+            if self._pid != os.getpid():
+                # Threads do not survive fork; discard inherited state
+                self._queue = queue.Queue(maxsize=self.max_size)
+                self._thread = None
+            
+            if self._thread is None or not self._thread.is_alive():
+                self._stop_event.clear()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='analytics-ingest-flusher',
+                    daemon=True
+                )
+                self._thread.start()
+                logger.info(f"Ingest buffer flusher started (max_size={self.max_size}, batch_size={self.batch_size})")
+    
+    def put(self, item: Any) -> None:
+        """
+        Append an item to the buffer. Blocks for up to put_timeout seconds when
+        the buffer is full, then raises IngestBufferFullError.
+        """
+        self._ensure_started()
+        try:
+            if self.put_timeout > 0:
+                self._queue.put(item, block=True, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            self._rejected_total += 1
+            raise IngestBufferFullError(f"Ingest buffer is full ({self.max_size} events pending)")
+        self._enqueued_total += 1
+    
+    def _collect_batch(self) -> List[Any]:
+        """Wait for the first item, then gather more until the batch is full or the interval elapses"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _drain_available(self) -> List[Any]:
+        """Take up to batch_size items that are already queued without waiting"""
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _flush(self, batch: List[Any]) -> None:
+        """Flush a batch with retries, dropping it after max_retries failures"""
+        for attempt in range(1, self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                self.flush_fn(batch)
+            except Exception as e:
+                logger.error(f"Ingest buffer flush of {len(batch)} events failed (attempt {attempt}/{self.max_retries}): {e}")
+                if attempt < self.max_retries and not self._stop_event.is_set():
+                    time.sleep(min(0.1 * 2 ** attempt, 2.0))
+                continue
+            
+            latency = time.perf_counter() - start
+            self._flushed_total += len(batch)
+            self._flush_count += 1
+            self._flush_latency_total += latency
+            self._last_flush_latency = latency
+            self._max_flush_latency = max(self._max_flush_latency, latency)
+            return
+        
+        self._dropped_total += len(batch)
+        logger.error(f"Dropped {len(batch)} buffered events after {self.max_retries} failed flush attempts")
+    
+    def _run(self):
+        """Flusher thread main loop"""
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._flush(batch)
+    
+    def drain(self, timeout: float = 10.0) -> int:
+        """
+        Stop the flusher thread and synchronously flush everything still queued.
+        Returns the number of events flushed during the drain.
+        """
+        if self._pid is not None and self._pid != os.getpid():
+            # Queue contents were inherited from the parent process and belong to it
+            return 0
+        
+        self._stop_event.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=max(self.flush_interval * 2, 1.0))
+        
+        flushed_before = self._flushed_total
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            batch = self._drain_available()
+            if not batch:
+                break
+            self._flush(batch)
+        
+        remaining = self._queue.qsize()
+        if remaining:
+            logger.warning(f"Ingest buffer drain timed out with {remaining} events still queued")
+        drained = self._flushed_total - flushed_before
+        logger.info(f"Ingest buffer drained: {drained} events flushed")
+        return drained
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and flush counters"""
+        avg_latency = (self._flush_latency_total / self._flush_count) if self._flush_count else 0.0
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_size': self.max_size,
+            'enqueued_total': self._enqueued_total,
+            'flushed_total': self._flushed_total,
+            'dropped_total': self._dropped_total,
+            'rejected_total': self._rejected_total,
+            'flush_count': self._flush_count,
+            'last_flush_latency_ms': round(self._last_flush_latency * 1000, 3),
+            'avg_flush_latency_ms': round(avg_latency * 1000, 3),
+            'max_flush_latency_ms': round(self._max_flush_latency * 1000, 3)
+        }
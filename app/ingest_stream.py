@@ -0,0 +1,69 @@
+import os
+import logging
+from typing import Dict, Any
+from redis import ConnectionError, TimeoutError
+
+from .redis_client import analytics_redis
+from .event_codec import encode_event
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ───────────────────────────────────────
+# Ingest Stream Configuration
+# ───────────────────────────────────────
+
+# Stream that POST /events/ appends to when INGEST_MODE=stream
+INGEST_STREAM_KEY = os.getenv('INGEST_STREAM_KEY', 'events:ingest')
+
+# Consumer group shared by every stream worker; adding workers adds consumers
+INGEST_STREAM_GROUP = os.getenv('INGEST_STREAM_GROUP', 'event-processors')
+
+# Approximate cap on stream length; the oldest entries are trimmed beyond it,
+# so this bounds how far consumers may fall behind before events are lost
+INGEST_STREAM_MAXLEN = int(os.getenv('INGEST_STREAM_MAXLEN', 100000))
+
+# Stream that receives entries which could not be decoded
+INGEST_DEAD_LETTER_KEY = f'{INGEST_STREAM_KEY}:dead'
+
+# Field holding the encoded event in each stream entry
+EVENT_FIELD = 'e'
+
+# ───────────────────────────────────────
+# Producer
+# ───────────────────────────────────────
+
+def append_event(event_data: Dict[str, Any]) -> None:
+    """Append an event record to the ingest stream with a single XADD"""
+    analytics_redis.xadd(INGEST_STREAM_KEY, {EVENT_FIELD: encode_event(event_data)}, maxlen=INGEST_STREAM_MAXLEN)
+
+def queue_stream_append(pipe, event_data: Dict[str, Any]) -> None:
+    """Queue the XADD of an event record onto the ingest stream"""
+    pipe.xadd(INGEST_STREAM_KEY, {EVENT_FIELD: encode_event(event_data)}, maxlen=INGEST_STREAM_MAXLEN)
+
+def ensure_consumer_group() -> bool:
+    """Create the ingest stream and its consumer group if needed; returns True if created"""
+    created = analytics_redis.xgroup_create(INGEST_STREAM_KEY, INGEST_STREAM_GROUP, id='0', mkstream=True)
+    if created:
+        logger.info(f"Created consumer group {INGEST_STREAM_GROUP} on {INGEST_STREAM_KEY}")
+    return created
+
+def get_stream_stats() -> Dict[str, Any]:
+    """
+    Return the ingest stream length and the consumer group's pending entries.
+    The group is created if needed, so events appended before the first worker
+    starts are still delivered to it.
+    """
+    try:
+        ensure_consumer_group()
+        pending = analytics_redis.xpending(INGEST_STREAM_KEY, INGEST_STREAM_GROUP)
+        return {
+            'stream': INGEST_STREAM_KEY,
+            'group': INGEST_STREAM_GROUP,
+            'length': analytics_redis.xlen(INGEST_STREAM_KEY),
+            'pending': pending['pending'],
+            'consumers_with_pending': len(pending['consumers'])
+        }
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while reading ingest stream stats: {e}")
+        return {'stream': INGEST_STREAM_KEY, 'error': str(e)}
@@ -1,8 +1,202 @@
 import os
+import sys
+import json
+import queue
+import atexit
 import logging
 import logging.config
+import threading
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
 
+# Run handlers on a background listener thread; false writes synchronously from the calling thread
+LOG_ASYNC = os.getenv('LOG_ASYNC', 'true').lower() == 'true'
+
+# Records buffered for the listener thread; further records are dropped (and counted) while full
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+
+# Seconds a record that must not be lost (ERROR and above, or from a lossless logger)
+# waits for room in a full queue before it is dropped after all
+LOG_QUEUE_BLOCK_SECONDS = float(os.getenv('LOG_QUEUE_BLOCK_SECONDS', 1.0))
+
+# Records below ERROR passed per second for each logger and message template (0 disables; queued mode only)
+LOG_SAMPLE_PER_SECOND = int(os.getenv('LOG_SAMPLE_PER_SECOND', 20))
+
+# Loggers never sampled, and waited for rather than dropped while the queue is full:
+# the access log and the auth audit trail must keep every line
+LOG_LOSSLESS_LOGGERS = frozenset(
+    name.strip() for name in os.getenv('LOG_LOSSLESS_LOGGERS', 'app.routes,app.auth').split(',')
+    if name.strip()
+)
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: standard fields, the message and any extra= fields"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'file': record.filename,
+            'line': record.lineno,
+            'message': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry.setdefault(key, value)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class MessageRateSampler(logging.Filter):
+    """
+    Pass at most max_per_second records per (logger, message template) each
+    second, below ERROR, from loggers other than the exempt ones. The template
+    is the unformatted msg, so high-volume lines must log with lazy %-style
+    arguments to be grouped. The first record let through after a suppressed
+    burst reports how many were dropped.
+    """
+    
+    def __init__(self, max_per_second: int, exempt_loggers=frozenset()):
+        super().__init__()
+        self.max_per_second = max_per_second
+        self.exempt_loggers = exempt_loggers
+        self._second = 0
+        self._windows = {}  # (logger, template) -> [passed, suppressed]
+        self._lock = threading.Lock()
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR or not isinstance(record.msg, str):
+            return True
+        if record.name in self.exempt_loggers:
+            return True
+        
+        second = int(record.created)
+        key = (record.name, record.msg)
+        with self._lock:
+            if second != self._second:
+                # New second: forget the counts, keeping only templates with drops still to report
+                self._second = second
+                self._windows = {k: [0, w[1]] for k, w in self._windows.items() if w[1]}
+            window = self._windows.setdefault(key, [0, 0])
+            if window[0] >= self.max_per_second:
+                window[1] += 1
+                return False
+            window[0] += 1
+            suppressed, window[1] = window[1], 0
+        
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar messages suppressed]"
+        return True
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without blocking, dropping them while
+    the queue is full. Records at ERROR and above and those of the lossless
+    loggers wait up to block_seconds for room instead. Unlike QueueHandler the
+    record is not formatted here: the queue is in-process, so formatting (and
+    the %-interpolation of its arguments) happens on the listener thread.
+    """
+    
+    def __init__(self, log_queue: queue.Queue, lossless_loggers=frozenset(), block_seconds: float = 0):
+        super().__init__(log_queue)
+        self.lossless_loggers = lossless_loggers
+        self.block_seconds = block_seconds
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        lossless = record.levelno >= logging.ERROR or record.name in self.lossless_loggers
+        try:
+            if lossless and self.block_seconds:
+                self.queue.put(record, timeout=self.block_seconds)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 10000 == 0:
+                sys.stderr.write(f"Log queue full, {self.dropped} records dropped so far\n")
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener whose stop() waits for room in a full queue instead of raising queue.Full"""
+    
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+class LoggerRouter(logging.Handler):
+    """Listener-side handler: dispatch each record to the handlers configured for its logger"""
+    
+    def __init__(self, routes: dict):
+        super().__init__()
+        self.routes = routes
+        self._resolved = {}
+    
+    def _handlers_for(self, name: str) -> list:
+        handlers = self._resolved.get(name)
+        if handlers is None:
+            # Records of unconfigured child loggers propagated to their nearest configured ancestor
+            ancestor = name
+            while ancestor not in self.routes:
+                ancestor = ancestor.rpartition('.')[0] if '.' in ancestor else ''
+            handlers = self._resolved[name] = self.routes[ancestor]
+        return handlers
+    
+    def handle(self, record: logging.LogRecord) -> bool:
+        for handler in self._handlers_for(record.name):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+# Queue pipeline state, rebuilt by setup_logging and in forked children
+_log_queue_handler = None
+_log_listener = None
+
+def stop_log_listener() -> None:
+    """Flush queued records through the handlers and stop the listener thread"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+def _restart_log_listener_after_fork() -> None:
+    """A forked child (e.g. an RQ work horse) inherits the queue but not the listener thread"""
+    global _log_listener
+    if _log_queue_handler is None or _log_listener is None:
+        return
+    _log_queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    _log_listener = DrainingQueueListener(_log_queue_handler.queue, *_log_listener.handlers)
+    _log_listener.start()
+
+def _start_queue_logging(logger_names) -> None:
+    """Move the configured handlers behind one queue and a listener thread routing by logger"""
+    global _log_queue_handler, _log_listener
+    routes = {}
+    queue_handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE), LOG_LOSSLESS_LOGGERS, LOG_QUEUE_BLOCK_SECONDS)
+    if LOG_SAMPLE_PER_SECOND:
+        queue_handler.addFilter(MessageRateSampler(LOG_SAMPLE_PER_SECOND, LOG_LOSSLESS_LOGGERS))
+    
+    for name in logger_names:
+        configured = logging.getLogger(name)
+        routes[name] = list(configured.handlers)
+        for handler in routes[name]:
+            configured.removeHandler(handler)
+        configured.addHandler(queue_handler)
+    
+    _log_queue_handler = queue_handler
+    _log_listener = DrainingQueueListener(queue_handler.queue, LoggerRouter(routes))
+    _log_listener.start()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_log_listener_after_fork)
+
+# Runs before logging's own shutdown (atexit is last in, first out)
+atexit.register(stop_log_listener)
+
 def setup_logging():
     """
     Configure logging for the Analytics Platform with appropriate levels,
@@ -31,7 +225,7 @@ def setup_logging():
                 'format': '%(levelname)s - %(name)s - %(message)s'
             },
             'json': {
-                'format': '{"timestamp": "%(asctime)s", "level": "%(levelname)s", "logger": "%(name)s", "file": "%(filename)s", "line": %(lineno)d, "message": "%(message)s"}',
+                '()': JsonFormatter,
                 'datefmt': '%Y-%m-%dT%H:%M:%S'
             }
         },
@@ -119,12 +313,17 @@ def setup_logging():
         }
     }
     
-    # Apply the configuration
+    # Apply the configuration, flushing any previous pipeline into the old handlers first
+    stop_log_listener()
     logging.config.dictConfig(logging_config)
     
+    # Handlers run on the listener thread; callers only enqueue the record
+    if LOG_ASYNC:
+        _start_queue_logging(logging_config['loggers'])
+    
     # Log startup information
     logger = logging.getLogger('app')
-    logger.info(f"Logging configured for {flask_env} environment with level {log_level}")
+    logger.info(f"Logging configured for {flask_env} environment with level {log_level} ({'queued' if LOG_ASYNC else 'synchronous'} handlers)")
     logger.info(f"Log files will be stored in: {os.path.abspath(log_dir)}")
     
     return logger
@@ -142,6 +341,8 @@ def log_request_info(request, response_status, processing_time=None):
     Log request information in a structured format for access logs
     """
     logger = get_request_logger()
+    if not logger.isEnabledFor(logging.INFO):
+        return
     
     # Extract request information
     request_info = {
@@ -165,7 +366,7 @@ def log_request_info(request, response_status, processing_time=None):
         request_info['authenticated'] = False
     
     # Log as structured data
-    logger.info(f"Request processed", extra=request_info)
+    logger.info("Request processed", extra=request_info)
 
 def log_auth_event(event_type, user_info=None, success=True, details=None):
     """
@@ -186,4 +387,4 @@ def log_auth_event(event_type, user_info=None, success=True, details=None):
         auth_event['details'] = details
     
     level = logging.INFO if success else logging.WARNING
-    logger.log(level, f"Auth event: {event_type}", extra=auth_event) 
\ No newline at end of file
+    logger.log(level, "Auth event: %s", event_type, extra=auth_event) 
\ No newline at end of file
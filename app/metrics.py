@@ -0,0 +1,146 @@
+"""
+Prometheus metrics for the API, served in text format by GET /metrics.
+
+Under gunicorn set PROMETHEUS_MULTIPROC_DIR: every worker process then records
+into its own mmap-backed files in that directory and /metrics merges them, so
+the numbers are correct whichever worker answers the scrape (gunicorn.conf.py
+cleans up after exited workers). Recording a request costs a few dictionary
+lookups and mmap writes; queue length is read from Redis only when scraped.
+"""
+import os
+import time
+import logging
+from flask import request, g
+
+# The multiprocess store must exist before the first metric is created
+METRICS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+if METRICS_MULTIPROC_DIR:
+    os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    REGISTRY,
+    CONTENT_TYPE_LATEST
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from .redis_client import analytics_redis
+from .logging_config import log_request_info
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ───────────────────────────────────────
+# Metric Definitions
+# ───────────────────────────────────────
+
+# Latency buckets (seconds) spanning cached reads to slow dashboard rebuilds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Redis commands issued while serving one request
+COMMAND_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+# Content type of the /metrics response
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+REQUEST_LATENCY = Histogram(
+    'analytics_http_request_duration_seconds',
+    'Request latency by endpoint',
+    ['method', 'endpoint'],
+    buckets=LATENCY_BUCKETS
+)
+
+REQUESTS = Counter(
+    'analytics_http_requests',
+    'Requests by endpoint and response status',
+    ['method', 'endpoint', 'status']
+)
+
+REDIS_COMMANDS = Histogram(
+    'analytics_redis_commands_per_request',
+    'Redis commands issued per request',
+    ['endpoint'],
+    buckets=COMMAND_BUCKETS
+)
+
+REDIS_POOL_CONNECTIONS = Gauge(
+    'analytics_redis_pool_connections',
+    'Redis connection pool connections by state, summed over live processes',
+    ['state'],
+    multiprocess_mode='livesum'
+)
+
+RATE_LIMIT_REJECTIONS = Counter(
+    'analytics_rate_limit_rejections',
+    'Requests rejected by the rate limiter'
+)
+
+# ───────────────────────────────────────
+# Request Hooks
+# ───────────────────────────────────────
+
+def _endpoint_label() -> str:
+    """Route pattern of the request, keeping label cardinality bounded"""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def record_request_metrics(response):
+    """
+    after_request hook: record latency, status, Redis commands and pool state,
+    using the request trace started by tracing.begin_request_trace.
+    """
+    trace = g.get('request_trace')
+    if trace is None:
+        return response
+    elapsed = time.perf_counter() - trace.started
+    endpoint = _endpoint_label()
+    
+    REQUEST_LATENCY.labels(request.method, endpoint).observe(elapsed)
+    REQUESTS.labels(request.method, endpoint, str(response.status_code)).inc()
+    REDIS_COMMANDS.labels(endpoint).observe(trace.commands)
+    
+    pool = analytics_redis.pool_stats()
+    REDIS_POOL_CONNECTIONS.labels('in_use').set(pool['in_use'])
+    REDIS_POOL_CONNECTIONS.labels('idle').set(pool['idle'])
+    
+    log_request_info(request, response.status_code, round(elapsed * 1000, 2))
+    return response
+
+# ───────────────────────────────────────
+# Exposition
+# ───────────────────────────────────────
+
+class QueueLengthCollector:
+    """Reports the length of the watched RQ queues, read from Redis at scrape time"""
+    
+    def __init__(self):
+        self.queues = []
+    
+    def collect(self):
+        family = GaugeMetricFamily('analytics_rq_queue_length', 'Jobs waiting in the RQ queue', labels=['queue'])
+        for queue in self.queues:
+            try:
+                family.add_metric([queue.name], queue.count)
+            except Exception as e:
+                logger.error(f"Failed to read length of queue {queue.name}: {e}")
+        yield family
+
+queue_length_collector = QueueLengthCollector()
+REGISTRY.register(queue_length_collector)
+
+def watch_queue(queue) -> None:
+    """Report an RQ queue's length on /metrics"""
+    queue_length_collector.queues.append(queue)
+
+def render_metrics() -> bytes:
+    """Render all metrics in Prometheus text format, merged across worker processes when multiprocess"""
+    if not METRICS_MULTIPROC_DIR:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(queue_length_collector)
+    return generate_latest(registry)
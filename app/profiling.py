@@ -0,0 +1,197 @@
+"""
+On-demand CPU profiling of individual requests.
+
+A request sent with an admin key and X-Profile: 1, or picked at random with
+probability PROFILE_SAMPLE_RATE, is profiled by a sampling profiler: a
+background thread reads the request thread's stack via sys._current_frames()
+every PROFILE_INTERVAL_MS and counts identical stacks. Nothing is installed in
+the request thread itself, so unprofiled requests pay only a random() call.
+
+Profiles are kept in Redis as a bounded ring of the most recent
+PROFILE_RING_SIZE and served by GET /admin/profiles/<id> as collapsed stacks
+("frame;frame;frame count" lines) for flamegraph.pl, speedscope or inferno.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from flask import request, g
+from redis import ConnectionError, TimeoutError
+
+from .redis_client import analytics_redis
+from .auth import api_key_manager, extract_api_key, AuthenticationError
+from .exceptions import RedisConnectionError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ───────────────────────────────────────
+# Profiling Configuration
+# ───────────────────────────────────────
+
+# Request header that asks for a profile of the request (admin keys only)
+PROFILE_HEADER = 'X-Profile'
+
+# Fraction of all requests profiled continuously (0 disables random sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+
+# Milliseconds between stack samples
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 1))
+
+# Number of recent profiles kept; older ones are deleted as new ones arrive
+PROFILE_RING_SIZE = int(os.getenv('PROFILE_RING_SIZE', 100))
+
+# Hash of profile ID -> profile JSON, and sorted set of profile IDs by capture time
+PROFILES_KEY = 'profiles'
+PROFILE_INDEX_KEY = 'profiles:index'
+
+# ───────────────────────────────────────
+# Sampling Profiler
+# ───────────────────────────────────────
+
+def _frame_name(frame) -> str:
+    """module:function label of a stack frame"""
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+class StackSampler:
+    """Counts the distinct stacks of one thread, sampled from a background thread"""
+    
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+    
+    def start(self) -> 'StackSampler':
+        self._thread.start()
+        return self
+    
+    def stop(self) -> Counter:
+        """Stop sampling and return the collapsed stack counts"""
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+# ───────────────────────────────────────
+# Request Hooks
+# ───────────────────────────────────────
+
+def _profile_requested() -> Optional[str]:
+    """How this request was selected for profiling: 'header', 'sampled' or None"""
+    if request.headers.get(PROFILE_HEADER):
+        api_key = extract_api_key()
+        try:
+            key_info = api_key_manager.validate_key(api_key) if api_key else None
+        except AuthenticationError:
+            key_info = None
+        if key_info and api_key_manager.has_permission(key_info, 'admin'):
+            return 'header'
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+def begin_request_profile() -> None:
+    """before_request hook: start sampling this request's thread if it is to be profiled"""
+    trigger = _profile_requested()
+    if trigger:
+        g.profile_trigger = trigger
+        g.profile_started = time.perf_counter()
+        g.profiler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000).start()
+
+def finish_request_profile(response):
+    """after_request hook: stop the sampler, store the profile and return its ID in X-Profile-Id"""
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    
+    stacks = profiler.stop()
+    profile = {
+        'profile_id': uuid.uuid4().hex[:16],
+        'trigger': g.profile_trigger,
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.url_rule.rule if request.url_rule is not None else None,
+        'status': response.status_code,
+        'duration_ms': round((time.perf_counter() - g.profile_started) * 1000, 3),
+        'interval_ms': PROFILE_INTERVAL_MS,
+        'samples': profiler.samples,
+        'captured_at': datetime.utcnow().isoformat(),
+        'stacks': dict(stacks)
+    }
+    try:
+        store_profile(profile)
+        response.headers['X-Profile-Id'] = profile['profile_id']
+    except Exception as e:
+        logger.error(f"Failed to store profile of {request.method} {request.path}: {e}")
+    return response
+
+# ───────────────────────────────────────
+# Profile Storage
+# ───────────────────────────────────────
+
+def store_profile(profile: Dict[str, Any]) -> None:
+    """Add a profile to the ring, deleting the oldest beyond PROFILE_RING_SIZE"""
+    with analytics_redis.pipeline(transaction=False) as pipe:
+        pipe.hset(PROFILES_KEY, profile['profile_id'], json.dumps(profile))
+        pipe.zadd(PROFILE_INDEX_KEY, {profile['profile_id']: time.time()})
+        pipe.execute()
+    
+    overflow = analytics_redis.zrange(PROFILE_INDEX_KEY, 0, -(PROFILE_RING_SIZE + 1))
+    if overflow:
+        with analytics_redis.pipeline(transaction=False) as pipe:
+            pipe.hdel(PROFILES_KEY, *overflow)
+            pipe.zrem(PROFILE_INDEX_KEY, *overflow)
+            pipe.execute()
+    logger.info(f"Stored {profile['trigger']} profile {profile['profile_id']} of {profile['method']} {profile['path']}")
+
+def get_profile(profile_id: str) -> Optional[Dict[str, Any]]:
+    """Return a stored profile, or None if unknown or already evicted"""
+    try:
+        raw = analytics_redis.hget(PROFILES_KEY, profile_id)
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while reading profile {profile_id}: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    return json.loads(raw) if raw else None
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Metadata of the stored profiles, most recent first"""
+    try:
+        profile_ids = analytics_redis.zrevrange(PROFILE_INDEX_KEY, 0, -1)
+        raw_profiles = analytics_redis.hmget(PROFILES_KEY, profile_ids) if profile_ids else []
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while listing profiles: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    
+    profiles = []
+    for raw in raw_profiles:
+        if raw:
+            profile = json.loads(raw)
+            profile.pop('stacks', None)
+            profiles.append(profile)
+    return profiles
+
+def collapsed_stacks(profile: Dict[str, Any]) -> str:
+    """Render a profile's stacks in collapsed format, heaviest first"""
+    stacks = sorted(profile['stacks'].items(), key=lambda item: item[1], reverse=True)
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks)
@@ -0,0 +1,255 @@
+"""
+Secondary indexes on event properties.
+
+For every property listed in INDEXED_PROPERTIES, each event increments a
+per-day counter of its value: one hash per (event_type, property, UTC day)
+mapping value -> count, written on the event's existing pipeline. Breakdowns
+of an event type by an indexed property over a day range are then a single
+pipelined HGETALL per day, without decoding any events.
+
+Breakdowns by properties that are not indexed are computed by a background
+job scanning the event partitions of the range, bounded by
+BREAKDOWN_SCAN_MAX_EVENTS; the result is cached and served to later requests
+for the same breakdown.
+"""
+import os
+import json
+import hashlib
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, date
+from typing import Dict, Any, Optional, Tuple
+from redis import ConnectionError, TimeoutError
+
+from .redis_client import analytics_redis, DATA_RETENTION
+from .timeseries import to_epoch
+from .event_store import partition_start, read_partition_events, EVENT_PARTITION_SECONDS
+from .exceptions import AnalyticsPlatformError, RedisConnectionError, InvalidQueryError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ───────────────────────────────────────
+# Property Index Configuration
+# ───────────────────────────────────────
+
+# Properties whose values are counted per event type and day on ingest
+INDEXED_PROPERTIES = frozenset(
+    prop.strip() for prop in os.getenv(
+        'INDEXED_PROPERTIES', 'country,device_type,browser,page_url,referrer,product_name'
+    ).split(',')
+    if prop.strip()
+)
+
+# Longer values are truncated before counting, bounding the size of each index hash
+PROPERTY_INDEX_MAX_VALUE_LENGTH = int(os.getenv('PROPERTY_INDEX_MAX_VALUE_LENGTH', 128))
+
+# Index hashes are kept as long as the daily counts
+PROPERTY_INDEX_TTL = DATA_RETENTION['daily_counts']
+MAX_BREAKDOWN_RANGE_DAYS = PROPERTY_INDEX_TTL // 86400
+
+# Values returned per breakdown by default and at most
+BREAKDOWN_DEFAULT_LIMIT = 50
+BREAKDOWN_MAX_LIMIT = 500
+
+# Events a fallback scan decodes at most; a scan stopping there reports the time it reached
+BREAKDOWN_SCAN_MAX_EVENTS = int(os.getenv('BREAKDOWN_SCAN_MAX_EVENTS', 200000))
+
+# Seconds a fallback scan result is served before the breakdown is scanned again
+BREAKDOWN_SCAN_TTL = int(os.getenv('BREAKDOWN_SCAN_TTL', 600))
+BREAKDOWN_SCAN_TIMEOUT = 600
+
+def property_index_key(event_type: str, prop: str, day: date) -> str:
+    """Hash of value -> count for one event type and property on one UTC day"""
+    return f"props:{event_type}:{prop}:{day.strftime('%Y-%m-%d')}"
+
+def index_value(value: Any) -> Optional[str]:
+    """The string a property value is counted under, or None for values that are not indexed"""
+    if isinstance(value, bool):
+        value = 'true' if value else 'false'
+    elif isinstance(value, (int, float)):
+        value = str(value)
+    elif not isinstance(value, str):
+        return None
+    return value[:PROPERTY_INDEX_MAX_VALUE_LENGTH]
+
+# ───────────────────────────────────────
+# Write Path
+# ───────────────────────────────────────
+
+def queue_property_index_writes(pipe, event_type: str, properties: Dict[str, Any], event_time: datetime) -> None:
+    """Queue the value counter increments for an event's indexed properties onto a pipeline"""
+    if not properties:
+        return
+    
+    day = event_time.date()
+    # Absolute expiry at the end of the day plus retention, so late events never extend it
+    expire_at = None
+    for prop in INDEXED_PROPERTIES.intersection(properties):
+        value = index_value(properties[prop])
+        if value is None:
+            continue
+        if expire_at is None:
+            expire_at = to_epoch(datetime.combine(day + timedelta(days=1), datetime.min.time())) + PROPERTY_INDEX_TTL
+        key = property_index_key(event_type, prop, day)
+        pipe.hincrby(key, value)
+        pipe.expireat(key, expire_at)
+
+# ───────────────────────────────────────
+# Read Path
+# ───────────────────────────────────────
+
+def validate_breakdown(event_type: str, prop: str, start: date, end: date, limit: int) -> None:
+    """Raise InvalidQueryError for breakdown parameters that cannot be served"""
+    if not event_type or not prop:
+        raise InvalidQueryError("event_type and by are required")
+    if end < start:
+        raise InvalidQueryError("'from' must not be after 'to'")
+    today = datetime.utcnow().date()
+    if end > today or start < today - timedelta(days=MAX_BREAKDOWN_RANGE_DAYS - 1):
+        raise InvalidQueryError(f"Breakdowns must lie within the last {MAX_BREAKDOWN_RANGE_DAYS} days")
+    if not 1 <= limit <= BREAKDOWN_MAX_LIMIT:
+        raise InvalidQueryError(f"limit must be between 1 and {BREAKDOWN_MAX_LIMIT}")
+
+def _summarize(counts: Counter, limit: int) -> Dict[str, Any]:
+    """Top values by count with their share of the counted events, plus the remainder"""
+    total = sum(counts.values())
+    top = counts.most_common(limit)
+    return {
+        'total': total,
+        'distinct_values': len(counts),
+        'values': [
+            {'value': value, 'count': count, 'percentage': round(count / total * 100, 2)}
+            for value, count in top
+        ],
+        'other': total - sum(count for _, count in top)
+    }
+
+def indexed_breakdown(event_type: str, prop: str, start: date, end: date,
+                      limit: int = BREAKDOWN_DEFAULT_LIMIT) -> Dict[str, Any]:
+    """Counts of each value of an indexed property over an inclusive day range, from the index alone"""
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    try:
+        with analytics_redis.pipeline(transaction=False) as pipe:
+            for day in days:
+                pipe.hgetall(property_index_key(event_type, prop, day))
+            results = pipe.execute()
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while reading the {prop} index: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to read the {prop} index for {event_type}: {e}")
+        raise AnalyticsPlatformError(f"Breakdown query failed: {e}")
+    
+    counts = Counter()
+    for day_counts in results:
+        for value, count in day_counts.items():
+            counts[value.decode('utf-8')] += int(count)
+    
+    return {
+        'event_type': event_type,
+        'by': prop,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'source': 'index',
+        **_summarize(counts, limit)
+    }
+
+# ───────────────────────────────────────
+# Scan Fallback
+# ───────────────────────────────────────
+
+def _scan_id(event_type: str, prop: str, start: date, end: date) -> str:
+    return hashlib.sha1(f'{event_type}\x00{prop}\x00{start}\x00{end}'.encode('utf-8')).hexdigest()[:16]
+
+def _scan_result_key(scan_id: str) -> str:
+    return f'breakdown:scan:{scan_id}'
+
+def scan_property_breakdown(event_type: str, prop: str, start_iso: str, end_iso: str) -> Dict[str, Any]:
+    """
+    Background job: count the values of a property for one event type over an
+    inclusive day range by decoding the event partitions of the range, oldest
+    first, stopping after BREAKDOWN_SCAN_MAX_EVENTS events. All value counts are
+    stored so any limit can be served from the result.
+    """
+    start, end = date.fromisoformat(start_iso), date.fromisoformat(end_iso)
+    range_start = to_epoch(datetime.combine(start, datetime.min.time()))
+    range_end = to_epoch(datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    
+    result_key = _scan_result_key(_scan_id(event_type, prop, start, end))
+    
+    counts = Counter()
+    scanned = 0
+    scanned_through = range_end
+    try:
+        for partition in range(partition_start(datetime.utcfromtimestamp(range_start)), range_end, EVENT_PARTITION_SECONDS):
+            if scanned >= BREAKDOWN_SCAN_MAX_EVENTS:
+                scanned_through = partition
+                break
+            for event in read_partition_events(partition):
+                scanned += 1
+                if event.get('event_type') != event_type:
+                    continue
+                epoch = to_epoch(datetime.fromisoformat(event['timestamp']))
+                if not range_start <= epoch < range_end:
+                    continue
+                value = index_value((event.get('properties') or {}).get(prop))
+                if value is not None:
+                    counts[value] += 1
+        
+        result = {
+            'counts': dict(counts),
+            'events_scanned': scanned,
+            'truncated': scanned_through < range_end,
+            'scanned_through': datetime.utcfromtimestamp(scanned_through).isoformat(),
+            'computed_at': datetime.utcnow().isoformat()
+        }
+        analytics_redis.set(result_key, json.dumps(result), ex=BREAKDOWN_SCAN_TTL)
+    finally:
+        # Let a failed scan be requested again right away
+        analytics_redis.unlink(f'{result_key}:pending')
+    
+    logger.info(f"Scanned {scanned} events for the {event_type} breakdown by {prop}")
+    return {key: value for key, value in result.items() if key != 'counts'}
+
+def scanned_breakdown(queue, event_type: str, prop: str, start: date, end: date,
+                      limit: int = BREAKDOWN_DEFAULT_LIMIT) -> Tuple[Dict[str, Any], bool]:
+    """
+    Serve a breakdown by a non-indexed property from its cached scan result.
+    Without one, enqueue the scan (once per breakdown while it runs) and return
+    its status. Returns the response data and whether it is complete.
+    """
+    scan_id = _scan_id(event_type, prop, start, end)
+    result_key = _scan_result_key(scan_id)
+    breakdown = {
+        'event_type': event_type,
+        'by': prop,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'source': 'scan'
+    }
+    try:
+        cached = analytics_redis.get(result_key)
+        if cached:
+            result = json.loads(cached)
+            counts = Counter(result.pop('counts'))
+            return {**breakdown, **_summarize(counts, limit), **result}, True
+        
+        if analytics_redis.set(f'{result_key}:pending', 1, ex=BREAKDOWN_SCAN_TIMEOUT, nx=True):
+            queue.enqueue(
+                scan_property_breakdown,
+                event_type,
+                prop,
+                start.isoformat(),
+                end.isoformat(),
+                job_timeout=BREAKDOWN_SCAN_TIMEOUT
+            )
+            logger.info(f"Enqueued a {event_type} breakdown scan by non-indexed property {prop}")
+        return {**breakdown, 'status': 'scanning'}, False
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while serving a breakdown scan: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to serve the {event_type} breakdown by {prop}: {e}")
+        raise AnalyticsPlatformError(f"Breakdown query failed: {e}")
@@ -0,0 +1,333 @@
+"""
+Quantile and summary sketches for numeric event properties.
+
+Every value of a property listed in QUANTILE_PROPERTIES is added to a
+DDSketch-style sketch for its UTC day: the value's logarithmic bucket
+(relative accuracy QUANTILE_RELATIVE_ACCURACY) is counted alongside the
+count, sum, min and max, all as fields of one Redis hash updated by a Lua
+script on the event's existing pipeline. A property can also be grouped by
+another property (e.g. revenue per product_name); each group's sketch lives in
+the same per-day hash under a field prefix. At most QUANTILE_MAX_GROUPS_PER_DAY
+groups are sketched per day; values of further groups only count towards the
+overall sketch and the day's 'ungrouped' counter.
+
+Sketches merge by adding bucket counts, so any day range, and writes from any
+number of workers, combine without keeping raw values. A quantile estimate is
+within QUANTILE_RELATIVE_ACCURACY of the true value's magnitude.
+"""
+import os
+import math
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, date
+from typing import Dict, Any, Optional, Tuple
+from redis import ConnectionError, TimeoutError
+
+from .redis_client import analytics_redis, DATA_RETENTION
+from .timeseries import to_epoch
+from .property_index import index_value
+from .exceptions import AnalyticsPlatformError, RedisConnectionError, InvalidQueryError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ───────────────────────────────────────
+# Quantile Sketch Configuration
+# ───────────────────────────────────────
+
+def _parse_quantile_properties(spec: str) -> Dict[str, Optional[str]]:
+    """'load_time,revenue:product_name' -> {'load_time': None, 'revenue': 'product_name'}"""
+    properties = {}
+    for entry in spec.split(','):
+        prop, _, group_by = entry.strip().partition(':')
+        if prop:
+            properties[prop] = group_by.strip() or None
+    return properties
+
+# Numeric properties sketched per day, each optionally also grouped by another property
+QUANTILE_PROPERTIES = _parse_quantile_properties(os.getenv('QUANTILE_PROPERTIES', 'load_time,revenue:product_name'))
+
+# Relative error of quantile estimates; sets the logarithmic bucket width
+QUANTILE_RELATIVE_ACCURACY = float(os.getenv('QUANTILE_RELATIVE_ACCURACY', 0.01))
+_GAMMA = (1 + QUANTILE_RELATIVE_ACCURACY) / (1 - QUANTILE_RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+# Sketches are kept as long as the daily counts
+QUANTILE_SKETCH_TTL = DATA_RETENTION['daily_counts']
+MAX_QUANTILE_RANGE_DAYS = QUANTILE_SKETCH_TTL // 86400
+
+# Quantiles reported when a query does not ask for others
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+# Groups sketched per property and day; bounds the size of each grouped sketch hash
+QUANTILE_MAX_GROUPS_PER_DAY = int(os.getenv('QUANTILE_MAX_GROUPS_PER_DAY', 1000))
+
+# Separates a group's value from the field name in grouped sketch hashes
+GROUP_SEPARATOR = '|'
+
+# Field of a grouped sketch hash counting the values of groups past the cap (the
+# script also keeps the number of groups under 'groups'); neither holds a separator
+UNGROUPED_FIELD = 'ungrouped'
+
+# KEYS: sketch hashes to update
+# ARGV: value, bucket field, absolute expiry, max groups, then one field prefix per key
+# A key with a group prefix only starts a new group while it holds fewer than max groups
+ADD_VALUE_SCRIPT = """
+local value = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local prefix = ARGV[4 + i]
+    local add = true
+    if prefix ~= '' and redis.call('HEXISTS', key, prefix .. 'count') == 0 then
+        if tonumber(redis.call('HGET', key, 'groups') or 0) >= tonumber(ARGV[4]) then
+            redis.call('HINCRBY', key, 'ungrouped', 1)
+            add = false
+        else
+            redis.call('HINCRBY', key, 'groups', 1)
+        end
+    end
+    if add then
+        redis.call('HINCRBY', key, prefix .. ARGV[2], 1)
+        redis.call('HINCRBY', key, prefix .. 'count', 1)
+        redis.call('HINCRBYFLOAT', key, prefix .. 'sum', ARGV[1])
+        local min = redis.call('HGET', key, prefix .. 'min')
+        if not min or value < tonumber(min) then
+            redis.call('HSET', key, prefix .. 'min', ARGV[1])
+        end
+        local max = redis.call('HGET', key, prefix .. 'max')
+        if not max or value > tonumber(max) then
+            redis.call('HSET', key, prefix .. 'max', ARGV[1])
+        end
+    end
+    redis.call('EXPIREAT', key, ARGV[3])
+end
+"""
+
+_add_value_script = analytics_redis.register_script(ADD_VALUE_SCRIPT)
+
+def sketch_key(prop: str, day: date, group_by: Optional[str] = None) -> str:
+    """Hash holding the sketch of a property on one UTC day, or of each of its groups"""
+    if group_by:
+        return f"sketch:{prop}:by:{group_by}:{day.strftime('%Y-%m-%d')}"
+    return f"sketch:{prop}:{day.strftime('%Y-%m-%d')}"
+
+def bucket_field(value: float) -> str:
+    """
+    Field of the bucket counting a value: 'p<i>' or 'n<i>' for positive and
+    negative values, where gamma^(i-1) < |value| <= gamma^i, and 'z' for zero.
+    """
+    if value == 0:
+        return 'z'
+    index = math.ceil(math.log(abs(value)) / _LOG_GAMMA)
+    return f"{'p' if value > 0 else 'n'}{index}"
+
+def _bucket_value(field: str) -> float:
+    """Representative value of a bucket, within the relative accuracy of everything it counts"""
+    if field == 'z':
+        return 0.0
+    magnitude = 2 * _GAMMA ** int(field[1:]) / (_GAMMA + 1)
+    return magnitude if field[0] == 'p' else -magnitude
+
+def _numeric(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value) if math.isfinite(value) else None
+
+# ───────────────────────────────────────
+# Write Path
+# ───────────────────────────────────────
+
+def queue_sketch_writes(pipe, properties: Dict[str, Any], event_time: datetime) -> None:
+    """Queue one sketch update per sketched numeric property of an event onto a pipeline"""
+    if not properties:
+        return
+    
+    day = event_time.date()
+    expire_at = None
+    for prop, group_by in QUANTILE_PROPERTIES.items():
+        value = _numeric(properties.get(prop))
+        if value is None:
+            continue
+        if expire_at is None:
+            expire_at = to_epoch(datetime.combine(day + timedelta(days=1), datetime.min.time())) + QUANTILE_SKETCH_TTL
+        
+        keys, prefixes = [sketch_key(prop, day)], ['']
+        group = index_value(properties.get(group_by)) if group_by else None
+        if group is not None:
+            keys.append(sketch_key(prop, day, group_by))
+            prefixes.append(group + GROUP_SEPARATOR)
+        pipe.run_script(_add_value_script, keys, [repr(value), bucket_field(value), expire_at, QUANTILE_MAX_GROUPS_PER_DAY, *prefixes])
+
+# ───────────────────────────────────────
+# Read Path
+# ───────────────────────────────────────
+
+class Sketch:
+    """A decoded sketch; merging adds bucket counts and combines the summary fields"""
+    
+    def __init__(self):
+        self.buckets = defaultdict(int)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+    
+    def merge_fields(self, fields: Dict[str, bytes]) -> None:
+        """Merge a sketch stored as hash fields (already stripped of any group prefix)"""
+        for field, raw in fields.items():
+            if field == 'count':
+                self.count += int(raw)
+            elif field == 'sum':
+                self.sum += float(raw)
+            elif field == 'min':
+                self.min = float(raw) if self.min is None else min(self.min, float(raw))
+            elif field == 'max':
+                self.max = float(raw) if self.max is None else max(self.max, float(raw))
+            else:
+                self.buckets[field] += int(raw)
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate of the q-quantile, clamped to the exact min and max"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for field in sorted(self.buckets, key=_bucket_value):
+            seen += self.buckets[field]
+            if seen > rank:
+                return min(max(_bucket_value(field), self.min), self.max)
+        return self.max
+    
+    def summary(self, quantiles=DEFAULT_QUANTILES) -> Dict[str, Any]:
+        result = {
+            'count': self.count,
+            'sum': round(self.sum, 4),
+            'min': self.min,
+            'max': self.max,
+            'mean': round(self.sum / self.count, 4) if self.count else None
+        }
+        for q in quantiles:
+            estimate = self.quantile(q)
+            result[f'p{q * 100:g}'] = round(estimate, 4) if estimate is not None else None
+        return result
+
+def _split_groups(fields: Dict[bytes, bytes]) -> Tuple[Dict[str, Dict[str, bytes]], int]:
+    """Group value -> that group's sketch fields for a grouped sketch hash, and its ungrouped value count"""
+    groups = defaultdict(dict)
+    ungrouped = 0
+    for field, raw in fields.items():
+        group, separator, name = field.decode('utf-8').rpartition(GROUP_SEPARATOR)
+        if separator:
+            groups[group][name] = raw
+        elif name == UNGROUPED_FIELD:
+            ungrouped = int(raw)
+    return groups, ungrouped
+
+def _decode_fields(fields: Dict[bytes, bytes]) -> Dict[str, bytes]:
+    return {field.decode('utf-8'): raw for field, raw in fields.items()}
+
+def parse_quantiles(spec: Optional[str]) -> Tuple[float, ...]:
+    """'0.5,0.9,0.99' -> (0.5, 0.9, 0.99); the defaults when omitted"""
+    if not spec:
+        return DEFAULT_QUANTILES
+    try:
+        quantiles = tuple(float(q) for q in spec.split(','))
+    except ValueError:
+        raise InvalidQueryError("q must be a comma-separated list of quantiles")
+    if not all(0 <= q <= 1 for q in quantiles):
+        raise InvalidQueryError("quantiles must be between 0 and 1")
+    return quantiles
+
+def property_quantiles(prop: str, start: date, end: date, by: Optional[str] = None,
+                       quantiles=DEFAULT_QUANTILES) -> Dict[str, Any]:
+    """
+    Summary and quantiles of a sketched property over an inclusive day range,
+    merged from the daily sketches: overall, per day, and per group when `by`
+    is the property's configured grouping.
+    """
+    if prop not in QUANTILE_PROPERTIES:
+        raise InvalidQueryError(f"property must be one of: {', '.join(QUANTILE_PROPERTIES)}")
+    if by and by != QUANTILE_PROPERTIES[prop]:
+        raise InvalidQueryError(f"{prop} is not grouped by {by}")
+    if end < start:
+        raise InvalidQueryError("'from' must not be after 'to'")
+    today = datetime.utcnow().date()
+    if end > today or start < today - timedelta(days=MAX_QUANTILE_RANGE_DAYS - 1):
+        raise InvalidQueryError(f"Quantile queries must lie within the last {MAX_QUANTILE_RANGE_DAYS} days")
+    
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    try:
+        with analytics_redis.pipeline(transaction=False) as pipe:
+            for day in days:
+                pipe.hgetall(sketch_key(prop, day, by))
+            results = pipe.execute()
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while reading {prop} sketches: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to read {prop} sketches: {e}")
+        raise AnalyticsPlatformError(f"Quantile query failed: {e}")
+    
+    result = {'property': prop, 'from': start.isoformat(), 'to': end.isoformat()}
+    if not by:
+        total = Sketch()
+        daily = []
+        for day, fields in zip(days, results):
+            fields = _decode_fields(fields)
+            sketch = Sketch()
+            sketch.merge_fields(fields)
+            total.merge_fields(fields)
+            daily.append({'date': day.isoformat(), **sketch.summary(quantiles)})
+        return {**result, **total.summary(quantiles), 'daily': daily}
+    
+    totals = defaultdict(Sketch)
+    daily = []
+    ungrouped = 0
+    for day, fields in zip(days, results):
+        groups, day_ungrouped = _split_groups(fields)
+        ungrouped += day_ungrouped
+        for group, group_fields in sorted(groups.items()):
+            sketch = Sketch()
+            sketch.merge_fields(group_fields)
+            totals[group].merge_fields(group_fields)
+            daily.append({'date': day.isoformat(), by: group, **sketch.summary(quantiles)})
+    return {
+        **result,
+        'by': by,
+        'groups': [{by: group, **sketch.summary(quantiles)} for group, sketch in sorted(totals.items())],
+        'ungrouped': ungrouped,
+        'daily': daily
+    }
+
+def dashboard_quantiles(days: int = 7) -> Dict[str, Any]:
+    """
+    Daily summaries and p50/p90/p99 of every sketched property over the last
+    `days` days, with per-group daily summaries (e.g. revenue per product per day)
+    for grouped properties, read in one pipeline.
+    """
+    today = datetime.utcnow().date()
+    window = [today - timedelta(days=i) for i in range(days)]
+    with analytics_redis.pipeline(transaction=False) as pipe:
+        for prop, group_by in QUANTILE_PROPERTIES.items():
+            for day in window:
+                pipe.hgetall(sketch_key(prop, day))
+                if group_by:
+                    pipe.hgetall(sketch_key(prop, day, group_by))
+        results = iter(pipe.execute())
+    
+    dashboard = {}
+    for prop, group_by in QUANTILE_PROPERTIES.items():
+        daily, grouped = [], []
+        for day in window:
+            sketch = Sketch()
+            sketch.merge_fields(_decode_fields(next(results)))
+            daily.append({'date': day.isoformat(), **sketch.summary()})
+            if group_by:
+                groups, _ = _split_groups(next(results))
+                for group, fields in sorted(groups.items()):
+                    group_sketch = Sketch()
+                    group_sketch.merge_fields(fields)
+                    grouped.append({'date': day.isoformat(), group_by: group, **group_sketch.summary()})
+        dashboard[prop] = {'daily': daily}
+        if group_by:
+            dashboard[prop][f'by_{group_by}'] = grouped
+    return dashboard
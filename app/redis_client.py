@@ -1,13 +1,122 @@
 import os
 import logging
 import time
-from redis import Redis, ConnectionPool, ConnectionError, TimeoutError
+from redis import Redis, ConnectionPool, ConnectionError, TimeoutError, ResponseError
+from redis.exceptions import NoScriptError
+from redis.commands.core import Script
 from contextlib import contextmanager
-from typing import Optional
+from contextvars import ContextVar
+from collections import Counter
+from typing import Optional, Dict, Any
 
 # Configure logging for Redis operations
 logger = logging.getLogger(__name__)
 
+# How long a process waits before refreshing a key's TTL again. Sliding TTLs
+# count from the latest write to within this many seconds.
+TTL_ARM_CACHE_SECONDS = int(os.getenv('REDIS_TTL_ARM_CACHE_SECONDS', 60))
+TTL_ARM_CACHE_SIZE = int(os.getenv('REDIS_TTL_ARM_CACHE_SIZE', 100000))
+
+# Minimum delay between reconnection probes while Redis is marked unhealthy
+HEALTH_RETRY_INTERVAL = float(os.getenv('REDIS_HEALTH_RETRY_INTERVAL', 1.0))
+
+class _TTLArmCache:
+    """
+    Per-process record of keys whose TTL was set recently, so the wrappers send
+    an EXPIRE at most once per max_age seconds per key instead of once per write.
+    Keys are only recorded once the command setting the TTL has succeeded.
+    """
+    
+    def __init__(self, max_age: float, max_size: int):
+        self.max_age = max_age
+        self.max_size = max_size
+        self._deadlines = {}
+    
+    def due(self, name: str) -> bool:
+        """Return True if the key's TTL should be sent now"""
+        deadline = self._deadlines.get(name)
+        return deadline is None or deadline <= time.monotonic()
+    
+    def mark(self, names) -> None:
+        """Remember that the TTLs of these keys were just set"""
+        deadline = time.monotonic() + self.max_age
+        for name in names:
+            if len(self._deadlines) >= self.max_size:
+                self._deadlines.clear()
+            self._deadlines[name] = deadline
+    
+    def clear(self) -> None:
+        """Forget every key, e.g. after the database was flushed"""
+        self._deadlines.clear()
+
+class RequestTrace:
+    """
+    Redis round trips and payload decode time of the request being served.
+    With record_calls, every round trip is also kept with its command name,
+    start offset and duration (for the admin trace of a single request).
+    """
+    __slots__ = ('started', 'commands', 'round_trips', 'redis_seconds', 'decode_seconds', 'calls')
+    
+    def __init__(self, record_calls: bool = False):
+        self.started = time.perf_counter()
+        self.commands = 0
+        self.round_trips = 0
+        self.redis_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.calls = [] if record_calls else None
+    
+    def add_call(self, command: str, commands: int, started: float, queued=None) -> None:
+        """Account one round trip that began at perf_counter time `started`"""
+        elapsed = time.perf_counter() - started
+        self.commands += commands
+        self.round_trips += 1
+        self.redis_seconds += elapsed
+        if self.calls is not None:
+            call = {
+                'command': command,
+                'at_ms': round((started - self.started) * 1000, 3),
+                'ms': round(elapsed * 1000, 3),
+                'commands': commands
+            }
+            if queued:
+                call['queued'] = dict(Counter(
+                    args[0].decode('utf-8') if isinstance(args[0], bytes) else str(args[0]) for args, _ in queued
+                ))
+            self.calls.append(call)
+    
+    def summary(self) -> Dict[str, Any]:
+        """Totals plus per-command counts and the recorded calls"""
+        by_command = Counter()
+        for call in self.calls or ():
+            by_command.update(call.get('queued') or {call['command']: call['commands']})
+        return {
+            'commands': self.commands,
+            'round_trips': self.round_trips,
+            'redis_ms': round(self.redis_seconds * 1000, 3),
+            'decode_ms': round(self.decode_seconds * 1000, 3),
+            'by_command': dict(by_command.most_common()),
+            'calls': self.calls or []
+        }
+
+# Trace of the request being served in this context, if any
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar('request_trace', default=None)
+
+def start_request_trace(record_calls: bool = False) -> RequestTrace:
+    """Start tracing Redis usage for the current request"""
+    trace = RequestTrace(record_calls)
+    _current_trace.set(trace)
+    return trace
+
+def end_request_trace() -> None:
+    """Stop tracing in this context"""
+    _current_trace.set(None)
+
+def record_decode_time(seconds: float) -> None:
+    """Add payload decode time to the current request's trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.decode_seconds += seconds
+
 class AnalyticsRedisClient:
     """
     Enhanced Redis client for the Analytics Platform with connection pooling,
@@ -34,15 +143,21 @@ class AnalyticsRedisClient:
         self._is_healthy = True
         self._last_health_check = 0
         
+        # SHAs of the Lua scripts this process has loaded, so pipelines send only EVALSHA
+        self._loaded_scripts = set()
+        
+        # Keys whose TTL this process has already armed
+        self._armed = _TTLArmCache(TTL_ARM_CACHE_SECONDS, TTL_ARM_CACHE_SIZE)
+        
         # Perform initial health check
         self._check_health()
     
     def _check_health(self) -> bool:
         """Check Redis connection health"""
+        self._last_health_check = time.time()
         try:
             self._redis.ping()
             self._is_healthy = True
-            self._last_health_check = time.time()
             logger.debug("Redis health check passed")
             return True
         except (ConnectionError, TimeoutError) as e:
@@ -59,13 +174,21 @@ class AnalyticsRedisClient:
         return self._is_healthy
     
     @contextmanager
-    def get_connection(self):
-        """Context manager for Redis operations with error handling"""
-        if not self.is_healthy():
+    def get_connection(self, command: str = 'COMMAND', commands: int = 1, queued=None):
+        """
+        Context manager for Redis operations with error handling.
+        No PING is issued while the connection is healthy (the pool already checks
+        idle connections); after a failure, reconnection is probed at most once
+        per HEALTH_RETRY_INTERVAL and calls fail fast in between.
+        Each use is traced as one round trip carrying `commands` commands.
+        """
+        if not self._is_healthy:
             # Attempt to reconnect
-            if not self._check_health():
+            if time.time() - self._last_health_check < HEALTH_RETRY_INTERVAL or not self._check_health():
                 raise ConnectionError("Redis is not available")
         
+        trace = _current_trace.get()
+        started = time.perf_counter()
         try:
             yield self._redis
         except (ConnectionError, TimeoutError) as e:
@@ -75,84 +198,266 @@ class AnalyticsRedisClient:
         except Exception as e:
             logger.error(f"Unexpected Redis error: {e}")
             raise
+        finally:
+            if trace is not None:
+                trace.add_call(command, commands, started, queued)
+    
+    def _arm_ttl(self, conn, name: str, ex: Optional[int], pending: Optional[set] = None):
+        """
+        Refresh a key's sliding TTL on write, at most once per TTL_ARM_CACHE_SECONDS
+        per key and process: the key still expires `ex` seconds after its latest
+        write (to within that interval), as with an EXPIRE on every write.
+        On a pipeline, pass its pending set; the key is recorded once it executes.
+        """
+        if not ex or not self._armed.due(name) or (pending is not None and name in pending):
+            return
+        if pending is not None:
+            # Counted in the trace when the pipeline is flushed
+            conn.expire(name, ex)
+            pending.add(name)
+            return
+        
+        # A direct EXPIRE is its own round trip (timed with the calling command)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.commands += 1
+            trace.round_trips += 1
+        conn.expire(name, ex)
+        self._armed.mark((name,))
+    
+    def pool_stats(self) -> Dict[str, int]:
+        """Connections of this process's pool currently checked out and idle"""
+        return {
+            'in_use': len(getattr(self.pool, '_in_use_connections', ())),
+            'idle': len(getattr(self.pool, '_available_connections', ())),
+        }
     
     # Wrapper methods for common Redis operations
     def hset(self, name: str, key: str, value: str, ex: Optional[int] = None) -> int:
         """Set hash field with optional expiration"""
-        with self.get_connection() as conn:
+        with self.get_connection('HSET') as conn:
             result = conn.hset(name, key, value)
-            if ex:
-                conn.expire(name, ex)
+            self._arm_ttl(conn, name, ex)
             return result
     
     def hget(self, name: str, key: str) -> Optional[bytes]:
         """Get hash field"""
-        with self.get_connection() as conn:
+        with self.get_connection('HGET') as conn:
             return conn.hget(name, key)
     
+    def hmget(self, name: str, keys: list) -> list:
+        """Get multiple hash fields"""
+        with self.get_connection('HMGET') as conn:
+            return conn.hmget(name, keys)
+    
     def hgetall(self, name: str) -> dict:
         """Get all hash fields"""
-        with self.get_connection() as conn:
+        with self.get_connection('HGETALL') as conn:
             return conn.hgetall(name)
     
+    def hlen(self, name: str) -> int:
+        """Get number of hash fields"""
+        with self.get_connection('HLEN') as conn:
+            return conn.hlen(name)
+    
+    def hscan(self, name: str, cursor: int = 0, count: Optional[int] = None) -> tuple:
+        """Incrementally iterate hash fields; returns (next_cursor, {field: value})"""
+        with self.get_connection('HSCAN') as conn:
+            return conn.hscan(name, cursor=cursor, count=count)
+    
+    def hdel(self, name: str, *keys) -> int:
+        """Delete hash fields"""
+        with self.get_connection('HDEL') as conn:
+            return conn.hdel(name, *keys)
+    
+    def hkeys(self, name: str) -> list:
+        """Get all hash field names"""
+        with self.get_connection('HKEYS') as conn:
+            return conn.hkeys(name)
+    
     def hvals(self, name: str) -> list:
         """Get all hash values"""
-        with self.get_connection() as conn:
+        with self.get_connection('HVALS') as conn:
             return conn.hvals(name)
     
     def hincrby(self, name: str, key: str, amount: int = 1, ex: Optional[int] = None) -> int:
         """Increment hash field with optional expiration"""
-        with self.get_connection() as conn:
+        with self.get_connection('HINCRBY') as conn:
             result = conn.hincrby(name, key, amount)
-            if ex:
-                conn.expire(name, ex)
+            self._arm_ttl(conn, name, ex)
             return result
     
     def sadd(self, name: str, *values, ex: Optional[int] = None) -> int:
         """Add to set with optional expiration"""
-        with self.get_connection() as conn:
+        with self.get_connection('SADD') as conn:
             result = conn.sadd(name, *values)
-            if ex:
-                conn.expire(name, ex)
+            self._arm_ttl(conn, name, ex)
             return result
     
     def scard(self, name: str) -> int:
         """Get set cardinality"""
-        with self.get_connection() as conn:
+        with self.get_connection('SCARD') as conn:
             return conn.scard(name)
     
     def smembers(self, name: str) -> set:
         """Get set members"""
-        with self.get_connection() as conn:
+        with self.get_connection('SMEMBERS') as conn:
             return conn.smembers(name)
     
+    def pfcount(self, *names) -> int:
+        """Get approximate cardinality of the union of HyperLogLogs"""
+        with self.get_connection('PFCOUNT') as conn:
+            return conn.pfcount(*names)
+    
+    def pfmerge(self, dest: str, *sources, ex: Optional[int] = None) -> bool:
+        """Merge HyperLogLogs into dest with optional expiration"""
+        with self.get_connection('PFMERGE') as conn:
+            result = conn.pfmerge(dest, *sources)
+            if ex:
+                conn.expire(dest, ex)
+            return result
+    
+    def exists(self, *names) -> int:
+        """Count how many of the given keys exist"""
+        with self.get_connection('EXISTS') as conn:
+            return conn.exists(*names)
+    
     def zadd(self, name: str, mapping: dict, ex: Optional[int] = None) -> int:
         """Add to sorted set with optional expiration"""
-        with self.get_connection() as conn:
+        with self.get_connection('ZADD') as conn:
             result = conn.zadd(name, mapping)
-            if ex:
-                conn.expire(name, ex)
+            self._arm_ttl(conn, name, ex)
             return result
     
+    def zrange(self, name: str, start: int, end: int) -> list:
+        """Get sorted set range (ascending order)"""
+        with self.get_connection('ZRANGE') as conn:
+            return conn.zrange(name, start, end)
+    
     def zrevrange(self, name: str, start: int, end: int, withscores: bool = False) -> list:
         """Get sorted set range (reverse order)"""
-        with self.get_connection() as conn:
+        with self.get_connection('ZREVRANGE') as conn:
             return conn.zrevrange(name, start, end, withscores=withscores)
     
+    def zrangebyscore(self, name: str, min_score, max_score) -> list:
+        """Get sorted set members with scores in [min_score, max_score]"""
+        with self.get_connection('ZRANGEBYSCORE') as conn:
+            return conn.zrangebyscore(name, min_score, max_score)
+    
+    def get(self, name: str) -> Optional[bytes]:
+        """Get string value"""
+        with self.get_connection('GET') as conn:
+            return conn.get(name)
+    
+    def mget(self, names: list) -> list:
+        """Get multiple string values"""
+        with self.get_connection('MGET') as conn:
+            return conn.mget(names)
+    
+    def set(self, name: str, value, ex: Optional[int] = None, nx: bool = False, keepttl: bool = False) -> Optional[bool]:
+        """Set string value with optional expiration, only-if-absent or keep-TTL semantics"""
+        with self.get_connection('SET') as conn:
+            return conn.set(name, value, ex=ex, nx=nx, keepttl=keepttl)
+    
+    def incr(self, name: str, amount: int = 1) -> int:
+        """Increment an integer string value"""
+        with self.get_connection('INCR') as conn:
+            return conn.incr(name, amount)
+    
     def expire(self, name: str, time: int) -> bool:
         """Set key expiration"""
-        with self.get_connection() as conn:
+        with self.get_connection('EXPIRE') as conn:
             return conn.expire(name, time)
     
+    def unlink(self, *names) -> int:
+        """Delete keys, reclaiming their memory in the background"""
+        with self.get_connection('UNLINK') as conn:
+            return conn.unlink(*names)
+    
+    def memory_usage(self, name: str) -> int:
+        """Approximate bytes used by a key (0 if missing or MEMORY is unavailable)"""
+        with self.get_connection('MEMORY USAGE') as conn:
+            try:
+                return conn.memory_usage(name) or 0
+            except ResponseError:
+                return 0
+    
+    def xreadgroup(self, group: str, consumer: str, streams: dict, count: Optional[int] = None,
+                   block: Optional[int] = None) -> list:
+        """Read new stream entries as a consumer group member"""
+        with self.get_connection('XREADGROUP') as conn:
+            return conn.xreadgroup(group, consumer, streams, count=count, block=block)
+    
+    def xautoclaim(self, name: str, group: str, consumer: str, min_idle_time: int,
+                   start_id: str = '0-0', count: Optional[int] = None) -> list:
+        """Claim pending stream entries idle for at least min_idle_time ms from other consumers"""
+        with self.get_connection('XAUTOCLAIM') as conn:
+            return conn.xautoclaim(name, group, consumer, min_idle_time, start_id=start_id, count=count)
+    
+    def xgroup_create(self, name: str, group: str, id: str = '0', mkstream: bool = True) -> bool:
+        """Create a consumer group (and the stream); returns False if the group already exists"""
+        with self.get_connection('XGROUP CREATE') as conn:
+            try:
+                return conn.xgroup_create(name, group, id=id, mkstream=mkstream)
+            except ResponseError as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+                return False
+    
+    def xack(self, name: str, group: str, *ids) -> int:
+        """Acknowledge processed stream entries"""
+        with self.get_connection('XACK') as conn:
+            return conn.xack(name, group, *ids)
+    
+    def xadd(self, name: str, fields: dict, maxlen: Optional[int] = None) -> bytes:
+        """Append an entry to a stream, approximately trimmed to maxlen"""
+        with self.get_connection('XADD') as conn:
+            return conn.xadd(name, fields, maxlen=maxlen, approximate=True)
+    
+    def xlen(self, name: str) -> int:
+        """Get stream length"""
+        with self.get_connection('XLEN') as conn:
+            return conn.xlen(name)
+    
+    def xpending(self, name: str, group: str) -> dict:
+        """Get the pending entries summary of a consumer group"""
+        with self.get_connection('XPENDING') as conn:
+            return conn.xpending(name, group)
+    
     def ping(self) -> bool:
         """Ping Redis server"""
-        with self.get_connection() as conn:
+        with self.get_connection('PING') as conn:
             return conn.ping()
     
     def flushdb(self) -> bool:
         """Flush current database (use with caution)"""
-        with self.get_connection() as conn:
-            return conn.flushdb()
+        with self.get_connection('FLUSHDB') as conn:
+            flushed = conn.flushdb()
+        # Every TTL and index entry sent once per process has to be sent again
+        self._armed.clear()
+        return flushed
+    
+    def register_script(self, script: str) -> Script:
+        """Register a Lua script; it is invoked via EVALSHA and loaded on first use"""
+        return self._redis.register_script(script)
+    
+    def run_script(self, script: Script, keys: list, args: list):
+        """Run a registered Lua script atomically on the server"""
+        with self.get_connection('EVALSHA') as conn:
+            return script(keys=keys, args=args, client=conn)
+    
+    def _load_scripts(self, scripts: list) -> None:
+        """Load Lua scripts with SCRIPT LOAD in one round trip and remember them as loaded"""
+        with self.get_connection('SCRIPT LOAD', commands=len(scripts)) as conn:
+            pipe = conn.pipeline(transaction=False)
+            for script in scripts:
+                pipe.script_load(script.script)
+            pipe.execute()
+        self._loaded_scripts.update(script.sha for script in scripts)
+    
+    def pipeline(self, transaction: bool = True) -> 'AnalyticsPipeline':
+        """Create a pipeline that sends queued commands in a single round trip"""
+        return AnalyticsPipeline(self, transaction=transaction)
     
     def close(self):
         """Close connection pool"""
@@ -160,6 +465,272 @@ class AnalyticsRedisClient:
             self.pool.disconnect()
             logger.info("Redis connection pool closed")
 
+class AnalyticsPipeline:
+    """
+    Buffered command pipeline mirroring the AnalyticsRedisClient wrappers.
+    Commands (including any TTL arming) are queued locally and sent to Redis
+    in a single round trip when execute() is called.
+    """
+    
+    def __init__(self, client: AnalyticsRedisClient, transaction: bool = True):
+        self._client = client
+        self._pipe = client._redis.pipeline(transaction=transaction)
+        # Keys whose TTL is queued, recorded in the arm cache only if execute() succeeds
+        self._pending_ttls = set()
+        # SHA -> Lua script queued with EVALSHA
+        self._scripts = {}
+    
+    def __enter__(self) -> 'AnalyticsPipeline':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.reset()
+    
+    def __len__(self) -> int:
+        return len(self._pipe)
+    
+    def hset(self, name: str, key: str, value: str, ex: Optional[int] = None) -> 'AnalyticsPipeline':
+        """Queue hash field set with optional expiration"""
+        self._pipe.hset(name, key, value)
+        self._client._arm_ttl(self._pipe, name, ex, self._pending_ttls)
+        return self
+    
+    def hincrby(self, name: str, key: str, amount: int = 1, ex: Optional[int] = None) -> 'AnalyticsPipeline':
+        """Queue hash field increment with optional expiration"""
+        self._pipe.hincrby(name, key, amount)
+        self._client._arm_ttl(self._pipe, name, ex, self._pending_ttls)
+        return self
+    
+    def hsetnx(self, name: str, key: str, value: str) -> 'AnalyticsPipeline':
+        """Queue hash field set if the field does not exist"""
+        self._pipe.hsetnx(name, key, value)
+        return self
+    
+    def publish(self, channel: str, message: str) -> 'AnalyticsPipeline':
+        """Queue a pub/sub publish"""
+        self._pipe.publish(channel, message)
+        return self
+    
+    def hdel(self, name: str, *keys) -> 'AnalyticsPipeline':
+        """Queue hash field deletion"""
+        self._pipe.hdel(name, *keys)
+        return self
+    
+    def sadd(self, name: str, *values, ex: Optional[int] = None) -> 'AnalyticsPipeline':
+        """Queue set add with optional expiration"""
+        self._pipe.sadd(name, *values)
+        self._client._arm_ttl(self._pipe, name, ex, self._pending_ttls)
+        return self
+    
+    def pfadd(self, name: str, *values) -> 'AnalyticsPipeline':
+        """Queue HyperLogLog add"""
+        self._pipe.pfadd(name, *values)
+        return self
+    
+    def pfcount(self, *names) -> 'AnalyticsPipeline':
+        """Queue HyperLogLog cardinality read"""
+        self._pipe.pfcount(*names)
+        return self
+    
+    def zadd(self, name: str, mapping: dict, ex: Optional[int] = None) -> 'AnalyticsPipeline':
+        """Queue sorted set add with optional expiration"""
+        self._pipe.zadd(name, mapping)
+        self._client._arm_ttl(self._pipe, name, ex, self._pending_ttls)
+        return self
+    
+    def expire(self, name: str, time: int) -> 'AnalyticsPipeline':
+        """Queue key expiration"""
+        self._pipe.expire(name, time)
+        return self
+    
+    def expire_nx(self, name: str, time: int) -> 'AnalyticsPipeline':
+        """Queue key expiration that only applies if the key has no TTL"""
+        self._pipe.expire(name, time, nx=True)
+        return self
+    
+    def expireat(self, name: str, when: int, force: bool = False) -> 'AnalyticsPipeline':
+        """Queue absolute key expiration (unix timestamp), skipped if recently armed unless forced"""
+        if force or (self._client._armed.due(name) and name not in self._pending_ttls):
+            self._pipe.expireat(name, when)
+            self._pending_ttls.add(name)
+        return self
+    
+    def zadd_once(self, name: str, mapping: dict) -> 'AnalyticsPipeline':
+        """Queue sorted set add, skipped for members this process added recently"""
+        markers = {
+            member: f'{name}\x00{member}' for member in mapping
+            if self._client._armed.due(f'{name}\x00{member}') and f'{name}\x00{member}' not in self._pending_ttls
+        }
+        if markers:
+            self._pipe.zadd(name, {member: mapping[member] for member in markers})
+            self._pending_ttls.update(markers.values())
+        return self
+    
+    def zrem(self, name: str, *members) -> 'AnalyticsPipeline':
+        """Queue sorted set member removal"""
+        self._pipe.zrem(name, *members)
+        return self
+    
+    def zincrby(self, name: str, amount: float, member: str) -> 'AnalyticsPipeline':
+        """Queue sorted set member score increment"""
+        self._pipe.zincrby(name, amount, member)
+        return self
+    
+    def zcard(self, name: str) -> 'AnalyticsPipeline':
+        """Queue sorted set cardinality read"""
+        self._pipe.zcard(name)
+        return self
+    
+    def zrange(self, name: str, start: int, end: int, withscores: bool = False) -> 'AnalyticsPipeline':
+        """Queue sorted set range read by rank (lowest score first)"""
+        self._pipe.zrange(name, start, end, withscores=withscores)
+        return self
+    
+    def zrevrange(self, name: str, start: int, end: int, withscores: bool = False) -> 'AnalyticsPipeline':
+        """Queue sorted set range read by rank (highest score first)"""
+        self._pipe.zrevrange(name, start, end, withscores=withscores)
+        return self
+    
+    def zremrangebyrank(self, name: str, start: int, end: int) -> 'AnalyticsPipeline':
+        """Queue removal of the sorted set members within a rank range"""
+        self._pipe.zremrangebyrank(name, start, end)
+        return self
+    
+    def zremrangebyscore(self, name: str, min_score, max_score) -> 'AnalyticsPipeline':
+        """Queue removal of the sorted set members within a score range"""
+        self._pipe.zremrangebyscore(name, min_score, max_score)
+        return self
+    
+    def zunionstore(self, dest: str, keys: list) -> 'AnalyticsPipeline':
+        """Queue a union of sorted sets (scores summed), stored in dest"""
+        self._pipe.zunionstore(dest, keys)
+        return self
+    
+    def run_script(self, script: Script, keys: list, args: list) -> 'AnalyticsPipeline':
+        """
+        Queue a registered Lua script as EVALSHA. Queued directly rather than through
+        redis-py, which would check SCRIPT EXISTS in an extra round trip on every execute();
+        scripts are loaded once per process instead, and again only after a NOSCRIPT reply.
+        """
+        self._pipe.evalsha(script.sha, len(keys), *keys, *args)
+        self._scripts[script.sha] = script
+        return self
+    
+    def bitop(self, operation: str, dest: str, *keys) -> 'AnalyticsPipeline':
+        """Queue a bitwise operation between bitmaps, storing the result in dest"""
+        self._pipe.bitop(operation, dest, *keys)
+        return self
+    
+    def bitcount(self, name: str) -> 'AnalyticsPipeline':
+        """Queue a count of the set bits in a bitmap"""
+        self._pipe.bitcount(name)
+        return self
+    
+    def unlink(self, *names) -> 'AnalyticsPipeline':
+        """Queue key deletion with background memory reclamation"""
+        self._pipe.unlink(*names)
+        return self
+    
+    def set(self, name: str, value, ex: Optional[int] = None, keepttl: bool = False) -> 'AnalyticsPipeline':
+        """Queue string set with optional expiration (sent atomically with the value)"""
+        self._pipe.set(name, value, ex=ex, keepttl=keepttl)
+        return self
+    
+    def get(self, name: str) -> 'AnalyticsPipeline':
+        """Queue string read"""
+        self._pipe.get(name)
+        return self
+    
+    def mget(self, names: list) -> 'AnalyticsPipeline':
+        """Queue multiple string read"""
+        self._pipe.mget(names)
+        return self
+    
+    def hget(self, name: str, key: str) -> 'AnalyticsPipeline':
+        """Queue hash field read"""
+        self._pipe.hget(name, key)
+        return self
+    
+    def hmget(self, name: str, keys: list) -> 'AnalyticsPipeline':
+        """Queue multiple hash field read"""
+        self._pipe.hmget(name, keys)
+        return self
+    
+    def xadd(self, name: str, fields: dict, maxlen: Optional[int] = None) -> 'AnalyticsPipeline':
+        """Queue stream append, approximately trimmed to maxlen"""
+        self._pipe.xadd(name, fields, maxlen=maxlen, approximate=True)
+        return self
+    
+    def xack(self, name: str, group: str, *ids) -> 'AnalyticsPipeline':
+        """Queue stream entry acknowledgement"""
+        self._pipe.xack(name, group, *ids)
+        return self
+    
+    def hlen(self, name: str) -> 'AnalyticsPipeline':
+        """Queue hash field count read"""
+        self._pipe.hlen(name)
+        return self
+    
+    def hscan(self, name: str, cursor: int = 0, count: Optional[int] = None) -> 'AnalyticsPipeline':
+        """Queue one step of incremental hash iteration; its result is (next_cursor, {field: value})"""
+        self._pipe.hscan(name, cursor=cursor, count=count)
+        return self
+    
+    def hgetall(self, name: str) -> 'AnalyticsPipeline':
+        """Queue full hash read"""
+        self._pipe.hgetall(name)
+        return self
+    
+    def scard(self, name: str) -> 'AnalyticsPipeline':
+        """Queue set cardinality read"""
+        self._pipe.scard(name)
+        return self
+    
+    def execute(self) -> list:
+        """Send all queued commands to Redis and return their results"""
+        stack = self._pipe.command_stack
+        pending, self._pending_ttls = self._pending_ttls, set()
+        scripts, self._scripts = self._scripts, {}
+        unloaded = [script for sha, script in scripts.items() if sha not in self._client._loaded_scripts]
+        if unloaded:
+            self._client._load_scripts(unloaded)
+        with self._client.get_connection('PIPELINE', commands=len(stack), queued=stack):
+            results = self._pipe.execute(raise_on_error=not scripts)
+        if scripts:
+            results = self._rerun_unloaded_scripts(stack, results, scripts)
+        # Only now are the queued TTLs known to be set
+        self._client._armed.mark(pending)
+        return results
+    
+    def _rerun_unloaded_scripts(self, stack: list, results: list, scripts: dict) -> list:
+        """
+        Reload the scripts and resend the EVALSHA commands that failed with NOSCRIPT
+        (the server restarted or its script cache was flushed), then raise the first
+        error left as execute() normally would. Only the failed commands are resent,
+        so the others are not applied twice.
+        """
+        failed = [i for i, result in enumerate(results) if isinstance(result, NoScriptError)]
+        if failed:
+            self._client._loaded_scripts.clear()
+            self._client._load_scripts(list(scripts.values()))
+            with self._client.get_connection('PIPELINE', commands=len(failed)) as conn:
+                retry = conn.pipeline(transaction=False)
+                for i in failed:
+                    args, options = stack[i]
+                    retry.execute_command(*args, **options)
+                for i, result in zip(failed, retry.execute(raise_on_error=False)):
+                    results[i] = result
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+    
+    def reset(self):
+        """Discard queued commands and release the pipeline connection"""
+        self._pipe.reset()
+        self._pending_ttls.clear()
+        self._scripts.clear()
+
 # Create singleton instance
 analytics_redis = AnalyticsRedisClient()
 
@@ -0,0 +1,188 @@
+"""
+Cohort retention from per-day user bitmaps.
+
+Every user_id is mapped once to a dense integer (user_ids hash plus counter,
+assigned atomically in Lua). Each event then sets the user's bit in the
+bitmap of users active on its UTC day and, for cohort event types, in that
+type's cohort bitmap for the day; the day a user is first recorded also sets
+the built-in first_seen cohort. Day-N retention of a cohort is
+BITCOUNT(cohort(D) AND active(D + N)), so a 30 x 30 grid is a few hundred
+pipelined bitmap operations whose cost depends on the bitmap width
+(users / 8 bytes per day), not on the number of events.
+"""
+import os
+import json
+import uuid
+import logging
+from datetime import datetime, timedelta, date
+from typing import Dict, Any, Optional
+from redis import ConnectionError, TimeoutError
+
+from .redis_client import analytics_redis, DATA_RETENTION
+from .timeseries import to_epoch
+from .exceptions import AnalyticsPlatformError, RedisConnectionError, InvalidQueryError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ───────────────────────────────────────
+# Retention Configuration
+# ───────────────────────────────────────
+
+# Event types whose occurrence puts a user in that day's cohort
+RETENTION_COHORT_EVENTS = tuple(
+    event_type.strip() for event_type in os.getenv('RETENTION_COHORT_EVENTS', 'user_registered').split(',')
+    if event_type.strip()
+)
+
+# Cohort of users recorded for the first time on a day, always maintained
+FIRST_SEEN_COHORT = 'first_seen'
+
+# Activity and cohort bitmaps are kept as long as the daily counts
+RETENTION_BITMAP_TTL = DATA_RETENTION['daily_counts']
+MAX_RETENTION_DAYS = RETENTION_BITMAP_TTL // 86400
+
+# Seconds a computed retention grid is cached
+RETENTION_CACHE_TTL = int(os.getenv('RETENTION_CACHE_TTL', 60))
+
+# user_id -> dense integer, and the next integer to hand out (never expire)
+USER_ID_DICTIONARY_KEY = 'user_ids'
+USER_ID_COUNTER_KEY = 'user_ids:next'
+
+# KEYS: dictionary, counter, first_seen cohort of the day, then the bitmaps to set
+# ARGV: user_id, absolute expiry of the day's bitmaps
+# Returns the user's integer ID
+MARK_ACTIVE_SCRIPT = """
+local id = redis.call('HGET', KEYS[1], ARGV[1])
+local bitmaps = {}
+if not id then
+    id = redis.call('INCR', KEYS[2]) - 1
+    redis.call('HSET', KEYS[1], ARGV[1], id)
+    table.insert(bitmaps, KEYS[3])
+end
+for i = 4, #KEYS do
+    table.insert(bitmaps, KEYS[i])
+end
+for _, key in ipairs(bitmaps) do
+    redis.call('SETBIT', key, id, 1)
+    redis.call('EXPIREAT', key, ARGV[2])
+end
+return tonumber(id)
+"""
+
+_mark_active_script = analytics_redis.register_script(MARK_ACTIVE_SCRIPT)
+
+def activity_key(day: date) -> str:
+    """Bitmap of the users active on one UTC day"""
+    return f"active:{day.strftime('%Y-%m-%d')}"
+
+def cohort_key(cohort: str, day: date) -> str:
+    """Bitmap of the users in one cohort on one UTC day"""
+    return f"cohort:{cohort}:{day.strftime('%Y-%m-%d')}"
+
+def retention_cohorts() -> tuple:
+    """Cohorts that can be queried"""
+    return (FIRST_SEEN_COHORT,) + RETENTION_COHORT_EVENTS
+
+# ───────────────────────────────────────
+# Write Path
+# ───────────────────────────────────────
+
+def queue_activity_writes(pipe, user_id: str, event_type: str, event_time: datetime) -> None:
+    """
+    Queue the bitmap writes for an event onto a pipeline: assign the user's
+    integer ID if new, then mark the user in the day's activity bitmap and,
+    for cohort event types, the day's cohort bitmap.
+    """
+    day = event_time.date()
+    keys = [USER_ID_DICTIONARY_KEY, USER_ID_COUNTER_KEY, cohort_key(FIRST_SEEN_COHORT, day), activity_key(day)]
+    if event_type in RETENTION_COHORT_EVENTS:
+        keys.append(cohort_key(event_type, day))
+    
+    # Absolute expiry at the end of the day plus retention, so late events never extend it
+    expire_at = to_epoch(datetime.combine(day + timedelta(days=1), datetime.min.time())) + RETENTION_BITMAP_TTL
+    pipe.run_script(_mark_active_script, keys, [user_id, expire_at])
+
+# ───────────────────────────────────────
+# Read Path
+# ───────────────────────────────────────
+
+def retention_grid(cohort: str, days: int, end: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Day-N retention of the daily cohorts of the last `days` days ending at `end`
+    (default today): for each cohort day, its size and how many of its users
+    were active N days later, for every N up to `end`. Computed with one
+    pipelined BITOP AND + BITCOUNT per cell and cached for RETENTION_CACHE_TTL.
+    """
+    if cohort not in retention_cohorts():
+        raise InvalidQueryError(f"cohort must be one of: {', '.join(retention_cohorts())}")
+    if not 1 <= days <= MAX_RETENTION_DAYS:
+        raise InvalidQueryError(f"days must be between 1 and {MAX_RETENTION_DAYS}")
+    
+    today = datetime.utcnow().date()
+    end = end or today
+    if end > today or end < today - timedelta(days=MAX_RETENTION_DAYS - days):
+        raise InvalidQueryError(f"Retention grids must lie within the last {MAX_RETENTION_DAYS} days")
+    
+    cache_key = f'retention:{cohort}:{days}:{end.isoformat()}'
+    try:
+        cached = analytics_redis.get(cache_key)
+        if cached:
+            return {**json.loads(cached), 'cached': True}
+        
+        cohort_days = [end - timedelta(days=days - 1 - i) for i in range(days)]
+        scratch_key = f'retention:scratch:{uuid.uuid4().hex}'
+        with analytics_redis.pipeline(transaction=False) as pipe:
+            pipe.get(USER_ID_COUNTER_KEY)
+            for day in cohort_days:
+                pipe.bitcount(cohort_key(cohort, day))
+            # Day 0 is the cohort itself: a cohort event is also activity on that day
+            for day in cohort_days:
+                for offset in range(1, (end - day).days + 1):
+                    pipe.bitop('AND', scratch_key, cohort_key(cohort, day), activity_key(day + timedelta(days=offset)))
+                    pipe.bitcount(scratch_key)
+            pipe.unlink(scratch_key)
+            results = pipe.execute()
+        
+        users_indexed = int(results[0] or 0)
+        sizes = results[1:days + 1]
+        # Each cell queued a BITOP then a BITCOUNT; keep the counts
+        retained_counts = iter(results[days + 2:-1:2])
+        
+        cohorts = []
+        for day, size in zip(cohort_days, sizes):
+            retained = [size] + [next(retained_counts) for _ in range((end - day).days)]
+            cohorts.append({
+                'date': day.isoformat(),
+                'size': size,
+                'retained': retained,
+                'retention': [round(count / size * 100, 2) if size else 0 for count in retained]
+            })
+        
+        # Size-weighted retention per day offset, over the cohorts old enough to have it
+        average = []
+        for offset in range(days):
+            eligible = [c for c in cohorts if len(c['retained']) > offset]
+            total = sum(c['size'] for c in eligible)
+            average.append(round(sum(c['retained'][offset] for c in eligible) / total * 100, 2) if total else 0)
+        
+        grid = {
+            'cohort': cohort,
+            'days': days,
+            'from': cohort_days[0].isoformat(),
+            'to': end.isoformat(),
+            'users_indexed': users_indexed,
+            'cohorts': cohorts,
+            'average_retention': average,
+            'computed_at': datetime.utcnow().isoformat()
+        }
+        analytics_redis.set(cache_key, json.dumps(grid), ex=RETENTION_CACHE_TTL)
+        logger.info(f"Computed {days}-day {cohort} retention grid over {users_indexed} users")
+        return {**grid, 'cached': False}
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while computing retention: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to compute retention for cohort {cohort}: {e}")
+        raise AnalyticsPlatformError(f"Retention query failed: {e}")
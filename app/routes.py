@@ -1,21 +1,148 @@
-from typing import Tuple
+import os
+import json
+import time
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Tuple, Optional, Dict, Any, List
 from flask import Blueprint, request, jsonify, current_app, Response
+from redis import RedisError
+from rq.job import Job, JobStatus
+from rq.exceptions import NoSuchJobError
 from .utils import (
     store_event_data, 
-    generate_analytics_dashboard, 
+    store_events_batch,
+    load_dashboard_snapshot,
+    refresh_dashboard_snapshot,
+    schedule_dashboard_refresh,
+    DASHBOARD_SNAPSHOT_MAX_AGE,
+    DASHBOARD_SNAPSHOT_MAX_STALENESS,
     enrich_event_data,
     retrieve_event_by_id,
+    retrieve_events_by_ids,
     generate_sample_analytics_events,
+    get_sample_generation_progress,
     get_user_analytics,
+    get_ingest_stats,
+    train_compression_dictionaries,
+    INGEST_MODE,
+    MAX_SAMPLE_EVENTS,
+    MAX_SAMPLE_WINDOW_DAYS,
+    SAMPLE_DATA_WINDOW_DAYS,
+    SAMPLE_DATA_CHUNK_SIZE,
     AnalyticsPlatformError,
-    RedisConnectionError
+    RedisConnectionError,
+    IngestBackpressureError,
+    InvalidQueryError
 )
-from .auth import require_auth, require_admin, get_client_info
+from .timeseries import query_timeseries, GRANULARITY_SECONDS
+from .uniques import count_unique
+from .funnels import normalize_funnel, evaluate_funnel, FUNNEL_MAX_RANGE_DAYS
+from .retention import retention_grid
+from .property_index import (
+    INDEXED_PROPERTIES,
+    BREAKDOWN_DEFAULT_LIMIT,
+    validate_breakdown,
+    indexed_breakdown,
+    scanned_breakdown
+)
+from .heavy_hitters import top_values, parse_window, TOPK_DEFAULT_K
+from .quantile_sketches import property_quantiles, parse_quantiles
+from .event_compression import get_compression_stats
+from .metrics import render_metrics, METRICS_CONTENT_TYPE
+from .profiling import get_profile, list_profiles, collapsed_stacks
+from .auth import require_auth, require_admin, get_client_info, api_key_manager
 from .redis_client import analytics_redis
 
 # Create the Blueprint for the Analytics Platform API
 analytics_bp = Blueprint('analytics_bp', __name__)
 
+# Maximum number of events accepted by a single batch request
+MAX_BATCH_EVENTS = int(os.getenv('MAX_BATCH_EVENTS', 1000))
+
+# Maximum number of event IDs accepted by a bulk lookup
+MAX_BULK_EVENT_IDS = int(os.getenv('MAX_BULK_EVENT_IDS', 500))
+
+def _validate_event_payload(event_data: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Validate a single event submission.
+    Returns (normalized event fields, None) on success or (None, error message) on failure.
+    """
+    if not isinstance(event_data, dict):
+        return None, "Event must be a JSON object"
+    
+    # Validate required fields
+    required_fields = ['event_type', 'user_id']
+    missing_fields = [field for field in required_fields if field not in event_data]
+    if missing_fields:
+        return None, f"Missing required fields: {', '.join(missing_fields)}"
+    
+    # Basic input validation
+    event_type = event_data['event_type']
+    user_id = event_data['user_id']
+    
+    if not isinstance(event_type, str) or len(event_type.strip()) == 0:
+        return None, "event_type must be a non-empty string"
+    
+    if not isinstance(user_id, str) or len(user_id.strip()) == 0:
+        return None, "user_id must be a non-empty string"
+    
+    session_id = event_data.get('session_id', f"sess_{user_id}")
+    properties = event_data.get('properties', {})
+    
+    if not isinstance(properties, dict):
+        return None, "properties must be a dictionary"
+    
+    return {
+        'event_type': event_type,
+        'user_id': user_id,
+        'session_id': session_id,
+        'properties': properties
+    }, None
+
+def _parse_time_param(name: str, default: datetime) -> datetime:
+    """
+    Parse an ISO 8601 or unix-timestamp query parameter into a naive UTC datetime.
+    Raises InvalidQueryError for unparseable values.
+    """
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        if value.replace('.', '', 1).isdigit():
+            return datetime.utcfromtimestamp(float(value))
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    except (ValueError, OverflowError):
+        raise InvalidQueryError(f"'{name}' must be an ISO 8601 datetime or unix timestamp")
+
+def _parse_batch_body() -> Tuple[Optional[List[Any]], Optional[str]]:
+    """
+    Parse a batch request body as a JSON array, a {"events": [...]} object or NDJSON.
+    Returns (items, None) on success or (None, error message) on failure.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        items = []
+        for line_number, line in enumerate(request.get_data(as_text=True).splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError:
+                return None, f"Invalid JSON on line {line_number}"
+        return items, None
+    
+    if not request.is_json:
+        return None, "Request must contain JSON or NDJSON data"
+    
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        body = body.get('events')
+    if not isinstance(body, list):
+        return None, "Request must contain a JSON array of events or an 'events' array"
+    return body, None
+
 @analytics_bp.route('/health', methods=['GET'])
 def health_check_endpoint() -> Tuple[Response, int]:
     """Health check endpoint to verify the analytics platform and Redis are operational."""
@@ -30,9 +157,12 @@ def health_check_endpoint() -> Tuple[Response, int]:
             "message": "Analytics platform is operational" if redis_healthy else "Redis connection issues detected"
         }
         
+        if INGEST_MODE in ('async', 'stream'):
+            health_status["ingest"] = get_ingest_stats()
+        
         status_code = 200 if redis_healthy else 503
         return jsonify(health_status), status_code
-        
+    
     except Exception as e:
         return jsonify({
             "status": "unhealthy",
@@ -41,6 +171,16 @@ def health_check_endpoint() -> Tuple[Response, int]:
             "message": "Health check failed"
         }), 503
 
+@analytics_bp.route('/metrics', methods=['GET'])
+def metrics_endpoint() -> Tuple[Response, int]:
+    """
+    Prometheus metrics in text exposition format: per-endpoint latency histograms,
+    response status counts, Redis commands per request, connection pool usage,
+    rate limiter rejections and queue length. Unauthenticated like /health, so
+    keep it reachable only from the monitoring network.
+    """
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE), 200
+
 @analytics_bp.route('/events/', methods=['POST'])
 @require_auth('write')
 def submit_event_endpoint() -> Tuple[Response, int]:
@@ -54,43 +194,31 @@ def submit_event_endpoint() -> Tuple[Response, int]:
         if not request.is_json:
             return jsonify({"error": "Request must contain JSON data"}), 400
         
-        event_data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['event_type', 'user_id']
-        missing_fields = [field for field in required_fields if field not in event_data]
-        if missing_fields:
-            return jsonify({
-                "error": f"Missing required fields: {', '.join(missing_fields)}"
-            }), 400
-        
-        # Basic input validation
-        event_type = event_data['event_type']
-        user_id = event_data['user_id']
-        
-        if not isinstance(event_type, str) or len(event_type.strip()) == 0:
-            return jsonify({"error": "event_type must be a non-empty string"}), 400
-        
-        if not isinstance(user_id, str) or len(user_id.strip()) == 0:
-            return jsonify({"error": "user_id must be a non-empty string"}), 400
-        
-        session_id = event_data.get('session_id', f"sess_{user_id}")
-        properties = event_data.get('properties', {})
+        event, error = _validate_event_payload(request.get_json())
+        if error:
+            return jsonify({"error": error}), 400
         
-        if not isinstance(properties, dict):
-            return jsonify({"error": "properties must be a dictionary"}), 400
+        event_type = event['event_type']
+        user_id = event['user_id']
         
         # Store the event in Redis
-        event_id = store_event_data(event_type, user_id, session_id, properties)
+        event_id = store_event_data(event_type, user_id, event['session_id'], event['properties'])
         
         return jsonify({
             "message": "Event successfully recorded",
             "event_id": event_id,
             "event_type": event_type,
             "user_id": user_id,
-            "status": "processed"
+            "status": "queued" if INGEST_MODE in ('async', 'stream') else "processed"
         }), 201
-        
+    
+    except IngestBackpressureError as e:
+        response = jsonify({
+            "error": "Ingest buffer full",
+            "message": "Event ingestion is temporarily saturated, retry shortly"
+        })
+        response.headers['Retry-After'] = '1'
+        return response, 503
     except RedisConnectionError as e:
         return jsonify({
             "error": "Database connection failed",
@@ -107,6 +235,78 @@ def submit_event_endpoint() -> Tuple[Response, int]:
             "details": str(e)
         }), 500
 
+@analytics_bp.route('/events/batch', methods=['POST'])
+@require_auth('write')
+def submit_event_batch_endpoint() -> Tuple[Response, int]:
+    """
+    Submit multiple analytics events in a single request.
+    Accepts a JSON array, an object with an 'events' array, or an NDJSON body.
+    Valid events are written in one pipelined flush; per-item results report
+    rejected events so partial failures are visible. Requires write permission.
+    """
+    try:
+        items, error = _parse_batch_body()
+        if error:
+            return jsonify({"error": error}), 400
+        
+        if not items:
+            return jsonify({"error": "Batch must contain at least one event"}), 400
+        
+        if len(items) > MAX_BATCH_EVENTS:
+            return jsonify({
+                "error": f"Maximum {MAX_BATCH_EVENTS} events per batch request"
+            }), 400
+        
+        # Validate each event with the same rules as single submission
+        results: List[Dict[str, Any]] = []
+        valid_events = []
+        valid_indexes = []
+        for index, item in enumerate(items):
+            event, item_error = _validate_event_payload(item)
+            if item_error:
+                results.append({"index": index, "status": "rejected", "error": item_error})
+            else:
+                results.append({"index": index, "status": "pending"})
+                valid_events.append(event)
+                valid_indexes.append(index)
+        
+        # Store all valid events in one pipelined flush
+        event_ids = store_events_batch(valid_events)
+        for index, event_id in zip(valid_indexes, event_ids):
+            results[index] = {"index": index, "status": "created", "event_id": event_id}
+        
+        accepted = len(event_ids)
+        rejected = len(items) - accepted
+        if rejected == 0:
+            status_code = 201
+        elif accepted == 0:
+            status_code = 400
+        else:
+            status_code = 207
+        
+        return jsonify({
+            "message": f"Recorded {accepted} of {len(items)} events",
+            "accepted": accepted,
+            "rejected": rejected,
+            "results": results
+        }), status_code
+    
+    except RedisConnectionError as e:
+        return jsonify({
+            "error": "Database connection failed",
+            "message": "Unable to connect to analytics database"
+        }), 503
+    except AnalyticsPlatformError as e:
+        return jsonify({
+            "error": "Platform error",
+            "details": str(e)
+        }), 500
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to process event batch",
+            "details": str(e)
+        }), 500
+
 @analytics_bp.route('/analytics/', methods=['GET'])
 @require_auth('read')
 def analytics_dashboard_endpoint() -> Tuple[Response, int]:
@@ -132,14 +332,235 @@ def analytics_dashboard_endpoint() -> Tuple[Response, int]:
                 "client_info": get_client_info()
             }), 200
         else:
-            # Return platform-wide analytics dashboard
-            dashboard_data = generate_analytics_dashboard()
+            # Return platform-wide analytics dashboard from the materialized snapshot
+            return _serve_dashboard_snapshot()
+    
+    except RedisConnectionError as e:
+        return jsonify({
+            "error": "Database connection failed",
+            "message": "Unable to connect to analytics database"
+        }), 503
+    except AnalyticsPlatformError as e:
+        return jsonify({
+            "error": "Analytics error",
+            "details": str(e)
+        }), 500
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to generate analytics",
+            "details": str(e)
+        }), 500
+
+def _serve_dashboard_snapshot() -> Tuple[Response, int]:
+    """
+    Serve the materialized dashboard snapshot with ETag/If-None-Match support.
+    A matching conditional request costs a single HMGET of the ETag and returns 304.
+    Stale snapshots are served while a background refresh is enqueued; missing or
+    very stale snapshots are recomputed inline.
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    snapshot = load_dashboard_snapshot(include_payload=not if_none_match)
+    
+    age = time.time() - snapshot['refreshed_at'] if snapshot else None
+    if snapshot is None or age > DASHBOARD_SNAPSHOT_MAX_STALENESS:
+        snapshot = refresh_dashboard_snapshot()
+    elif age > DASHBOARD_SNAPSHOT_MAX_AGE:
+        schedule_dashboard_refresh(current_app.analytics_queue)
+    
+    # Weak validator: the body also carries per-client info around the snapshot
+    etag = f'W/"{snapshot["etag"]}"'
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+        response = Response(status=304)
+    else:
+        if snapshot['payload'] is None:
+            snapshot = load_dashboard_snapshot() or refresh_dashboard_snapshot()
+            etag = f'W/"{snapshot["etag"]}"'
+        
+        # Splice the stored JSON in directly instead of decoding and re-encoding it
+        body = (
+            '{"analytics_type": "platform_dashboard", "data": ' + snapshot['payload'] +
+            ', "client_info": ' + json.dumps(get_client_info()) + '}'
+        )
+        response = Response(body, status=200, mimetype='application/json')
+    
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response, response.status_code
+
+@analytics_bp.route('/analytics/timeseries', methods=['GET'])
+@require_auth('read')
+def analytics_timeseries_endpoint() -> Tuple[Response, int]:
+    """
+    Return event counts over time for ?event_type=&from=&to=&granularity=.
+    Granularity is minute, hour or day; omitting event_type returns all events.
+    Defaults to the last 60 buckets. Requires read permission.
+    """
+    try:
+        granularity = request.args.get('granularity', 'hour')
+        if granularity not in GRANULARITY_SECONDS:
             return jsonify({
-                "analytics_type": "platform_dashboard",
-                "data": dashboard_data,
-                "client_info": get_client_info()
+                "error": f"granularity must be one of: {', '.join(GRANULARITY_SECONDS)}"
+            }), 400
+        
+        end = _parse_time_param('to', datetime.utcnow())
+        start = _parse_time_param('from', end - timedelta(seconds=GRANULARITY_SECONDS[granularity] * 60))
+        event_type = request.args.get('event_type') or None
+        
+        series = query_timeseries(event_type, start, end, granularity)
+        return jsonify({
+            "analytics_type": "timeseries",
+            "data": series
+        }), 200
+    
+    except InvalidQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except RedisConnectionError as e:
+        return jsonify({
+            "error": "Database connection failed",
+            "message": "Unable to connect to analytics database"
+        }), 503
+    except AnalyticsPlatformError as e:
+        return jsonify({
+            "error": "Analytics error",
+            "details": str(e)
+        }), 500
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to query time series",
+            "details": str(e)
+        }), 500
+
+@analytics_bp.route('/analytics/uniques', methods=['GET'])
+@require_auth('read')
+def analytics_uniques_endpoint() -> Tuple[Response, int]:
+    """
+    Return the approximate number of distinct users or sessions for
+    ?kind=users|sessions&from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive, default today).
+    Requires read permission.
+    """
+    try:
+        kind = request.args.get('kind', 'users')
+        today = datetime.utcnow().date()
+        try:
+            end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else today
+            start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else end
+        except ValueError:
+            return jsonify({"error": "'from' and 'to' must be dates in YYYY-MM-DD format"}), 400
+        
+        count = count_unique(kind, start, end)
+        return jsonify({
+            "analytics_type": "unique_count",
+            "data": {
+                "kind": kind,
+                "from": start.isoformat(),
+                "to": end.isoformat(),
+                "approximate_count": count
+            }
+        }), 200
+    
+    except InvalidQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except RedisConnectionError as e:
+        return jsonify({
+            "error": "Database connection failed",
+            "message": "Unable to connect to analytics database"
+        }), 503
+    except AnalyticsPlatformError as e:
+        return jsonify({
+            "error": "Analytics error",
+            "details": str(e)
+        }), 500
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to count unique identifiers",
+            "details": str(e)
+        }), 500
+
+@analytics_bp.route('/analytics/retention', methods=['GET'])
+@require_auth('read')
+def analytics_retention_endpoint() -> Tuple[Response, int]:
+    """
+    Return day-N retention of daily cohorts for ?cohort=user_registered&days=30
+    (optionally &to=YYYY-MM-DD, default today): for each of the last `days`
+    cohort days, how many of its users were active on every later day.
+    Requires read permission.
+    """
+    try:
+        cohort = request.args.get('cohort', 'user_registered')
+        try:
+            days = int(request.args.get('days', 30))
+            end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else None
+        except ValueError:
+            return jsonify({"error": "days must be an integer and 'to' a date in YYYY-MM-DD format"}), 400
+        
+        return jsonify({
+            "analytics_type": "retention",
+            "data": retention_grid(cohort, days, end)
+        }), 200
+    
+    except InvalidQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except RedisConnectionError as e:
+        return jsonify({
+            "error": "Database connection failed",
+            "message": "Unable to connect to analytics database"
+        }), 503
+    except AnalyticsPlatformError as e:
+        return jsonify({
+            "error": "Analytics error",
+            "details": str(e)
+        }), 500
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to compute retention",
+            "details": str(e)
+        }), 500
+
+@analytics_bp.route('/analytics/breakdown', methods=['GET'])
+@require_auth('read')
+def analytics_breakdown_endpoint() -> Tuple[Response, int]:
+    """
+    Return event counts per value of a property for
+    ?event_type=page_view&by=country&from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive,
+    default the last 7 days) and optional &limit=. Indexed properties are read
+    from the per-day value counters; other properties are counted by a
+    background scan, answered with 202 until its result is available.
+    Requires read permission.
+    """
+    try:
+        event_type = request.args.get('event_type')
+        prop = request.args.get('by')
+        today = datetime.utcnow().date()
+        try:
+            end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else today
+            start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else end - timedelta(days=6)
+            limit = int(request.args.get('limit', BREAKDOWN_DEFAULT_LIMIT))
+        except ValueError:
+            return jsonify({"error": "'from' and 'to' must be dates in YYYY-MM-DD format and limit an integer"}), 400
+        
+        validate_breakdown(event_type, prop, start, end, limit)
+        if prop in INDEXED_PROPERTIES:
+            return jsonify({
+                "analytics_type": "breakdown",
+                "data": indexed_breakdown(event_type, prop, start, end, limit)
             }), 200
-            
+        
+        data, complete = scanned_breakdown(current_app.analytics_queue, event_type, prop, start, end, limit)
+        if not complete:
+            response = jsonify({
+                "analytics_type": "breakdown",
+                "message": f"'{prop}' is not indexed; a background scan is counting its values, retry shortly",
+                "data": data
+            })
+            response.headers['Retry-After'] = '5'
+            return response, 202
+        return jsonify({
+            "analytics_type": "breakdown",
+            "data": data
+        }), 200
+    
+    except InvalidQueryError as e:
+        return jsonify({"error": str(e)}), 400
     except RedisConnectionError as e:
         return jsonify({
             "error": "Database connection failed",
@@ -152,7 +573,135 @@ def analytics_dashboard_endpoint() -> Tuple[Response, int]:
         }), 500
     except Exception as e:
         return jsonify({
-            "error": "Failed to generate analytics",
+            "error": "Failed to compute breakdown",
+            "details": str(e)
+        }), 500
+
+@analytics_bp.route('/analytics/top', methods=['GET'])
+@require_auth('read')
+def analytics_top_endpoint() -> Tuple[Response, int]:
+    """
+    Return the most frequent values of a tracked property for
+    ?property=page_url&window=24h (hours or days, e.g. 7d) and optional &k=.
+    Counts are read from the hourly top-K buckets and are lower bounds once
+    buckets have been trimmed (see max_error). Requires read permission.
+    """
+    try:
+        prop = request.args.get('property', '')
+        hours = parse_window(request.args.get('window', '24h'))
+        try:
+            k = int(request.args.get('k', TOPK_DEFAULT_K))
+        except ValueError:
+            return jsonify({"error": "k must be an integer"}), 400
+        
+        return jsonify({
+            "analytics_type": "top_values",
+            "data": top_values(prop, hours, k)
+        }), 200
+    
+    except InvalidQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except RedisConnectionError as e:
+        return jsonify({
+            "error": "Database connection failed",
+            "message": "Unable to connect to analytics database"
+        }), 503
+    except AnalyticsPlatformError as e:
+        return jsonify({
+            "error": "Analytics error",
+            "details": str(e)
+        }), 500
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to read top values",
+            "details": str(e)
+        }), 500
+
+@analytics_bp.route('/analytics/quantiles', methods=['GET'])
+@require_auth('read')
+def analytics_quantiles_endpoint() -> Tuple[Response, int]:
+    """
+    Return count, sum, min, max, mean and quantiles of a numeric property for
+    ?property=load_time&from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive, default the
+    last 7 days), overall and per day, merged from the daily sketches. Optional
+    &by= (the property's configured grouping, e.g. product_name for revenue)
+    and &q=0.5,0.9,0.99. Requires read permission.
+    """
+    try:
+        prop = request.args.get('property', '')
+        today = datetime.utcnow().date()
+        try:
+            end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else today
+            start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else end - timedelta(days=6)
+        except ValueError:
+            return jsonify({"error": "'from' and 'to' must be dates in YYYY-MM-DD format"}), 400
+        
+        quantiles = parse_quantiles(request.args.get('q'))
+        return jsonify({
+            "analytics_type": "quantiles",
+            "data": property_quantiles(prop, start, end, request.args.get('by') or None, quantiles)
+        }), 200
+    
+    except InvalidQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except RedisConnectionError as e:
+        return jsonify({
+            "error": "Database connection failed",
+            "message": "Unable to connect to analytics database"
+        }), 503
+    except AnalyticsPlatformError as e:
+        return jsonify({
+            "error": "Analytics error",
+            "details": str(e)
+        }), 500
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to compute quantiles",
+            "details": str(e)
+        }), 500
+
+@analytics_bp.route('/analytics/funnels', methods=['POST'])
+@require_auth('read')
+def analytics_funnel_endpoint() -> Tuple[Response, int]:
+    """
+    Evaluate an ordered funnel: {"steps": [{"event_type": ..., "where": {...}}, ...],
+    "window": seconds, "by": "session"|"user", "from": "YYYY-MM-DD", "to": "YYYY-MM-DD"}.
+    Counts the units entering on each day of the range (default the last 7 days)
+    and how many reached every step in order within the window.
+    Requires read permission.
+    """
+    try:
+        payload = request.get_json(silent=True)
+        definition = normalize_funnel(payload)
+        
+        today = datetime.utcnow().date()
+        default_start = max(today - timedelta(days=6), today - timedelta(days=FUNNEL_MAX_RANGE_DAYS - 1))
+        try:
+            end = datetime.strptime(payload['to'], '%Y-%m-%d').date() if payload.get('to') else today
+            start = datetime.strptime(payload['from'], '%Y-%m-%d').date() if payload.get('from') else min(default_start, end)
+        except (TypeError, ValueError):
+            return jsonify({"error": "'from' and 'to' must be dates in YYYY-MM-DD format"}), 400
+        
+        return jsonify({
+            "analytics_type": "funnel",
+            "data": evaluate_funnel(definition, start, end)
+        }), 200
+    
+    except InvalidQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except RedisConnectionError as e:
+        return jsonify({
+            "error": "Database connection failed",
+            "message": "Unable to connect to analytics database"
+        }), 503
+    except AnalyticsPlatformError as e:
+        return jsonify({
+            "error": "Analytics error",
+            "details": str(e)
+        }), 500
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to evaluate funnel",
             "details": str(e)
         }), 500
 
@@ -204,7 +753,7 @@ def enrich_event_endpoint(event_id: str) -> Tuple[Response, int]:
             "enriched_event": enriched_event,
             "status": "updated"
         }), 200
-        
+    
     except RedisConnectionError as e:
         return jsonify({
             "error": "Database connection failed",
@@ -226,7 +775,9 @@ def enrich_event_endpoint(event_id: str) -> Tuple[Response, int]:
 def generate_sample_data_endpoint(num_events: int) -> Tuple[Response, int]:
     """
     Generate sample analytics events for testing and demonstration.
-    Creates realistic event data to populate the analytics dashboard.
+    Creates realistic event data to populate the analytics dashboard, back-dated
+    over the last `days` days (query parameter). Pass `seed` to reproduce a data set.
+    Large requests are split into chunk jobs; poll GET /jobs/<job_id> for progress.
     Requires admin permission.
     """
     try:
@@ -234,15 +785,27 @@ def generate_sample_data_endpoint(num_events: int) -> Tuple[Response, int]:
         if num_events <= 0:
             return jsonify({"error": "Number of events must be positive"}), 400
         
-        if num_events > 10000:
+        if num_events > MAX_SAMPLE_EVENTS:
             return jsonify({
-                "error": "Maximum 10,000 events per request for performance reasons"
+                "error": f"Maximum {MAX_SAMPLE_EVENTS:,} events per request for performance reasons"
             }), 400
         
-        # Enqueue the sample data generation job
+        window_days = request.args.get('days', SAMPLE_DATA_WINDOW_DAYS, type=int)
+        if window_days is None or not 1 <= window_days <= MAX_SAMPLE_WINDOW_DAYS:
+            return jsonify({"error": f"'days' must be an integer between 1 and {MAX_SAMPLE_WINDOW_DAYS}"}), 400
+        
+        seed = request.args.get('seed', type=int)
+        if 'seed' in request.args and seed is None:
+            return jsonify({"error": "'seed' must be an integer"}), 400
+        if seed is None:
+            seed = random.getrandbits(32)
+        
+        # Enqueue the sample data generation job; it fans out chunk jobs as needed
         job = current_app.analytics_queue.enqueue(
             generate_sample_analytics_events, 
             num_events,
+            window_days,
+            seed,
             job_timeout='10m'
         )
         
@@ -250,16 +813,75 @@ def generate_sample_data_endpoint(num_events: int) -> Tuple[Response, int]:
             "message": f"Sample data generation started for {num_events} events",
             "job_id": job.id,
             "status": "enqueued",
-            "estimated_completion": "1-5 minutes",
+            "seed": seed,
+            "window_days": window_days,
+            "chunks": -(-num_events // SAMPLE_DATA_CHUNK_SIZE),
+            "progress_url": f"/jobs/{job.id}",
             "client_info": get_client_info()
         }), 202
-        
+    
     except Exception as e:
         return jsonify({
             "error": "Failed to start sample data generation",
             "details": str(e)
         }), 500
 
+@analytics_bp.route('/jobs/<job_id>', methods=['GET'])
+@require_admin()
+def get_job_status_endpoint(job_id: str) -> Tuple[Response, int]:
+    """
+    Report the status of a background job. For sample data generation jobs the
+    response includes progress aggregated over all of its chunk jobs.
+    Requires admin permission.
+    """
+    try:
+        job = Job.fetch(job_id, connection=current_app.analytics_queue.connection)
+    except NoSuchJobError:
+        return jsonify({
+            "error": "Job not found",
+            "message": f"No job with ID {job_id} exists or its result has expired"
+        }), 404
+    except RedisError as e:
+        return jsonify({
+            "error": "Database connection failed",
+            "message": "Unable to connect to analytics database"
+        }), 503
+    
+    try:
+        status = job.get_status(refresh=False)
+        response = {
+            "job_id": job.id,
+            "function": job.func_name,
+            "status": status.value if status else None,
+            "enqueued_at": job.enqueued_at.isoformat() if job.enqueued_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "ended_at": job.ended_at.isoformat() if job.ended_at else None,
+            "meta": job.meta
+        }
+        if status == JobStatus.FINISHED:
+            response["result"] = job.return_value(refresh=False)
+        elif status == JobStatus.FAILED:
+            result = job.latest_result()
+            response["error"] = result.exc_string.strip().splitlines()[-1] if result and result.exc_string else None
+        
+        progress = get_sample_generation_progress(job.id)
+        if progress:
+            progress['complete'] = progress['chunks_done'] == progress['chunks']
+            response["progress"] = progress
+        
+        return jsonify(response), 200
+    
+    except RedisConnectionError as e:
+        return jsonify({
+            "error": "Database connection failed",
+            "message": "Unable to connect to analytics database"
+        }), 503
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to retrieve job status",
+            "details": str(e)
+        }), 500
+
 @analytics_bp.route('/events/<event_id>/', methods=['GET'])
 @require_auth('read')
 def get_event_details_endpoint(event_id: str) -> Tuple[Response, int]:
@@ -285,7 +907,7 @@ def get_event_details_endpoint(event_id: str) -> Tuple[Response, int]:
             "message": "Event details retrieved successfully",
             "event_data": event_data
         }), 200
-        
+    
     except RedisConnectionError as e:
         return jsonify({
             "error": "Database connection failed", 
@@ -302,6 +924,50 @@ def get_event_details_endpoint(event_id: str) -> Tuple[Response, int]:
             "details": str(e)
         }), 500
 
+@analytics_bp.route('/events/', methods=['GET'])
+@require_auth('read')
+def get_events_bulk_endpoint() -> Tuple[Response, int]:
+    """
+    Retrieve multiple events in one request via ?ids=evt_a,evt_b,...
+    Events are fetched with a single HMGET; unknown IDs are listed in 'missing'.
+    Requires read permission.
+    """
+    try:
+        ids_param = request.args.get('ids', '')
+        event_ids = list(dict.fromkeys(event_id.strip() for event_id in ids_param.split(',') if event_id.strip()))
+        
+        if not event_ids:
+            return jsonify({"error": "Query parameter 'ids' must list at least one event_id"}), 400
+        
+        if len(event_ids) > MAX_BULK_EVENT_IDS:
+            return jsonify({
+                "error": f"Maximum {MAX_BULK_EVENT_IDS} event IDs per request"
+            }), 400
+        
+        events = retrieve_events_by_ids(event_ids)
+        
+        return jsonify({
+            "message": "Events retrieved successfully",
+            "events": [event for event in events.values() if event],
+            "missing": [event_id for event_id, event in events.items() if not event]
+        }), 200
+    
+    except RedisConnectionError as e:
+        return jsonify({
+            "error": "Database connection failed", 
+            "message": "Unable to connect to analytics database"
+        }), 503
+    except AnalyticsPlatformError as e:
+        return jsonify({
+            "error": "Platform error",
+            "details": str(e)
+        }), 500
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to retrieve events",
+            "details": str(e)
+        }), 500
+
 @analytics_bp.route('/auth/info', methods=['GET'])
 @require_auth('read')
 def auth_info_endpoint() -> Tuple[Response, int]:
@@ -319,4 +985,188 @@ def auth_info_endpoint() -> Tuple[Response, int]:
         return jsonify({
             "error": "Failed to retrieve auth info",
             "details": str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+@analytics_bp.route('/admin/api-keys', methods=['POST'])
+@require_admin()
+def create_api_key_endpoint() -> Tuple[Response, int]:
+    """
+    Create a new API key. The plaintext key is returned once and never stored.
+    Requires admin permission.
+    """
+    try:
+        if not request.is_json:
+            return jsonify({"error": "Request must contain JSON data"}), 400
+        
+        key_request = request.get_json()
+        name = key_request.get('name')
+        permissions = key_request.get('permissions', ['read'])
+        rate_limit = key_request.get('rate_limit', 100)
+        
+        if not isinstance(name, str) or len(name.strip()) == 0:
+            return jsonify({"error": "name must be a non-empty string"}), 400
+        
+        if not isinstance(permissions, list) or not set(permissions) <= {'read', 'write', 'admin'}:
+            return jsonify({"error": "permissions must be a list drawn from read, write, admin"}), 400
+        
+        if not isinstance(rate_limit, int) or rate_limit <= 0:
+            return jsonify({"error": "rate_limit must be a positive integer"}), 400
+        
+        api_key, key_info = api_key_manager.create_key(name.strip(), permissions, rate_limit)
+        return jsonify({
+            "message": "API key created; store it now, it cannot be retrieved again",
+            "api_key": api_key,
+            "key_info": key_info
+        }), 201
+    
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to create API key",
+            "details": str(e)
+        }), 500
+
+@analytics_bp.route('/admin/api-keys', methods=['GET'])
+@require_admin()
+def list_api_keys_endpoint() -> Tuple[Response, int]:
+    """
+    List metadata for all active API keys (never the keys themselves).
+    Requires admin permission.
+    """
+    try:
+        return jsonify({
+            "message": "API keys retrieved successfully",
+            "api_keys": api_key_manager.list_keys()
+        }), 200
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to list API keys",
+            "details": str(e)
+        }), 500
+
+@analytics_bp.route('/admin/api-keys/<key_id>', methods=['DELETE'])
+@require_admin()
+def revoke_api_key_endpoint(key_id: str) -> Tuple[Response, int]:
+    """
+    Revoke an API key by its key_id. Takes effect in every process immediately.
+    Requires admin permission.
+    """
+    try:
+        if not api_key_manager.revoke_key(key_id):
+            return jsonify({
+                "error": "API key not found",
+                "key_id": key_id
+            }), 404
+        
+        return jsonify({
+            "message": "API key revoked",
+            "key_id": key_id,
+            "status": "revoked"
+        }), 200
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to revoke API key",
+            "details": str(e)
+        }), 500
+
+@analytics_bp.route('/admin/compression', methods=['GET'])
+@require_admin()
+def compression_stats_endpoint() -> Tuple[Response, int]:
+    """
+    Report event payload compression counters for this process together with the
+    trained per-event_type dictionaries, for tuning the compression threshold.
+    Requires admin permission.
+    """
+    try:
+        return jsonify({
+            "message": "Compression statistics retrieved successfully",
+            "compression": get_compression_stats()
+        }), 200
+    except RedisConnectionError as e:
+        return jsonify({
+            "error": "Database connection failed",
+            "message": "Unable to connect to analytics database"
+        }), 503
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to retrieve compression statistics",
+            "details": str(e)
+        }), 500
+
+@analytics_bp.route('/admin/compression/train', methods=['POST'])
+@require_admin()
+def train_compression_endpoint() -> Tuple[Response, int]:
+    """
+    Enqueue a compression dictionary training run over the most recent events.
+    Requires admin permission.
+    """
+    try:
+        job = current_app.analytics_queue.enqueue(
+            train_compression_dictionaries,
+            job_timeout='30m'
+        )
+        
+        return jsonify({
+            "message": "Compression dictionary training started",
+            "job_id": job.id,
+            "status": "enqueued"
+        }), 202
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to start compression dictionary training",
+            "details": str(e)
+        }), 500
+
+@analytics_bp.route('/admin/profiles', methods=['GET'])
+@require_admin()
+def list_profiles_endpoint() -> Tuple[Response, int]:
+    """
+    List the stored request profiles, most recent first.
+    Requires admin permission.
+    """
+    try:
+        profiles = list_profiles()
+        return jsonify({
+            "message": "Profiles retrieved successfully",
+            "profiles": profiles,
+            "count": len(profiles)
+        }), 200
+    except RedisConnectionError as e:
+        return jsonify({
+            "error": "Database connection failed",
+            "message": "Unable to connect to analytics database"
+        }), 503
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to list profiles",
+            "details": str(e)
+        }), 500
+
+@analytics_bp.route('/admin/profiles/<profile_id>', methods=['GET'])
+@require_admin()
+def get_profile_endpoint(profile_id: str):
+    """
+    Download a request profile as collapsed stacks (text/plain), ready for
+    flamegraph.pl or speedscope. ?format=json returns the full profile instead.
+    Requires admin permission.
+    """
+    try:
+        profile = get_profile(profile_id)
+        if profile is None:
+            return jsonify({
+                "error": "Profile not found",
+                "profile_id": profile_id
+            }), 404
+        
+        if request.args.get('format') == 'json':
+            return jsonify(profile), 200
+        return Response(collapsed_stacks(profile), status=200, content_type='text/plain; charset=utf-8')
+    except RedisConnectionError as e:
+        return jsonify({
+            "error": "Database connection failed",
+            "message": "Unable to connect to analytics database"
+        }), 503
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to retrieve profile",
+            "details": str(e)
+        }), 500
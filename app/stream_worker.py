@@ -0,0 +1,183 @@
+"""
+Consumer-group worker for the ingest stream (INGEST_MODE=stream).
+
+Reads events appended by POST /events/ in batches and applies the same writes
+store_event_data performs in sync mode, acknowledging each batch in the same
+pipelined round trip. Entries left pending by a crashed consumer are taken
+over with XAUTOCLAIM. Run more processes to scale out:
+
+    python -m app.stream_worker
+"""
+import os
+import time
+import signal
+import socket
+import logging
+from typing import List, Tuple, Dict, Any, Optional
+from redis import ConnectionError, TimeoutError
+
+from .redis_client import analytics_redis
+from .event_codec import decode_event
+from .utils import queue_event_writes
+from .timeseries import load_watermarks
+from .ingest_stream import (
+    INGEST_STREAM_KEY,
+    INGEST_STREAM_GROUP,
+    INGEST_DEAD_LETTER_KEY,
+    INGEST_STREAM_MAXLEN,
+    EVENT_FIELD,
+    ensure_consumer_group
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ───────────────────────────────────────
+# Stream Worker Configuration
+# ───────────────────────────────────────
+
+# Entries read per XREADGROUP call
+STREAM_BATCH_SIZE = int(os.getenv('INGEST_STREAM_BATCH_SIZE', 500))
+
+# Milliseconds to block waiting for new entries
+STREAM_BLOCK_MS = int(os.getenv('INGEST_STREAM_BLOCK_MS', 1000))
+
+# Pending entries idle this long (ms) are assumed abandoned and claimed by another consumer
+STREAM_CLAIM_IDLE_MS = int(os.getenv('INGEST_STREAM_CLAIM_IDLE_MS', 60000))
+
+# Seconds between XAUTOCLAIM sweeps
+STREAM_CLAIM_INTERVAL = float(os.getenv('INGEST_STREAM_CLAIM_INTERVAL', 30))
+
+# Fields every event record needs before its writes can be applied
+REQUIRED_FIELDS = frozenset(('event_id', 'event_type', 'user_id', 'session_id', 'timestamp', 'properties'))
+
+class StreamWorker:
+    """
+    One consumer in the ingest stream's consumer group. Delivery is at-least-once:
+    a batch is acknowledged only after its writes succeed, so a crash between the
+    two can apply an event's counters twice when the batch is claimed again.
+    """
+    
+    def __init__(self, consumer_name: Optional[str] = None):
+        self.consumer_name = consumer_name or f'{socket.gethostname()}-{os.getpid()}'
+        self._stopping = False
+        self._last_claim = 0.0
+        self._claim_cursor = '0-0'
+        
+        # Counters
+        self.processed_total = 0
+        self.claimed_total = 0
+        self.dead_lettered_total = 0
+    
+    def stop(self, *_):
+        """Finish the current batch and exit the run loop"""
+        logger.info(f"Stream worker {self.consumer_name} stopping")
+        self._stopping = True
+    
+    def run(self):
+        """Process the stream until stopped"""
+        ensure_consumer_group()
+        logger.info(f"Stream worker {self.consumer_name} consuming {INGEST_STREAM_KEY} as {INGEST_STREAM_GROUP}")
+        
+        while not self._stopping:
+            try:
+                if time.monotonic() - self._last_claim >= STREAM_CLAIM_INTERVAL:
+                    self.claim_abandoned()
+                self.process_new()
+            except (ConnectionError, TimeoutError) as e:
+                logger.error(f"Stream worker lost its Redis connection: {e}")
+                time.sleep(1)
+            except Exception as e:
+                logger.error(f"Stream worker batch failed: {e}")
+                time.sleep(1)
+        
+        logger.info(
+            f"Stream worker {self.consumer_name} stopped: {self.processed_total} processed, "
+            f"{self.claimed_total} claimed, {self.dead_lettered_total} dead-lettered"
+        )
+    
+    def process_new(self) -> int:
+        """Read and apply one batch of new entries; returns the number processed"""
+        response = analytics_redis.xreadgroup(
+            INGEST_STREAM_GROUP,
+            self.consumer_name,
+            {INGEST_STREAM_KEY: '>'},
+            count=STREAM_BATCH_SIZE,
+            block=STREAM_BLOCK_MS
+        )
+        if not response:
+            return 0
+        _, entries = response[0]
+        return self.apply(entries)
+    
+    def claim_abandoned(self) -> int:
+        """
+        Take over entries that other consumers read but never acknowledged,
+        sweeping the pending list a batch at a time across calls.
+        """
+        self._last_claim = time.monotonic()
+        result = analytics_redis.xautoclaim(
+            INGEST_STREAM_KEY,
+            INGEST_STREAM_GROUP,
+            self.consumer_name,
+            STREAM_CLAIM_IDLE_MS,
+            start_id=self._claim_cursor,
+            count=STREAM_BATCH_SIZE
+        )
+        next_cursor, entries = result[0], result[1]
+        self._claim_cursor = next_cursor.decode('utf-8') if isinstance(next_cursor, bytes) else next_cursor
+        
+        if entries:
+            self.claimed_total += len(entries)
+            logger.warning(f"Claimed {len(entries)} abandoned ingest stream entries")
+        return self.apply(entries)
+    
+    def apply(self, entries: List[Tuple[bytes, Dict[bytes, bytes]]]) -> int:
+        """
+        Apply the writes for a batch of entries and acknowledge them in one pipeline.
+        Entries that cannot be decoded (or were trimmed while pending) are moved to
+        the dead-letter stream and acknowledged so they are not redelivered.
+        """
+        if not entries:
+            return 0
+        
+        entry_ids = []
+        applied = 0
+        # Entries can be applied long after they were appended, so late events are
+        # written straight into the hour and day buckets already rolled up
+        watermarks = load_watermarks()
+        with analytics_redis.pipeline(transaction=False) as pipe:
+            for entry_id, fields in entries:
+                entry_ids.append(entry_id)
+                raw = fields.get(EVENT_FIELD.encode('utf-8')) if fields else None
+                try:
+                    if raw is None:
+                        raise ValueError("entry has no event payload")
+                    event_data = decode_event(raw)
+                    missing = REQUIRED_FIELDS - event_data.keys()
+                    if missing:
+                        raise ValueError(f"event record is missing {', '.join(sorted(missing))}")
+                except (ValueError, AttributeError) as e:
+                    logger.error(f"Dead-lettering ingest stream entry {entry_id}: {e}")
+                    if raw is not None:
+                        pipe.xadd(INGEST_DEAD_LETTER_KEY, {EVENT_FIELD: raw, 'error': str(e)}, maxlen=INGEST_STREAM_MAXLEN)
+                    self.dead_lettered_total += 1
+                    continue
+                queue_event_writes(pipe, event_data, watermarks)
+                applied += 1
+            pipe.xack(INGEST_STREAM_KEY, INGEST_STREAM_GROUP, *entry_ids)
+            pipe.execute()
+        
+        self.processed_total += applied
+        logger.debug("Applied %d ingest stream entries", applied)
+        return applied
+
+def main():
+    """Entry point: run a stream worker until SIGTERM/SIGINT"""
+    worker = StreamWorker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+if __name__ == '__main__':
+    main()
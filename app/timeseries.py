@@ -0,0 +1,298 @@
+import os
+import time
+import calendar
+import logging
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Tuple, Iterable, Optional
+from redis import ConnectionError, TimeoutError
+
+from .redis_client import analytics_redis
+from .exceptions import AnalyticsPlatformError, RedisConnectionError, InvalidQueryError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ───────────────────────────────────────
+# Time-Series Configuration
+# ───────────────────────────────────────
+
+# Pseudo event type holding the total across all event types
+ALL_EVENTS = '_all'
+
+# Bucket width per granularity (in seconds)
+GRANULARITY_SECONDS = {
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+}
+
+# Finer granularity that each coarser series is rolled up from
+ROLLUP_SOURCE = {
+    'hour': 'minute',
+    'day': 'hour',
+}
+
+# How long buckets of each granularity are kept (in seconds)
+TIMESERIES_RETENTION = {
+    'minute': int(os.getenv('TIMESERIES_MINUTE_TTL', 86400 * 2)),  # 2 days
+    'hour': int(os.getenv('TIMESERIES_HOUR_TTL', 86400 * 30)),  # 30 days
+    'day': int(os.getenv('TIMESERIES_DAY_TTL', 86400 * 400)),  # ~13 months
+}
+
+# Upper bound on the number of buckets a single query may return
+MAX_QUERY_BUCKETS = int(os.getenv('TIMESERIES_MAX_BUCKETS', 1500))
+
+# Seconds a bucket is left open after it ends before it is rolled up, so events
+# still in flight (write-behind buffer, ingest stream) land before the rollup reads it
+ROLLUP_GRACE = int(os.getenv('TIMESERIES_ROLLUP_GRACE', 120))
+
+# Hash of granularity -> epoch up to which buckets have been rolled up
+ROLLUP_WATERMARK_KEY = 'ts:rollup:watermark'
+
+# ───────────────────────────────────────
+# Bucket and Key Helpers
+# ───────────────────────────────────────
+
+def to_epoch(dt: datetime) -> int:
+    """Convert a naive UTC datetime (as stored on events) to a unix timestamp"""
+    return calendar.timegm(dt.utctimetuple())
+
+def bucket_start(epoch: int, granularity: str) -> int:
+    """Align a unix timestamp to the start of its bucket"""
+    size = GRANULARITY_SECONDS[granularity]
+    return epoch - epoch % size
+
+def _container(granularity: str, bucket: int) -> Tuple[str, int]:
+    """
+    Return the key suffix and end timestamp of the hash holding a bucket.
+    Minute buckets are grouped per day, hour buckets per month and day buckets per year,
+    so each hash stays small and expires as a whole once its last bucket ages out.
+    """
+    dt = datetime.fromtimestamp(bucket, tz=timezone.utc)
+    if granularity == 'minute':
+        start = dt.replace(hour=0, minute=0, second=0)
+        return start.strftime('%Y-%m-%d'), int(start.timestamp()) + 86400
+    if granularity == 'hour':
+        start = dt.replace(day=1, hour=0, minute=0, second=0)
+        if start.month == 12:
+            end = start.replace(year=start.year + 1, month=1)
+        else:
+            end = start.replace(month=start.month + 1)
+        return start.strftime('%Y-%m'), int(end.timestamp())
+    start = dt.replace(month=1, day=1, hour=0, minute=0, second=0)
+    return start.strftime('%Y'), int(start.replace(year=start.year + 1).timestamp())
+
+def timeseries_key(granularity: str, event_type: str, bucket: int) -> Tuple[str, int]:
+    """Return the Redis key holding a bucket and the absolute time at which that key expires"""
+    suffix, container_end = _container(granularity, bucket)
+    return f'ts:{granularity}:{event_type}:{suffix}', container_end + TIMESERIES_RETENTION[granularity]
+
+# ───────────────────────────────────────
+# Write Path
+# ───────────────────────────────────────
+
+def queue_timeseries_writes(pipe, event_type: str, event_time: datetime,
+                            watermarks: Optional[Dict[str, int]] = None) -> None:
+    """
+    Queue minute-resolution counter increments for an event onto a pipeline.
+    Both the event type's series and the all-events series are updated.
+    EXPIREAT is absolute, so repeating it on every write never extends retention.
+    
+    Pass the rollup watermarks when writing back-dated events: hour and day
+    buckets that rollups have already passed (or will never reach because their
+    minute data has aged out) are then incremented directly.
+    """
+    epoch = to_epoch(event_time)
+    granularities = ['minute']
+    if watermarks is not None:
+        granularities += late_granularities(epoch, watermarks)
+    
+    now = time.time()
+    for granularity in granularities:
+        bucket = bucket_start(epoch, granularity)
+        for series in (event_type, ALL_EVENTS):
+            key, expire_at = timeseries_key(granularity, series, bucket)
+            if expire_at <= now:
+                continue
+            pipe.hincrby(key, str(bucket), 1)
+            pipe.expireat(key, expire_at)
+
+def late_granularities(epoch: int, watermarks: Dict[str, int]) -> List[str]:
+    """Coarser granularities whose bucket for this timestamp will not be produced by a rollup"""
+    return [
+        granularity for granularity in ROLLUP_SOURCE
+        if bucket_start(epoch, granularity) + GRANULARITY_SECONDS[granularity] <= rollup_horizon(granularity, watermarks)
+    ]
+
+def rollup_horizon(granularity: str, watermarks: Dict[str, int]) -> int:
+    """
+    Epoch before which buckets of a rolled-up granularity are read from storage:
+    the rollup watermark, or the point where the source series has aged out if later.
+    """
+    source = ROLLUP_SOURCE[granularity]
+    earliest = bucket_start(int(time.time()) - TIMESERIES_RETENTION[source], granularity)
+    return max(watermarks.get(granularity, 0), earliest)
+
+# ───────────────────────────────────────
+# Read Path
+# ───────────────────────────────────────
+
+def _read_stored_buckets(granularity: str, event_type: str, buckets: List[int]) -> List[int]:
+    """Read stored bucket counts with one HMGET per container hash, all in one pipeline"""
+    if not buckets:
+        return []
+    
+    fields_by_key: Dict[str, List[int]] = {}
+    for bucket in buckets:
+        key, _ = timeseries_key(granularity, event_type, bucket)
+        fields_by_key.setdefault(key, []).append(bucket)
+    
+    with analytics_redis.pipeline(transaction=False) as pipe:
+        for key, key_buckets in fields_by_key.items():
+            pipe.hmget(key, [str(bucket) for bucket in key_buckets])
+        results = pipe.execute()
+    
+    counts: Dict[int, int] = {}
+    for key_buckets, values in zip(fields_by_key.values(), results):
+        for bucket, value in zip(key_buckets, values):
+            counts[bucket] = int(value) if value else 0
+    return [counts[bucket] for bucket in buckets]
+
+def _read_buckets(granularity: str, event_type: str, buckets: List[int], watermarks: Dict[str, int]) -> List[int]:
+    """
+    Read bucket counts, answering buckets that have not been rolled up yet
+    from the next finer granularity while its data is still retained.
+    """
+    if granularity not in ROLLUP_SOURCE:
+        return _read_stored_buckets(granularity, event_type, buckets)
+    
+    size = GRANULARITY_SECONDS[granularity]
+    horizon = rollup_horizon(granularity, watermarks)
+    rolled = [bucket for bucket in buckets if bucket + size <= horizon]
+    pending = [bucket for bucket in buckets if bucket + size > horizon]
+    
+    counts = dict(zip(rolled, _read_stored_buckets(granularity, event_type, rolled)))
+    
+    if pending:
+        source = ROLLUP_SOURCE[granularity]
+        source_size = GRANULARITY_SECONDS[source]
+        per_bucket = size // source_size
+        sub_buckets = [bucket + i * source_size for bucket in pending for i in range(per_bucket)]
+        sub_counts = _read_buckets(source, event_type, sub_buckets, watermarks)
+        for index, bucket in enumerate(pending):
+            counts[bucket] = sum(sub_counts[index * per_bucket:(index + 1) * per_bucket])
+    
+    return [counts[bucket] for bucket in buckets]
+
+def load_watermarks() -> Dict[str, int]:
+    """Load rollup watermarks per granularity"""
+    raw = analytics_redis.hgetall(ROLLUP_WATERMARK_KEY)
+    return {key.decode('utf-8'): int(value) for key, value in raw.items()}
+
+def query_timeseries(event_type: str, start: datetime, end: datetime, granularity: str) -> Dict[str, Any]:
+    """
+    Return event counts per bucket for the half-open range [start, end).
+    Only the buckets covering the range are read.
+    """
+    if granularity not in GRANULARITY_SECONDS:
+        raise InvalidQueryError(f"granularity must be one of: {', '.join(GRANULARITY_SECONDS)}")
+    
+    start_epoch = bucket_start(to_epoch(start), granularity)
+    end_epoch = to_epoch(end)
+    if end_epoch <= start_epoch:
+        raise InvalidQueryError("'to' must be later than 'from'")
+    
+    buckets = list(range(start_epoch, end_epoch, GRANULARITY_SECONDS[granularity]))
+    if len(buckets) > MAX_QUERY_BUCKETS:
+        raise InvalidQueryError(
+            f"Range covers {len(buckets)} {granularity} buckets; maximum is {MAX_QUERY_BUCKETS}"
+        )
+    
+    series = event_type or ALL_EVENTS
+    try:
+        counts = _read_buckets(granularity, series, buckets, load_watermarks())
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while querying time series: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to query time series for {series}: {e}")
+        raise AnalyticsPlatformError(f"Time series query failed: {e}")
+    
+    return {
+        'event_type': event_type or None,
+        'granularity': granularity,
+        'from': datetime.utcfromtimestamp(start_epoch).isoformat(),
+        'to': datetime.utcfromtimestamp(end_epoch).isoformat(),
+        'total': sum(counts),
+        'points': [
+            {'timestamp': datetime.utcfromtimestamp(bucket).isoformat(), 'count': count}
+            for bucket, count in zip(buckets, counts)
+        ]
+    }
+
+# ───────────────────────────────────────
+# Rollups
+# ───────────────────────────────────────
+
+def _known_series() -> List[str]:
+    """Event types with counters, plus the all-events series"""
+    return [event_type.decode('utf-8') for event_type in analytics_redis.hkeys('event_type_metrics')] + [ALL_EVENTS]
+
+def _write_buckets(granularity: str, event_type: str, buckets: Iterable[int], counts: Iterable[int]) -> int:
+    """Store rolled-up bucket counts; HSET makes re-running a rollup idempotent"""
+    written = 0
+    with analytics_redis.pipeline(transaction=False) as pipe:
+        for bucket, count in zip(buckets, counts):
+            if not count:
+                continue
+            key, expire_at = timeseries_key(granularity, event_type, bucket)
+            pipe.hset(key, str(bucket), count)
+            pipe.expireat(key, expire_at)
+            written += 1
+        if written:
+            pipe.execute()
+    return written
+
+def rollup_timeseries() -> Dict[str, int]:
+    """
+    Background job to roll completed minute buckets up into hours and completed
+    hours up into days. Work resumes from the stored watermark, so each bucket is
+    rolled up once; fine-grained buckets are then left to expire with their
+    container hash after their retention. Returns the number of buckets written.
+    """
+    try:
+        now = to_epoch(datetime.utcnow())
+        watermarks = load_watermarks()
+        series_list = _known_series()
+        stats = {}
+        
+        for granularity in ('hour', 'day'):
+            size = GRANULARITY_SECONDS[granularity]
+            source = ROLLUP_SOURCE[granularity]
+            
+            # Source buckets older than their retention are gone, so never start before them
+            earliest = bucket_start(now - TIMESERIES_RETENTION[source], granularity)
+            start = max(watermarks.get(granularity, earliest), earliest)
+            complete_end = bucket_start(now - ROLLUP_GRACE, granularity)
+            buckets = list(range(start, complete_end, size))
+            
+            written = 0
+            for series in series_list:
+                counts = _read_buckets(granularity, series, buckets, watermarks)
+                written += _write_buckets(granularity, series, buckets, counts)
+            
+            # Advance the watermark so coarser rollups and queries read the stored buckets
+            if complete_end > watermarks.get(granularity, 0):
+                analytics_redis.hset(ROLLUP_WATERMARK_KEY, granularity, complete_end)
+                watermarks[granularity] = complete_end
+            stats[f'{granularity}_buckets_written'] = written
+        
+        logger.info(f"Time series rollup completed: {stats}")
+        return stats
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed during time series rollup: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to roll up time series: {e}")
+        raise AnalyticsPlatformError(f"Time series rollup failed: {e}")
@@ -0,0 +1,57 @@
+"""
+Per-request timing breakdown.
+
+Every response carries a Server-Timing header splitting the request into time
+spent waiting on Redis, decoding stored event payloads and in total, plus the
+number of Redis commands and round trips it issued. An admin key sending
+X-Debug-Trace: 1 also gets the full command trace (name, offset and duration
+of every round trip, and per-command totals) under "trace" in the JSON body,
+which makes N+1 access patterns visible on real traffic.
+"""
+import time
+import logging
+from flask import request, g, current_app
+
+from .redis_client import start_request_trace, end_request_trace
+from .auth import api_key_manager
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Request header that asks for the command trace in the response body (admin keys only)
+TRACE_HEADER = 'X-Debug-Trace'
+
+def begin_request_trace() -> None:
+    """before_request hook: start tracing Redis usage, recording every call if requested"""
+    g.request_trace = start_request_trace(record_calls=bool(request.headers.get(TRACE_HEADER)))
+
+def apply_server_timing(response):
+    """after_request hook: add Server-Timing and Redis command headers, and the trace for admins"""
+    trace = g.get('request_trace')
+    if trace is None:
+        return response
+    
+    total_ms = (time.perf_counter() - trace.started) * 1000
+    response.headers['Server-Timing'] = (
+        f'redis;dur={trace.redis_seconds * 1000:.2f};desc="{trace.round_trips} round trips", '
+        f'decode;dur={trace.decode_seconds * 1000:.2f}, '
+        f'total;dur={total_ms:.2f}'
+    )
+    response.headers['X-Redis-Commands'] = str(trace.commands)
+    response.headers['X-Redis-Round-Trips'] = str(trace.round_trips)
+    
+    if trace.calls is not None and _is_admin_request() and response.is_json:
+        body = response.get_json(silent=True)
+        if isinstance(body, dict):
+            body['trace'] = {'total_ms': round(total_ms, 3), **trace.summary()}
+            response.set_data(current_app.json.dumps(body))
+            logger.info("Returned command trace for %s %s: %d commands", request.method, request.path, trace.commands)
+    return response
+
+def finish_request_trace(exc=None) -> None:
+    """teardown_request hook: stop tracing once every after_request hook has run"""
+    end_request_trace()
+
+def _is_admin_request() -> bool:
+    key_info = getattr(request, 'api_key_info', None)
+    return key_info is not None and api_key_manager.has_permission(key_info, 'admin')
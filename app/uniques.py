@@ -0,0 +1,143 @@
+import os
+import logging
+from datetime import datetime, timedelta, date
+from typing import Dict, Any, List
+from redis import ConnectionError, TimeoutError
+
+from .redis_client import analytics_redis, DATA_RETENTION
+from .timeseries import to_epoch
+from .exceptions import AnalyticsPlatformError, RedisConnectionError, InvalidQueryError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ───────────────────────────────────────
+# Unique Counting Configuration
+# ───────────────────────────────────────
+
+# 'exact' keeps the unique_users/unique_sessions sets, 'approximate' keeps per-day
+# HyperLogLogs (~12 KB each regardless of cardinality), 'both' maintains both
+UNIQUE_COUNTING_MODE = os.getenv('UNIQUE_COUNTING_MODE', 'exact').lower()
+
+# Kinds of identifiers that are counted
+UNIQUE_KINDS = ('users', 'sessions')
+
+# Per-day HyperLogLogs are kept long enough to answer MAU over the daily counts window
+HLL_RETENTION = DATA_RETENTION['daily_counts']
+
+# Longest range (in days) accepted by a unique count query
+MAX_UNIQUE_RANGE_DAYS = int(os.getenv('MAX_UNIQUE_RANGE_DAYS', 90))
+
+def exact_counting_enabled() -> bool:
+    """Whether the exact unique sets are maintained"""
+    return UNIQUE_COUNTING_MODE in ('exact', 'both')
+
+def approximate_counting_enabled() -> bool:
+    """Whether the per-day HyperLogLogs are maintained"""
+    return UNIQUE_COUNTING_MODE in ('approximate', 'both')
+
+def hll_key(kind: str, day: date) -> str:
+    """Key of the HyperLogLog for one kind of identifier on one UTC day"""
+    return f"hll:{kind}:{day.strftime('%Y-%m-%d')}"
+
+def _day_keys(kind: str, start: date, end: date) -> List[str]:
+    """HyperLogLog keys for every day in the inclusive range"""
+    return [hll_key(kind, start + timedelta(days=i)) for i in range((end - start).days + 1)]
+
+# ───────────────────────────────────────
+# Write Path
+# ───────────────────────────────────────
+
+def queue_unique_writes(pipe, user_id: str, session_id: str, event_time: datetime) -> None:
+    """
+    Queue unique user/session tracking for an event onto a pipeline,
+    according to UNIQUE_COUNTING_MODE.
+    """
+    if exact_counting_enabled():
+        pipe.sadd('unique_users', user_id, ex=DATA_RETENTION['user_sessions'])
+        pipe.sadd('unique_sessions', session_id, ex=DATA_RETENTION['user_sessions'])
+    
+    if approximate_counting_enabled():
+        day = event_time.date()
+        # Absolute expiry at the end of the day plus retention, so re-sending it never extends the key
+        expire_at = to_epoch(datetime.combine(day + timedelta(days=1), datetime.min.time())) + HLL_RETENTION
+        for kind, value in (('users', user_id), ('sessions', session_id)):
+            key = hll_key(kind, day)
+            pipe.pfadd(key, value)
+            pipe.expireat(key, expire_at)
+
+# ───────────────────────────────────────
+# Read Path
+# ───────────────────────────────────────
+
+def queue_unique_totals(pipe, window_days: int) -> None:
+    """
+    Queue reads of the dashboard's unique user and session totals.
+    Exact mode uses SCARD on the sets; approximate mode uses PFCOUNT over the
+    per-day HyperLogLogs of the last window_days days.
+    """
+    if exact_counting_enabled():
+        pipe.scard('unique_users')
+        pipe.scard('unique_sessions')
+    else:
+        today = datetime.utcnow().date()
+        start = today - timedelta(days=window_days - 1)
+        pipe.pfcount(*_day_keys('users', start, today))
+        pipe.pfcount(*_day_keys('sessions', start, today))
+
+def count_unique(kind: str, start: date, end: date) -> int:
+    """
+    Approximate number of distinct users or sessions seen in the inclusive day range.
+    Ranges that end before today are immutable, so their PFMERGE result is cached
+    under a range key; ranges including today are counted with a multi-key PFCOUNT.
+    """
+    if kind not in UNIQUE_KINDS:
+        raise InvalidQueryError(f"kind must be one of: {', '.join(UNIQUE_KINDS)}")
+    if not approximate_counting_enabled():
+        raise InvalidQueryError("Unique range queries require UNIQUE_COUNTING_MODE=approximate or both")
+    if end < start:
+        raise InvalidQueryError("'to' must not be earlier than 'from'")
+    if (end - start).days + 1 > MAX_UNIQUE_RANGE_DAYS:
+        raise InvalidQueryError(f"Range may cover at most {MAX_UNIQUE_RANGE_DAYS} days")
+    
+    try:
+        day_keys = _day_keys(kind, start, end)
+        if len(day_keys) == 1 or end >= datetime.utcnow().date():
+            return analytics_redis.pfcount(*day_keys)
+        
+        range_key = f"hll:{kind}:range:{start.isoformat()}:{end.isoformat()}"
+        if not analytics_redis.exists(range_key):
+            analytics_redis.pfmerge(range_key, *day_keys, ex=DATA_RETENTION['analytics_cache'])
+        return analytics_redis.pfcount(range_key)
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while counting unique {kind}: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to count unique {kind}: {e}")
+        raise AnalyticsPlatformError(f"Unique count failed: {e}")
+
+def get_active_users() -> Dict[str, Any]:
+    """
+    Approximate daily, weekly and monthly active users ending today, read in one round trip.
+    """
+    try:
+        today = datetime.utcnow().date()
+        with analytics_redis.pipeline(transaction=False) as pipe:
+            for window in (1, 7, 30):
+                pipe.pfcount(*_day_keys('users', today - timedelta(days=window - 1), today))
+            dau, wau, mau = pipe.execute()
+        
+        return {
+            'dau': dau,
+            'wau': wau,
+            'mau': mau,
+            'stickiness': round(dau / mau * 100, 2) if mau else 0
+        }
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while counting active users: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to count active users: {e}")
+        raise AnalyticsPlatformError(f"Active user count failed: {e}")
@@ -1,13 +1,44 @@
+import os
 import json
+import time
 import uuid
+import hashlib
 import random
 import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
+from itertools import islice
 from collections import defaultdict
 from redis import ConnectionError, TimeoutError
+from rq import Queue, get_current_job
 
 from .redis_client import analytics_redis, DATA_RETENTION
+from .ingest_buffer import IngestBuffer, IngestBufferFullError
+from .exceptions import (
+    AnalyticsPlatformError,
+    EventNotFoundError,
+    RedisConnectionError,
+    IngestBackpressureError,
+    InvalidQueryError
+)
+from .timeseries import queue_timeseries_writes, rollup_timeseries, query_timeseries, load_watermarks
+from .uniques import queue_unique_writes, queue_unique_totals, approximate_counting_enabled, get_active_users
+from .event_store import (
+    new_event_id,
+    queue_event_payload,
+    update_event_payload,
+    fetch_raw_events,
+    decode_payload,
+    recent_partition_keys,
+    enforce_event_retention
+)
+from .event_compression import train_dictionaries, DICTIONARY_TRAIN_INTERVAL
+from .ingest_stream import append_event, queue_stream_append, get_stream_stats
+from .funnels import update_funnels, invalidate_funnels
+from .retention import queue_activity_writes
+from .property_index import queue_property_index_writes
+from .heavy_hitters import queue_top_value_writes, trim_top_values, top_values_summary
+from .quantile_sketches import queue_sketch_writes, dashboard_quantiles
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -18,17 +49,66 @@ logger = logging.getLogger(__name__)
 
 ANALYTICS_WORKER_URL = 'http://backend-service:5000'
 
-class AnalyticsPlatformError(Exception):
-    """Custom exception for Analytics Platform operations"""
-    pass
+# Materialized dashboard snapshot (bump the version when the dashboard schema changes)
+DASHBOARD_SNAPSHOT_KEY = 'dashboard_snapshot:v1'
+DASHBOARD_REFRESH_LOCK_KEY = f'{DASHBOARD_SNAPSHOT_KEY}:refresh_lock'
+DASHBOARD_SNAPSHOT_MAX_AGE = int(os.getenv('DASHBOARD_SNAPSHOT_MAX_AGE', 15))  # seconds before a background refresh
+DASHBOARD_SNAPSHOT_MAX_STALENESS = int(os.getenv('DASHBOARD_SNAPSHOT_MAX_STALENESS', 300))  # seconds before refreshing inline
 
-class EventNotFoundError(AnalyticsPlatformError):
-    """Exception raised when an event is not found"""
-    pass
+# Interval between periodic aggregation runs (requires `rq worker --with-scheduler`)
+AGGREGATION_INTERVAL = int(os.getenv('AGGREGATION_INTERVAL', 300))  # seconds
+AGGREGATION_JOB_ID = 'periodic-analytics-aggregations'
 
-class RedisConnectionError(AnalyticsPlatformError):
-    """Exception raised when Redis connection fails"""
-    pass
+# Interval between expired data cleanup runs (requires `rq worker --with-scheduler`)
+CLEANUP_INTERVAL = int(os.getenv('CLEANUP_INTERVAL', 3600))  # seconds
+CLEANUP_JOB_ID = 'expired-data-cleanup'
+
+# Compression dictionaries are trained from the most recent event partitions
+DICTIONARY_TRAIN_JOB_ID = 'compression-dictionary-training'
+DICTIONARY_TRAIN_PARTITIONS = int(os.getenv('EVENT_COMPRESSION_TRAIN_PARTITIONS', 24))
+
+# Interval between folds of closed event partitions into registered funnels
+FUNNEL_UPDATE_INTERVAL = int(os.getenv('FUNNEL_UPDATE_INTERVAL', 300))  # seconds
+FUNNEL_UPDATE_JOB_ID = 'funnel-updates'
+
+# Interval between trims of the top-K hour buckets back to their capacity
+TOPK_TRIM_INTERVAL = int(os.getenv('TOPK_TRIM_INTERVAL', 60))  # seconds
+TOPK_TRIM_JOB_ID = 'topk-trim'
+
+# Sample data generation: events per chunk job, events per pipelined write, default back-dated window
+SAMPLE_DATA_CHUNK_SIZE = int(os.getenv('SAMPLE_DATA_CHUNK_SIZE', 50000))
+SAMPLE_DATA_BATCH_SIZE = int(os.getenv('SAMPLE_DATA_BATCH_SIZE', 1000))
+SAMPLE_DATA_WINDOW_DAYS = int(os.getenv('SAMPLE_DATA_WINDOW_DAYS', 7))
+MAX_SAMPLE_EVENTS = int(os.getenv('MAX_SAMPLE_EVENTS', 10000000))
+# Sample events must stay within the event retention; older payloads would expire on write
+MAX_SAMPLE_WINDOW_DAYS = max(DATA_RETENTION['events'] // 86400, 1)
+SAMPLE_CHUNK_JOB_TIMEOUT = 1800  # seconds
+SAMPLE_PROGRESS_KEY_PREFIX = 'sample_generation:'
+SAMPLE_PROGRESS_TTL = 86400
+
+SAMPLE_PAGES = ['/dashboard', '/pricing', '/features', '/about', '/contact', '/login', '/signup']
+SAMPLE_SESSION_EVENT_TYPES = [
+    'page_view', 'button_click', 'form_submit', 'feature_used',
+    'user_registered', 'purchase_completed', 'logout'
+]
+
+# Relative share of sessions starting in each UTC hour, so generated series show a daily cycle
+SAMPLE_HOURLY_WEIGHTS = (
+    0.3, 0.2, 0.15, 0.15, 0.2, 0.3, 0.5, 0.7, 0.9, 1.0, 1.0, 0.95,
+    0.9, 0.95, 1.0, 1.0, 0.95, 0.9, 0.85, 0.8, 0.7, 0.6, 0.5, 0.4
+)
+
+# Ingest mode: 'sync' writes to Redis in the request, 'async' uses the write-behind buffer,
+# 'stream' appends to a Redis Stream that stream workers (app.stream_worker) apply
+INGEST_MODE = os.getenv('INGEST_MODE', 'sync').lower()
+
+# Write-behind buffer settings (used when INGEST_MODE=async)
+INGEST_BUFFER_CONFIG = {
+    'max_size': int(os.getenv('INGEST_BUFFER_MAX_SIZE', 10000)),
+    'batch_size': int(os.getenv('INGEST_BUFFER_BATCH_SIZE', 500)),
+    'flush_interval': float(os.getenv('INGEST_BUFFER_FLUSH_INTERVAL', 0.05)),  # seconds
+    'put_timeout': float(os.getenv('INGEST_BUFFER_PUT_TIMEOUT', 0)),  # seconds to block when full
+}
 
 # ───────────────────────────────────────
 # Event Storage and Retrieval Functions
@@ -37,77 +117,35 @@ class RedisConnectionError(AnalyticsPlatformError):
 def store_event_data(event_type: str, user_id: str, session_id: str, properties: Dict[str, Any]) -> str:
     """
     Store a new analytics event in Redis with a unique event ID and user indexing.
+    All writes for the event are pipelined into a single round trip. In async
+    ingest mode the event is queued on the write-behind buffer instead, and in
+    stream mode it is appended to the ingest stream with a single XADD.
     Returns the generated event ID for the stored event.
     """
     try:
-        # Generate unique event ID
-        event_id = f"evt_{uuid.uuid4().hex[:12]}"
+        event_data = _build_event_record(event_type, user_id, session_id, properties)
+        event_id = event_data['event_id']
         
-        # Create event data structure
-        event_data = {
-            'event_id': event_id,
-            'event_type': event_type,
-            'user_id': user_id,
-            'session_id': session_id,
-            'timestamp': datetime.utcnow().isoformat(),
-            'properties': properties
-        }
+        if INGEST_MODE == 'async':
+            ingest_buffer.put(event_data)
+            logger.debug("Event %s queued for write-behind storage", event_id)
+            return event_id
         
-        # Store the complete event data with TTL
-        analytics_redis.hset(
-            name='analytics_events',
-            key=event_id,
-            value=json.dumps(event_data),
-            ex=DATA_RETENTION['events']
-        )
+        if INGEST_MODE == 'stream':
+            append_event(event_data)
+            logger.debug("Event %s appended to the ingest stream", event_id)
+            return event_id
         
-        # Create user-specific index for fast user queries
-        timestamp = datetime.utcnow().timestamp()
-        analytics_redis.zadd(
-            name=f'user_events:{user_id}',
-            mapping={event_id: timestamp},
-            ex=DATA_RETENTION['user_sessions']
-        )
-        
-        # Create session-specific index
-        analytics_redis.zadd(
-            name=f'session_events:{session_id}',
-            mapping={event_id: timestamp},
-            ex=DATA_RETENTION['user_sessions']
-        )
+        with analytics_redis.pipeline() as pipe:
+            queue_event_writes(pipe, event_data)
+            pipe.execute()
         
-        # Update event type counters for quick analytics
-        analytics_redis.hincrby(
-            name='event_type_metrics',
-            key=event_type,
-            amount=1,
-            ex=DATA_RETENTION['daily_counts']
-        )
-        
-        # Track unique users and sessions with TTL
-        analytics_redis.sadd(
-            'unique_users', 
-            user_id,
-            ex=DATA_RETENTION['user_sessions']
-        )
-        analytics_redis.sadd(
-            'unique_sessions', 
-            session_id,
-            ex=DATA_RETENTION['user_sessions']
-        )
-        
-        # Store daily event counts for trending
-        date_key = datetime.utcnow().strftime('%Y-%m-%d')
-        analytics_redis.hincrby(
-            name='daily_event_counts',
-            key=date_key,
-            amount=1,
-            ex=DATA_RETENTION['daily_counts']
-        )
-        
-        logger.info(f"Event {event_id} stored successfully for user {user_id}")
+        logger.info("Event %s stored successfully for user %s", event_id, user_id)
         return event_id
-        
+    
+    except IngestBufferFullError as e:
+        logger.warning(f"Rejected event for user {user_id}: {e}")
+        raise IngestBackpressureError(str(e))
     except (ConnectionError, TimeoutError) as e:
         logger.error(f"Redis connection failed while storing event: {e}")
         raise RedisConnectionError(f"Failed to connect to Redis: {e}")
@@ -115,26 +153,207 @@ def store_event_data(event_type: str, user_id: str, session_id: str, properties:
         logger.error(f"Failed to store event data: {e}")
         raise AnalyticsPlatformError(f"Event storage failed: {e}")
 
+def store_events_batch(events: List[Dict[str, Any]]) -> List[str]:
+    """
+    Store multiple analytics events through a single pipelined Redis flush
+    (in stream mode, one pipelined XADD per event onto the ingest stream).
+    Each item must provide event_type, user_id, session_id and properties.
+    Returns the generated event IDs in the same order as the input.
+    """
+    try:
+        records = [
+            _build_event_record(event['event_type'], event['user_id'], event['session_id'], event['properties'])
+            for event in events
+        ]
+        
+        if records and INGEST_MODE == 'stream':
+            with analytics_redis.pipeline(transaction=False) as pipe:
+                for event_data in records:
+                    queue_stream_append(pipe, event_data)
+                pipe.execute()
+        elif records:
+            _write_event_batch(records)
+        
+        logger.info("Stored batch of %d events", len(records))
+        return [event_data['event_id'] for event_data in records]
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while storing event batch: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to store event batch: {e}")
+        raise AnalyticsPlatformError(f"Batch event storage failed: {e}")
+
+def _write_event_batch(records: List[Dict[str, Any]]) -> None:
+    """
+    Write a batch of built event records through one pipelined flush.
+    Non-transactional so a large batch does not block Redis inside MULTI/EXEC.
+    Buffered events can reach Redis after their hour was rolled up, so the
+    watermarks are passed to write those into the rolled-up buckets too.
+    """
+    watermarks = load_watermarks()
+    with analytics_redis.pipeline(transaction=False) as pipe:
+        for event_data in records:
+            queue_event_writes(pipe, event_data, watermarks)
+        pipe.execute()
+
+# Write-behind buffer for async ingest mode; the flusher thread starts on first use
+ingest_buffer = IngestBuffer(_write_event_batch, **INGEST_BUFFER_CONFIG)
+
+def get_ingest_stats() -> Dict[str, Any]:
+    """
+    Return the ingest mode together with write-behind buffer counters,
+    or the ingest stream length and pending entries in stream mode.
+    """
+    if INGEST_MODE == 'stream':
+        return {
+            'mode': INGEST_MODE,
+            **get_stream_stats()
+        }
+    return {
+        'mode': INGEST_MODE,
+        **ingest_buffer.stats()
+    }
+
+def drain_ingest_buffer(timeout: float = 10.0) -> int:
+    """
+    Flush all buffered events to Redis. Used during graceful shutdown.
+    Returns the number of events flushed.
+    """
+    if INGEST_MODE != 'async':
+        return 0
+    return ingest_buffer.drain(timeout=timeout)
+
+def _build_event_record(event_type: str, user_id: str, session_id: str, properties: Dict[str, Any],
+                        event_time: Optional[datetime] = None, rng: Optional[random.Random] = None) -> Dict[str, Any]:
+    """
+    Build the stored representation of an event with a freshly generated event ID.
+    The ID encodes the storage partition of the event timestamp, which defaults to now.
+    """
+    event_time = event_time or datetime.utcnow()
+    return {
+        'event_id': new_event_id(event_time, rng),
+        'event_type': event_type,
+        'user_id': user_id,
+        'session_id': session_id,
+        'timestamp': event_time.isoformat(),
+        'properties': properties
+    }
+
+def queue_event_writes(pipe, event_data: Dict[str, Any], watermarks: Optional[Dict[str, int]] = None) -> None:
+    """
+    Queue every Redis write for a single event onto a pipeline: the event payload,
+    user and session indexes, event type counters, unique trackers, daily counts,
+    retention bitmaps, property indexes, top-K scores and quantile sketches.
+    Pass the time-series rollup watermarks when the event may be back-dated.
+    """
+    event_id = event_data['event_id']
+    event_type = event_data['event_type']
+    user_id = event_data['user_id']
+    session_id = event_data['session_id']
+    event_time = datetime.fromisoformat(event_data['timestamp'])
+    
+    # Store the complete event data in its time partition
+    queue_event_payload(pipe, event_data)
+    
+    # Create user-specific index for fast user queries
+    timestamp = event_time.timestamp()
+    pipe.zadd(
+        name=f'user_events:{user_id}',
+        mapping={event_id: timestamp},
+        ex=DATA_RETENTION['user_sessions']
+    )
+    
+    # Create session-specific index
+    pipe.zadd(
+        name=f'session_events:{session_id}',
+        mapping={event_id: timestamp},
+        ex=DATA_RETENTION['user_sessions']
+    )
+    
+    # Update event type counters for quick analytics (all-time totals, no TTL)
+    pipe.hincrby(
+        name='event_type_metrics',
+        key=event_type,
+        amount=1
+    )
+    
+    # Track unique users and sessions (exact sets and/or per-day HyperLogLogs)
+    queue_unique_writes(pipe, user_id, session_id, event_time)
+    
+    # Store daily event counts for trending; the cleanup job drops days past retention
+    date_key = event_time.strftime('%Y-%m-%d')
+    pipe.hincrby(
+        name='daily_event_counts',
+        key=date_key,
+        amount=1
+    )
+    
+    # Per-event-type minute counters for the time-series API
+    queue_timeseries_writes(pipe, event_type, event_time, watermarks)
+    
+    # Dense user ID plus daily activity and cohort bitmaps for retention queries
+    queue_activity_writes(pipe, user_id, event_type, event_time)
+    
+    # Per-day value counters of the indexed properties for breakdowns
+    queue_property_index_writes(pipe, event_type, event_data.get('properties'), event_time)
+    
+    # Hourly top-K scores of the tracked property values
+    queue_top_value_writes(pipe, event_data.get('properties'), event_time)
+    
+    # Daily quantile sketches of the numeric properties
+    queue_sketch_writes(pipe, event_data.get('properties'), event_time)
+
 def retrieve_event_by_id(event_id: str) -> Optional[Dict[str, Any]]:
     """
-    Retrieve a specific event by its ID from Redis.
+    Retrieve a specific event by its ID from Redis with a single HGET on its partition.
     Returns None if event is not found.
     """
     try:
-        event_data = analytics_redis.hget('analytics_events', event_id)
+        event_data = fetch_raw_events([event_id])[0]
         if event_data:
-            return json.loads(event_data.decode('utf-8'))
+            return decode_payload(event_data)
         return None
     except (ConnectionError, TimeoutError) as e:
         logger.error(f"Redis connection failed while retrieving event {event_id}: {e}")
         raise RedisConnectionError(f"Failed to connect to Redis: {e}")
-    except json.JSONDecodeError as e:
+    except ValueError as e:
         logger.error(f"Failed to decode event data for {event_id}: {e}")
         raise AnalyticsPlatformError(f"Event data corruption: {e}")
     except Exception as e:
         logger.error(f"Failed to retrieve event {event_id}: {e}")
         raise AnalyticsPlatformError(f"Event retrieval failed: {e}")
 
+def retrieve_events_by_ids(event_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Retrieve multiple events by ID in a single pipelined round trip.
+    Returns a mapping of event ID to event data (None for events that were not found).
+    """
+    if not event_ids:
+        return {}
+    
+    try:
+        raw_events = fetch_raw_events(event_ids)
+        
+        events: Dict[str, Optional[Dict[str, Any]]] = {}
+        for event_id, event_data in zip(event_ids, raw_events):
+            if not event_data:
+                events[event_id] = None
+                continue
+            try:
+                events[event_id] = decode_payload(event_data)
+            except ValueError as e:
+                logger.error(f"Failed to decode event data for {event_id}: {e}")
+                events[event_id] = None
+        return events
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while retrieving {len(event_ids)} events: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to retrieve events by IDs: {e}")
+        raise AnalyticsPlatformError(f"Bulk event retrieval failed: {e}")
+
 def enrich_event_data(event_id: str, additional_properties: Dict[str, Any]) -> bool:
     """
     Add additional properties to an existing event.
@@ -151,17 +370,12 @@ def enrich_event_data(event_id: str, additional_properties: Dict[str, Any]) -> b
         event_data['properties'].update(additional_properties)
         event_data['last_enriched'] = datetime.utcnow().isoformat()
         
-        # Store updated event with original TTL preserved
-        analytics_redis.hset(
-            name='analytics_events',
-            key=event_id,
-            value=json.dumps(event_data),
-            ex=DATA_RETENTION['events']
-        )
+        # Store updated event in place, keeping its original retention
+        update_event_payload(event_data)
         
-        logger.info(f"Event {event_id} enriched successfully")
+        logger.info("Event %s enriched successfully", event_id)
         return True
-        
+    
     except (ConnectionError, TimeoutError) as e:
         logger.error(f"Redis connection failed while enriching event {event_id}: {e}")
         raise RedisConnectionError(f"Failed to connect to Redis: {e}")
@@ -179,18 +393,24 @@ def generate_analytics_dashboard() -> Dict[str, Any]:
     Returns aggregated metrics, event breakdowns, and insights.
     """
     try:
-        # Get basic counts with error handling for empty metrics
-        event_counts = analytics_redis.hvals('event_type_metrics')
-        total_events = sum(int(count.decode('utf-8')) for count in event_counts) if event_counts else 0
-        unique_users = analytics_redis.scard('unique_users')
-        unique_sessions = analytics_redis.scard('unique_sessions')
+        # Read every input in a single pipelined round trip
+        now = datetime.utcnow()
+        trend_dates = [(now - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)]
+        with analytics_redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall('event_type_metrics')
+            pipe.hmget('daily_event_counts', trend_dates)
+            queue_unique_totals(pipe, window_days=max(DATA_RETENTION['user_sessions'] // 86400, 1))
+            event_metrics, daily_counts, unique_users, unique_sessions = pipe.execute()
+        
+        counts_by_type = {
+            event_type_bytes.decode('utf-8'): int(count_bytes.decode('utf-8'))
+            for event_type_bytes, count_bytes in event_metrics.items()
+        }
+        total_events = sum(counts_by_type.values())
         
         # Get event type breakdown
-        event_metrics = analytics_redis.hgetall('event_type_metrics')
         event_breakdown = []
-        for event_type_bytes, count_bytes in event_metrics.items():
-            event_type = event_type_bytes.decode('utf-8')
-            count = int(count_bytes.decode('utf-8'))
+        for event_type, count in counts_by_type.items():
             percentage = (count / total_events * 100) if total_events > 0 else 0
             event_breakdown.append({
                 'event_type': event_type,
@@ -202,19 +422,18 @@ def generate_analytics_dashboard() -> Dict[str, Any]:
         event_breakdown.sort(key=lambda x: x['count'], reverse=True)
         
         # Get daily trends (last 7 days)
-        daily_trends = []
-        for i in range(7):
-            date = (datetime.utcnow() - timedelta(days=i)).strftime('%Y-%m-%d')
-            count = analytics_redis.hget('daily_event_counts', date)
-            daily_trends.append({
+        daily_trends = [
+            {
                 'date': date,
                 'event_count': int(count.decode('utf-8')) if count else 0
-            })
+            }
+            for date, count in zip(trend_dates, daily_counts)
+        ]
         
         # Calculate conversion metrics (simplified) with error handling
-        page_views = int(analytics_redis.hget('event_type_metrics', 'page_view') or 0)
-        registrations = int(analytics_redis.hget('event_type_metrics', 'user_registered') or 0)
-        purchases = int(analytics_redis.hget('event_type_metrics', 'purchase_completed') or 0)
+        page_views = counts_by_type.get('page_view', 0)
+        registrations = counts_by_type.get('user_registered', 0)
+        purchases = counts_by_type.get('purchase_completed', 0)
         
         conversion_rate = (registrations / page_views * 100) if page_views > 0 else 0
         purchase_rate = (purchases / registrations * 100) if registrations > 0 else 0
@@ -230,12 +449,17 @@ def generate_analytics_dashboard() -> Dict[str, Any]:
             'event_breakdown': event_breakdown,
             'daily_trends': daily_trends,
             'top_event_types': event_breakdown[:5],
+            'top_values': top_values_summary(hours=24, k=5),
+            'numeric_properties': dashboard_quantiles(days=7),
             'generated_at': datetime.utcnow().isoformat()
         }
         
+        if approximate_counting_enabled():
+            dashboard_data['active_users'] = get_active_users()
+        
         logger.info(f"Generated analytics dashboard with {total_events} total events")
         return dashboard_data
-        
+    
     except (ConnectionError, TimeoutError) as e:
         logger.error(f"Redis connection failed while generating dashboard: {e}")
         raise RedisConnectionError(f"Failed to connect to Redis: {e}")
@@ -243,6 +467,87 @@ def generate_analytics_dashboard() -> Dict[str, Any]:
         logger.error(f"Failed to generate analytics dashboard: {e}")
         raise AnalyticsPlatformError(f"Analytics generation failed: {e}")
 
+def refresh_dashboard_snapshot() -> Dict[str, Any]:
+    """
+    Background job to recompute the analytics dashboard and materialize it under
+    the versioned snapshot key. The ETag is a content hash that ignores the
+    generation time, so an unchanged dashboard keeps its ETag across refreshes.
+    Returns the snapshot metadata.
+    """
+    try:
+        dashboard_data = generate_analytics_dashboard()
+        
+        content = {k: v for k, v in dashboard_data.items() if k != 'generated_at'}
+        etag = hashlib.sha1(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+        refreshed_at = time.time()
+        payload = json.dumps(dashboard_data)
+        
+        with analytics_redis.pipeline() as pipe:
+            pipe.hset(DASHBOARD_SNAPSHOT_KEY, 'etag', etag)
+            pipe.hset(DASHBOARD_SNAPSHOT_KEY, 'refreshed_at', refreshed_at)
+            pipe.hset(
+                name=DASHBOARD_SNAPSHOT_KEY,
+                key='payload',
+                value=payload,
+                ex=DATA_RETENTION['analytics_cache']
+            )
+            pipe.execute()
+        
+        logger.info(f"Refreshed dashboard snapshot {DASHBOARD_SNAPSHOT_KEY} (etag {etag[:12]})")
+        return {'etag': etag, 'refreshed_at': refreshed_at, 'payload': payload}
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while refreshing dashboard snapshot: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except AnalyticsPlatformError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to refresh dashboard snapshot: {e}")
+        raise AnalyticsPlatformError(f"Dashboard snapshot refresh failed: {e}")
+
+def load_dashboard_snapshot(include_payload: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Read the materialized dashboard snapshot in one round trip.
+    With include_payload=False only the ETag and refresh time are fetched, which
+    is enough to answer a conditional request. Returns None if no snapshot exists.
+    """
+    try:
+        fields = ['etag', 'refreshed_at', 'payload'] if include_payload else ['etag', 'refreshed_at']
+        values = analytics_redis.hmget(DASHBOARD_SNAPSHOT_KEY, fields)
+        if not values[0]:
+            return None
+        
+        return {
+            'etag': values[0].decode('utf-8'),
+            'refreshed_at': float(values[1]) if values[1] else 0.0,
+            'payload': values[2].decode('utf-8') if include_payload and values[2] else None
+        }
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while loading dashboard snapshot: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Failed to load dashboard snapshot: {e}")
+        raise AnalyticsPlatformError(f"Dashboard snapshot load failed: {e}")
+
+def schedule_dashboard_refresh(queue) -> bool:
+    """
+    Enqueue a snapshot refresh job unless one was requested recently.
+    Returns True if a job was enqueued.
+    """
+    try:
+        acquired = analytics_redis.set(DASHBOARD_REFRESH_LOCK_KEY, 1, ex=max(DASHBOARD_SNAPSHOT_MAX_AGE, 1), nx=True)
+        if not acquired:
+            return False
+        
+        queue.enqueue(refresh_dashboard_snapshot, job_timeout='2m')
+        logger.debug("Enqueued dashboard snapshot refresh")
+        return True
+    
+    except Exception as e:
+        logger.error(f"Failed to schedule dashboard snapshot refresh: {e}")
+        return False
+
 def get_user_analytics(user_id: str, limit: int = 100) -> Dict[str, Any]:
     """
     Get analytics data specific to a particular user using indexed lookups.
@@ -253,7 +558,7 @@ def get_user_analytics(user_id: str, limit: int = 100) -> Dict[str, Any]:
         user_event_ids = analytics_redis.zrevrange(f'user_events:{user_id}', 0, limit - 1)
         
         if not user_event_ids:
-            logger.info(f"No events found for user {user_id}")
+            logger.info("No events found for user %s", user_id)
             return {
                 'user_id': user_id,
                 'total_events': 0,
@@ -263,13 +568,9 @@ def get_user_analytics(user_id: str, limit: int = 100) -> Dict[str, Any]:
                 'last_seen': None
             }
         
-        # Retrieve event details for the user's events
-        user_events = []
-        for event_id_bytes in user_event_ids:
-            event_id = event_id_bytes.decode('utf-8')
-            event_data = retrieve_event_by_id(event_id)
-            if event_data:
-                user_events.append(event_data)
+        # Retrieve event details for the user's events in one round trip
+        event_ids = [event_id_bytes.decode('utf-8') for event_id_bytes in user_event_ids]
+        user_events = [event for event in retrieve_events_by_ids(event_ids).values() if event]
         
         # Sort by timestamp (most recent first)
         user_events.sort(key=lambda x: x['timestamp'], reverse=True)
@@ -288,9 +589,9 @@ def get_user_analytics(user_id: str, limit: int = 100) -> Dict[str, Any]:
             'last_seen': user_events[0]['timestamp'] if user_events else None
         }
         
-        logger.info(f"Retrieved analytics for user {user_id}: {len(user_events)} events")
+        logger.info("Retrieved analytics for user %s: %d events", user_id, len(user_events))
         return result
-        
+    
     except (ConnectionError, TimeoutError) as e:
         logger.error(f"Redis connection failed while getting user analytics for {user_id}: {e}")
         raise RedisConnectionError(f"Failed to connect to Redis: {e}")
@@ -302,105 +603,226 @@ def get_user_analytics(user_id: str, limit: int = 100) -> Dict[str, Any]:
 # Background Processing Functions
 # ───────────────────────────────────────
 
-def generate_sample_analytics_events(num_events: int) -> None:
+def generate_sample_analytics_events(num_events: int, window_days: int = SAMPLE_DATA_WINDOW_DAYS,
+                                     seed: Optional[int] = None) -> Dict[str, Any]:
     """
     Background job function to generate sample analytics events for testing.
-    This simulates real user behavior with realistic event patterns.
+    This simulates real user behavior with realistic event patterns: sessions of
+    several events per user, back-dated across the last window_days with a daily cycle.
+    Requests larger than SAMPLE_DATA_CHUNK_SIZE are split into chunk jobs that RQ
+    workers run in parallel. Each chunk is seeded from (seed, chunk index), so a
+    seed always reproduces the same events. Returns the generation plan.
     """
     try:
-        event_types = [
-            'page_view', 'button_click', 'form_submit', 'feature_used',
-            'user_registered', 'purchase_completed', 'session_start', 'logout'
-        ]
-        
-        pages = ['/dashboard', '/pricing', '/features', '/about', '/contact', '/login', '/signup']
-        user_pool = [f"user_{i:05d}" for i in range(1, 501)]  # 500 sample users
-        
-        events_generated = 0
-        for _ in range(num_events):
-            try:
-                # Generate realistic event data
-                event_type = random.choice(event_types)
-                user_id = random.choice(user_pool)
-                session_id = f"sess_{uuid.uuid4().hex[:8]}"
-                
-                # Create event-specific properties
-                properties = _generate_event_properties(event_type, pages)
-                
-                # Store the event
-                store_event_data(event_type, user_id, session_id, properties)
-                events_generated += 1
-                
-                # Log progress every 100 events
-                if events_generated % 100 == 0:
-                    logger.info(f"Generated {events_generated}/{num_events} sample events")
-                    
-            except Exception as e:
-                logger.error(f"Failed to generate sample event {events_generated + 1}: {e}")
-                continue
+        job = get_current_job()
+        generation_id = job.id if job else uuid.uuid4().hex
+        seed = seed if seed is not None else random.getrandbits(32)
+        window_end = int(time.time())
+        chunk_count = -(-num_events // SAMPLE_DATA_CHUNK_SIZE)
+        plan = {
+            'total': num_events,
+            'chunks': chunk_count,
+            'seed': seed,
+            'window_start': window_end - window_days * 86400,
+            'window_end': window_end,
+            'users': max(500, num_events // 20)
+        }
         
-        logger.info(f"Successfully generated {events_generated} sample events")
+        progress_key = f'{SAMPLE_PROGRESS_KEY_PREFIX}{generation_id}'
+        with analytics_redis.pipeline(transaction=False) as pipe:
+            for field, value in plan.items():
+                pipe.hset(progress_key, field, value)
+            pipe.expire(progress_key, SAMPLE_PROGRESS_TTL)
+            pipe.execute()
+        
+        if job:
+            job.meta.update(plan)
+            job.save_meta()
+        
+        chunk_args = [
+            (generation_id, index, min(SAMPLE_DATA_CHUNK_SIZE, num_events - index * SAMPLE_DATA_CHUNK_SIZE),
+             seed, plan['window_start'], window_end, plan['users'])
+            for index in range(chunk_count)
+        ]
         
+        # Small requests (or direct calls outside a worker) are generated in this job
+        if job is None or chunk_count == 1:
+            for args in chunk_args:
+                generate_sample_chunk(*args)
+            return plan
+        
+        queue = Queue(job.origin, connection=job.connection)
+        queue.enqueue_many([
+            Queue.prepare_data(
+                generate_sample_chunk,
+                args=args,
+                job_id=f'{generation_id}-chunk-{args[1]}',
+                timeout=SAMPLE_CHUNK_JOB_TIMEOUT
+            )
+            for args in chunk_args
+        ])
+        
+        logger.info(f"Sample generation {generation_id}: {num_events} events split into {chunk_count} chunk jobs")
+        return plan
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while starting sample generation: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except AnalyticsPlatformError:
+        raise
     except Exception as e:
         logger.error(f"Failed to generate sample events: {e}")
         raise AnalyticsPlatformError(f"Sample event generation failed: {e}")
 
-def _generate_event_properties(event_type: str, pages: List[str]) -> Dict[str, Any]:
+def generate_sample_chunk(generation_id: str, chunk_index: int, count: int, seed: int,
+                          window_start: int, window_end: int, num_users: int) -> int:
+    """
+    Background job generating one chunk of a sample data request. Events are
+    written through pipelines of SAMPLE_DATA_BATCH_SIZE, each also advancing the
+    shared progress hash; the chunk's own count is kept in its job meta.
+    Returns the number of events generated.
+    """
+    job = get_current_job()
+    progress_key = f'{SAMPLE_PROGRESS_KEY_PREFIX}{generation_id}'
+    rng = random.Random(f'{seed}:{chunk_index}')
+    events = _sample_event_stream(rng, window_start, window_end, num_users)
+    generated = 0
+    
+    try:
+        while generated < count:
+            batch = list(islice(events, min(SAMPLE_DATA_BATCH_SIZE, count - generated)))
+            
+            # Back-dated events write hour/day buckets directly once rollups have passed them
+            watermarks = load_watermarks()
+            with analytics_redis.pipeline(transaction=False) as pipe:
+                for event_data in batch:
+                    queue_event_writes(pipe, event_data, watermarks)
+                pipe.hincrby(progress_key, 'generated', len(batch))
+                pipe.execute()
+            generated += len(batch)
+            
+            if job:
+                job.meta['generated'] = generated
+                job.save_meta()
+        
+        chunks_done = analytics_redis.hincrby(progress_key, 'chunks_done', 1)
+        logger.info(f"Sample generation {generation_id}: chunk {chunk_index} wrote {generated} events")
+        
+        # Back-dated events land in partitions funnels may already have folded
+        if chunks_done == int(analytics_redis.hget(progress_key, 'chunks') or 0):
+            invalidate_funnels()
+        return generated
+    
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed in sample chunk {chunk_index} after {generated} events: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    except Exception as e:
+        logger.error(f"Sample chunk {chunk_index} failed after {generated} events: {e}")
+        analytics_redis.hincrby(progress_key, 'chunks_failed', 1)
+        raise AnalyticsPlatformError(f"Sample event generation failed: {e}")
+
+def get_sample_generation_progress(generation_id: str) -> Optional[Dict[str, int]]:
+    """
+    Return the plan and progress counters of a sample data request
+    (total, chunks, generated, chunks_done, chunks_failed), or None if unknown.
+    """
+    try:
+        raw = analytics_redis.hgetall(f'{SAMPLE_PROGRESS_KEY_PREFIX}{generation_id}')
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed while reading sample generation progress: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    if not raw:
+        return None
+    
+    progress = {'generated': 0, 'chunks_done': 0, 'chunks_failed': 0}
+    progress.update({field.decode('utf-8'): int(value) for field, value in raw.items()})
+    return progress
+
+def _sample_event_stream(rng: random.Random, window_start: int, window_end: int, num_users: int):
+    """
+    Endless stream of sample event records, one session at a time: a user's
+    session_start followed by up to nine more events a few seconds to minutes apart.
+    Session starts follow SAMPLE_HOURLY_WEIGHTS; no event is later than window_end.
+    """
+    max_weight = max(SAMPLE_HOURLY_WEIGHTS)
+    while True:
+        # Uniform over the window, thinned by the hour-of-day weight
+        started = rng.uniform(window_start, window_end)
+        while rng.random() * max_weight > SAMPLE_HOURLY_WEIGHTS[int(started // 3600) % 24]:
+            started = rng.uniform(window_start, window_end)
+        
+        user_id = f"user_{rng.randint(1, num_users):05d}"
+        session_id = f"sess_{rng.getrandbits(32):08x}"
+        event_epoch = started
+        for position in range(rng.randint(1, 10)):
+            event_type = 'session_start' if position == 0 else rng.choice(SAMPLE_SESSION_EVENT_TYPES)
+            event_time = datetime.utcfromtimestamp(min(event_epoch, window_end))
+            properties = _generate_event_properties(event_type, SAMPLE_PAGES, rng, event_time)
+            yield _build_event_record(event_type, user_id, session_id, properties, event_time, rng)
+            event_epoch += rng.uniform(5, 180)
+
+def _generate_event_properties(event_type: str, pages: List[str], rng: random.Random = random,
+                               event_time: Optional[datetime] = None) -> Dict[str, Any]:
     """
     Generate realistic properties for different event types.
     """
     base_properties = {
-        'timestamp': datetime.utcnow().isoformat(),
-        'user_agent': random.choice([
+        'timestamp': (event_time or datetime.utcnow()).isoformat(),
+        'user_agent': rng.choice([
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)',
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64)',
             'Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X)'
         ]),
-        'device_type': random.choice(['desktop', 'mobile', 'tablet']),
-        'browser': random.choice(['Chrome', 'Safari', 'Firefox', 'Edge']),
-        'country': random.choice(['US', 'UK', 'CA', 'DE', 'FR', 'JP', 'AU']),
+        'device_type': rng.choice(['desktop', 'mobile', 'tablet']),
+        'browser': rng.choice(['Chrome', 'Safari', 'Firefox', 'Edge']),
+        'country': rng.choice(['US', 'UK', 'CA', 'DE', 'FR', 'JP', 'AU']),
     }
     
     if event_type == 'page_view':
         base_properties.update({
-            'page_url': random.choice(pages),
-            'referrer': random.choice(['google.com', 'facebook.com', 'direct', 'twitter.com']),
-            'load_time': round(random.uniform(0.5, 3.0), 2)
+            'page_url': rng.choice(pages),
+            'referrer': rng.choice(['google.com', 'facebook.com', 'direct', 'twitter.com']),
+            'load_time': round(rng.uniform(0.5, 3.0), 2)
         })
     elif event_type == 'button_click':
         base_properties.update({
-            'button_text': random.choice(['Sign Up', 'Learn More', 'Get Started', 'Contact Us']),
-            'page_url': random.choice(pages),
-            'element_position': random.choice(['header', 'sidebar', 'footer', 'main'])
+            'button_text': rng.choice(['Sign Up', 'Learn More', 'Get Started', 'Contact Us']),
+            'page_url': rng.choice(pages),
+            'element_position': rng.choice(['header', 'sidebar', 'footer', 'main'])
         })
     elif event_type == 'purchase_completed':
         base_properties.update({
-            'revenue': round(random.uniform(10.0, 500.0), 2),
+            'revenue': round(rng.uniform(10.0, 500.0), 2),
             'currency': 'USD',
-            'product_name': random.choice(['Basic Plan', 'Pro Plan', 'Enterprise Plan']),
-            'payment_method': random.choice(['credit_card', 'paypal', 'stripe'])
+            'product_name': rng.choice(['Basic Plan', 'Pro Plan', 'Enterprise Plan']),
+            'payment_method': rng.choice(['credit_card', 'paypal', 'stripe'])
         })
     elif event_type == 'user_registered':
         base_properties.update({
-            'signup_method': random.choice(['email', 'google', 'facebook']),
-            'plan_selected': random.choice(['free', 'basic', 'pro']),
-            'referral_source': random.choice(['organic', 'paid_ads', 'referral', 'social'])
+            'signup_method': rng.choice(['email', 'google', 'facebook']),
+            'plan_selected': rng.choice(['free', 'basic', 'pro']),
+            'referral_source': rng.choice(['organic', 'paid_ads', 'referral', 'social'])
         })
     
     return base_properties
 
-def process_analytics_aggregations() -> None:
+def process_analytics_aggregations(reschedule: bool = False) -> None:
     """
     Background job to process and update analytics aggregations.
-    This runs periodically to compute complex metrics and insights.
+    This runs periodically to compute complex metrics and insights: it rolls the
+    minute time series up into hours and days, records the last complete hour in
+    hourly_aggregations and refreshes the dashboard snapshot.
+    With reschedule=True the job enqueues its own next run.
     """
     try:
-        current_hour = datetime.utcnow().strftime('%Y-%m-%d-%H')
+        # Roll minute counters up into hour and day buckets
+        rollup_timeseries()
         
-        # Get hourly event count from daily counts (simplified approach)
-        current_date = datetime.utcnow().strftime('%Y-%m-%d')
-        daily_count = analytics_redis.hget('daily_event_counts', current_date)
-        hourly_count = int(daily_count.decode('utf-8')) if daily_count else 0
+        # Record the event count of the last complete hour
+        hour_start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        current_hour = hour_start.strftime('%Y-%m-%d-%H')
+        hourly_series = query_timeseries(None, hour_start, hour_start + timedelta(hours=1), 'hour')
+        hourly_count = hourly_series['total']
         
         # Store hourly aggregation with TTL
         analytics_redis.hset(
@@ -412,31 +834,134 @@ def process_analytics_aggregations() -> None:
         
         logger.info(f"Processed analytics aggregations for hour {current_hour}: {hourly_count} events")
         
+        # Re-materialize the dashboard snapshot from the updated aggregates
+        refresh_dashboard_snapshot()
+    
     except (ConnectionError, TimeoutError) as e:
         logger.error(f"Redis connection failed during aggregation: {e}")
         raise RedisConnectionError(f"Failed to connect to Redis: {e}")
     except Exception as e:
         logger.error(f"Failed to process analytics aggregations: {e}")
         raise AnalyticsPlatformError(f"Analytics aggregation failed: {e}")
+    finally:
+        if reschedule:
+            _reschedule_current_job(schedule_periodic_aggregations)
 
-def cleanup_expired_data() -> Dict[str, int]:
+def _schedule_next_run(queue, func, interval: int, job_id: str, job_timeout: str) -> None:
+    """
+    Schedule the next run of a self-rescheduling job at the next interval boundary.
+    The job ID is derived from that boundary, so scheduling the same run from
+    several processes is idempotent.
+    """
+    try:
+        now = time.time()
+        next_run = int(now - now % interval) + interval
+        queue.enqueue_at(
+            datetime.utcfromtimestamp(next_run),
+            func,
+            reschedule=True,
+            job_id=f'{job_id}-{next_run}',
+            job_timeout=job_timeout
+        )
+        logger.debug(f"Scheduled {job_id} in {next_run - int(now)}s")
+    except Exception as e:
+        logger.error(f"Failed to schedule {job_id}: {e}")
+
+def _reschedule_current_job(schedule) -> None:
+    """Call a scheduling function for the queue the current RQ job came from"""
+    job = get_current_job()
+    if job is not None:
+        schedule(Queue(job.origin, connection=job.connection))
+
+def schedule_periodic_aggregations(queue) -> None:
+    """Schedule the next periodic aggregation run"""
+    _schedule_next_run(queue, process_analytics_aggregations, AGGREGATION_INTERVAL, AGGREGATION_JOB_ID, '10m')
+
+def cleanup_expired_data(reschedule: bool = False) -> Dict[str, int]:
     """
     Background job to clean up expired data and maintain Redis performance.
-    Returns statistics about cleanup operations.
+    Drops event partitions older than the event retention, prunes expired
+    events from the legacy events hash and drops daily event counts older than
+    the daily counts retention; other keys expire through their TTLs.
+    With reschedule=True the job enqueues its own next run.
+    Returns statistics about cleanup operations, including the bytes freed.
     """
     try:
-        cleanup_stats = {
-            'expired_user_indexes': 0,
-            'expired_session_indexes': 0,
-            'total_operations': 0
-        }
-        
-        # Note: Redis automatically handles TTL expiration, but we can add
-        # manual cleanup for specific patterns if needed
+        start = time.perf_counter()
+        cleanup_stats = enforce_event_retention()
+        cleanup_stats['daily_counts_pruned'] = prune_daily_event_counts()
+        cleanup_stats['bytes_freed_total'] = cleanup_stats['bytes_freed'] + cleanup_stats['legacy_bytes_freed']
+        cleanup_stats['duration_ms'] = round((time.perf_counter() - start) * 1000, 3)
         
         logger.info(f"Cleanup completed: {cleanup_stats}")
         return cleanup_stats
-        
+    
+    except (RedisConnectionError, AnalyticsPlatformError):
+        raise
     except Exception as e:
         logger.error(f"Failed to cleanup expired data: {e}")
-        raise AnalyticsPlatformError(f"Data cleanup failed: {e}")  
\ No newline at end of file
+        raise AnalyticsPlatformError(f"Data cleanup failed: {e}")
+    finally:
+        if reschedule:
+            _reschedule_current_job(schedule_periodic_cleanup)
+
+def prune_daily_event_counts() -> int:
+    """Drop the days of daily_event_counts older than the daily counts retention; returns the number dropped"""
+    cutoff = (datetime.utcnow() - timedelta(seconds=DATA_RETENTION['daily_counts'])).strftime('%Y-%m-%d')
+    expired = [day for day in analytics_redis.hkeys('daily_event_counts') if day.decode('utf-8') < cutoff]
+    if expired:
+        analytics_redis.hdel('daily_event_counts', *expired)
+    return len(expired)
+
+def schedule_periodic_cleanup(queue) -> None:
+    """Schedule the next expired data cleanup run"""
+    _schedule_next_run(queue, cleanup_expired_data, CLEANUP_INTERVAL, CLEANUP_JOB_ID, '30m')
+
+def train_compression_dictionaries(reschedule: bool = False) -> Dict[str, Any]:
+    """
+    Background job to retrain the per-event_type compression dictionaries from
+    the most recent event partitions.
+    With reschedule=True the job enqueues its own next run.
+    """
+    try:
+        return train_dictionaries(recent_partition_keys(DICTIONARY_TRAIN_PARTITIONS))
+    except (ConnectionError, TimeoutError) as e:
+        logger.error(f"Redis connection failed during dictionary training: {e}")
+        raise RedisConnectionError(f"Failed to connect to Redis: {e}")
+    finally:
+        if reschedule:
+            _reschedule_current_job(schedule_dictionary_training)
+
+def schedule_dictionary_training(queue) -> None:
+    """Schedule the next compression dictionary training run"""
+    _schedule_next_run(queue, train_compression_dictionaries, DICTIONARY_TRAIN_INTERVAL, DICTIONARY_TRAIN_JOB_ID, '30m')
+
+def process_funnel_updates(reschedule: bool = False) -> Dict[str, Any]:
+    """
+    Background job folding closed event partitions into the incremental state of
+    every registered funnel. With reschedule=True the job enqueues its own next run.
+    """
+    try:
+        return update_funnels()
+    finally:
+        if reschedule:
+            _reschedule_current_job(schedule_funnel_updates)
+
+def schedule_funnel_updates(queue) -> None:
+    """Schedule the next funnel update run"""
+    _schedule_next_run(queue, process_funnel_updates, FUNNEL_UPDATE_INTERVAL, FUNNEL_UPDATE_JOB_ID, '15m')
+
+def process_topk_trim(reschedule: bool = False) -> Dict[str, int]:
+    """
+    Background job trimming the top-K hour buckets back to TOPK_BUCKET_CAPACITY
+    values. With reschedule=True the job enqueues its own next run.
+    """
+    try:
+        return trim_top_values()
+    finally:
+        if reschedule:
+            _reschedule_current_job(schedule_topk_trim)
+
+def schedule_topk_trim(queue) -> None:
+    """Schedule the next top-K trim run"""
+    _schedule_next_run(queue, process_topk_trim, TOPK_TRIM_INTERVAL, TOPK_TRIM_JOB_ID, '5m')
@@ -0,0 +1,98 @@
+"""
+Microbenchmark the core analytics functions at increasing data sizes.
+
+For each size the database is flushed and filled with that many seeded sample
+events (back-dated over a day), then store_event_data, retrieve_event_by_id,
+get_user_analytics and generate_analytics_dashboard are timed call by call.
+Latency percentiles and throughput are reported per function and size.
+
+Usage (from the repository root):
+    python -m benchmarks.api_functions --fake
+    python -m benchmarks.api_functions --flush --sizes 1000,100000 --output results.json   # wipes REDIS_DB
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+os.environ.setdefault('LOG_DIR', os.path.join(tempfile.gettempdir(), 'analytics-bench-logs'))
+
+from benchmarks.common import add_redis_arguments, use_fake_redis, latency_summary, run_metadata, write_results
+
+def time_calls(func, arguments):
+    """Call func once per argument tuple; returns per-call latencies and total seconds"""
+    latencies = []
+    started = time.perf_counter()
+    for args in arguments:
+        call_started = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - call_started)
+    return latencies, time.perf_counter() - started
+
+def populate(size: int, seed: int):
+    """Flush the database and write size seeded sample events; returns (user IDs, event IDs)"""
+    from app.redis_client import analytics_redis
+    from app.utils import generate_sample_analytics_events
+
+    analytics_redis.flushdb()
+    plan = generate_sample_analytics_events(size, window_days=1, seed=seed)
+
+    rng = random.Random(seed)
+    user_ids = [f"user_{rng.randint(1, plan['users']):05d}" for _ in range(50)]
+    event_ids = []
+    for user_id in user_ids:
+        event_ids.extend(member.decode('utf-8') for member in analytics_redis.zrevrange(f'user_events:{user_id}', 0, 9))
+    return user_ids, event_ids
+
+def benchmark_size(size: int, iterations: int, seed: int) -> dict:
+    """Time every function against a database holding size events"""
+    from app.utils import store_event_data, retrieve_event_by_id, get_user_analytics, generate_analytics_dashboard
+
+    started = time.perf_counter()
+    user_ids, event_ids = populate(size, seed)
+    load_seconds = time.perf_counter() - started
+
+    rng = random.Random(seed)
+    cases = {
+        'store_event_data': (store_event_data, [
+            ('page_view', rng.choice(user_ids), f'sess_bench_{i % 100}', {'page_url': '/pricing', 'load_time': 1.2})
+            for i in range(iterations)
+        ]),
+        'retrieve_event_by_id': (retrieve_event_by_id, [(rng.choice(event_ids),) for _ in range(iterations)]),
+        'get_user_analytics': (get_user_analytics, [(rng.choice(user_ids),) for _ in range(iterations)]),
+        'generate_analytics_dashboard': (generate_analytics_dashboard, [() for _ in range(iterations)]),
+    }
+
+    results = {'load_seconds': round(load_seconds, 3), 'load_events_per_sec': round(size / load_seconds)}
+    for name, (func, arguments) in cases.items():
+        latencies, total = time_calls(func, arguments)
+        results[name] = {**latency_summary(latencies), 'ops_per_sec': round(len(latencies) / total, 1)}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_redis_arguments(parser)
+    parser.add_argument('--sizes', default='1000,10000,50000', help='comma-separated stored event counts')
+    parser.add_argument('--iterations', type=int, default=200, help='timed calls per function and size')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for the sample data')
+    parser.add_argument('--flush', action='store_true', help='allow FLUSHDB on a real Redis before each size')
+    args = parser.parse_args()
+
+    if os.getenv('INGEST_MODE', 'sync').lower() != 'sync':
+        parser.error('run with INGEST_MODE=sync so store_event_data writes to Redis in the call')
+    if args.fake:
+        use_fake_redis(parser)
+    elif not args.flush:
+        parser.error('each size starts from an empty database; pass --flush to allow FLUSHDB on REDIS_HOST')
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = {
+        **run_metadata('api_functions', args.fake),
+        'iterations': args.iterations,
+        'sizes': {str(size): benchmark_size(size, args.iterations, args.seed) for size in sizes}
+    }
+    write_results(results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Count Redis commands and network round trips per ingested event.
+
+Compares the original write sequence (seven wrapper calls, each followed by an
+EXPIRE) with the current pipelined store_event_data, both for the first events
+written by a process (TTLs still being armed) and for steady-state ingestion.
+
+Usage (from the repository root):
+    python -m benchmarks.commands_per_event            # against REDIS_HOST/REDIS_PORT
+    python -m benchmarks.commands_per_event --fake     # in-process fakeredis
+"""
+import os
+import json
+import uuid
+import argparse
+import tempfile
+from datetime import datetime
+
+os.environ.setdefault('LOG_DIR', os.path.join(tempfile.gettempdir(), 'analytics-bench-logs'))
+
+from redis import Redis
+from redis.client import Pipeline
+from redis.connection import AbstractConnection
+
+class CommandCounter:
+    """Counts Redis commands issued (direct and pipelined) and packets sent to the server"""
+
+    def __init__(self):
+        self.commands = 0
+        self.round_trips = 0
+        self._execute_command = Redis.execute_command
+        self._pipeline_execute = Pipeline.execute
+        self._send_packed_command = AbstractConnection.send_packed_command
+
+    def install(self):
+        counter = self
+
+        def execute_command(client, *args, **options):
+            counter.commands += 1
+            return counter._execute_command(client, *args, **options)
+
+        def pipeline_execute(pipe, raise_on_error=True):
+            counter.commands += len(pipe.command_stack)
+            return counter._pipeline_execute(pipe, raise_on_error)
+
+        def send_packed_command(conn, command, check_health=True):
+            counter.round_trips += 1
+            return counter._send_packed_command(conn, command, check_health)
+
+        Redis.execute_command = execute_command
+        Pipeline.execute = pipeline_execute
+        AbstractConnection.send_packed_command = send_packed_command
+
+    def reset(self):
+        self.commands = 0
+        self.round_trips = 0
+
+def legacy_store_event(client, ttl, event_type, user_id, session_id, properties):
+    """The original store_event_data write sequence, one wrapper call (plus EXPIRE) at a time"""
+    event_id = f"evt_{uuid.uuid4().hex[:12]}"
+    event_data = {
+        'event_id': event_id,
+        'event_type': event_type,
+        'user_id': user_id,
+        'session_id': session_id,
+        'timestamp': datetime.utcnow().isoformat(),
+        'properties': properties
+    }
+    timestamp = datetime.utcnow().timestamp()
+    writes = [
+        ('hset', ('analytics_events', event_id, json.dumps(event_data)), ttl['events']),
+        ('zadd', (f'user_events:{user_id}', {event_id: timestamp}), ttl['user_sessions']),
+        ('zadd', (f'session_events:{session_id}', {event_id: timestamp}), ttl['user_sessions']),
+        ('hincrby', ('event_type_metrics', event_type, 1), ttl['daily_counts']),
+        ('sadd', ('unique_users', user_id), ttl['user_sessions']),
+        ('sadd', ('unique_sessions', session_id), ttl['user_sessions']),
+        ('hincrby', ('daily_event_counts', datetime.utcnow().strftime('%Y-%m-%d'), 1), ttl['daily_counts']),
+    ]
+    for command, args, ex in writes:
+        getattr(client, command)(*args)
+        client.expire(args[0], ex)
+    return event_id
+
+def measure(counter, store, events):
+    """Return (commands, round trips) per event for a list of events"""
+    counter.reset()
+    for event in events:
+        store(*event)
+    return counter.commands / len(events), counter.round_trips / len(events)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fake', action='store_true', help='use an in-process fakeredis server')
+    parser.add_argument('--events', type=int, default=200, help='events per measurement')
+    args = parser.parse_args()
+
+    from app.redis_client import analytics_redis, DATA_RETENTION
+    if args.fake:
+        try:
+            import fakeredis
+        except ImportError:
+            parser.error('--fake requires fakeredis (pip install "fakeredis[lua]")')
+        analytics_redis._redis = fakeredis.FakeRedis()
+        analytics_redis._is_healthy = True
+    from app.utils import store_event_data
+
+    counter = CommandCounter()
+    counter.install()
+
+    def sample_events(prefix):
+        return [
+            ('page_view', f'{prefix}_user_{i % 20}', f'{prefix}_sess_{i % 50}', {'page_url': '/pricing'})
+            for i in range(args.events)
+        ]
+
+    raw = analytics_redis._redis
+    legacy_first = measure(counter, lambda *e: legacy_store_event(raw, DATA_RETENTION, *e), sample_events('legacy'))
+    current_first = measure(counter, store_event_data, sample_events('cold'))
+    current_steady = measure(counter, store_event_data, sample_events('cold'))
+
+    results = {
+        'legacy': {'commands_per_event': legacy_first[0], 'round_trips_per_event': legacy_first[1]},
+        'pipelined_first_writes': {'commands_per_event': current_first[0], 'round_trips_per_event': current_first[1]},
+        'pipelined_steady_state': {'commands_per_event': current_steady[0], 'round_trips_per_event': current_steady[1]},
+    }
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
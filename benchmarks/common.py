@@ -0,0 +1,82 @@
+"""
+Helpers shared by the benchmark scripts: Redis selection, latency summaries
+and the JSON result format used to compare runs between commits.
+"""
+import os
+import sys
+import json
+import platform
+import subprocess
+from datetime import datetime
+
+def add_redis_arguments(parser):
+    """Add the --fake flag selecting an in-process fakeredis server instead of REDIS_HOST/REDIS_PORT"""
+    parser.add_argument('--fake', action='store_true', help='use an in-process fakeredis server')
+    parser.add_argument('--output', help='write the JSON results to this file as well as stdout')
+
+def use_fake_redis(parser):
+    """
+    Point the shared client (and the RQ queue, if the app package is loaded)
+    at a fresh in-process fakeredis server. Returns the fake connection.
+    """
+    try:
+        import fakeredis
+    except ImportError:
+        parser.error('--fake requires fakeredis (pip install "fakeredis[lua]")')
+
+    from app.redis_client import analytics_redis
+    fake = fakeredis.FakeRedis()
+    analytics_redis._redis = fake
+    analytics_redis._is_healthy = True
+    analytics_redis._last_health_check = float('inf')
+
+    app_package = sys.modules.get('app')
+    if app_package is not None and hasattr(app_package, 'analytics_queue'):
+        app_package.analytics_queue.connection = fake
+    return fake
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def latency_summary(samples) -> dict:
+    """Summarize latencies given in seconds as milliseconds"""
+    values = sorted(samples)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3),
+        'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3),
+    }
+
+def run_metadata(benchmark: str, fake: bool) -> dict:
+    """Identify a run: benchmark name, commit, interpreter and Redis target"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'benchmark': benchmark,
+        'commit': commit,
+        'started_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'redis': 'fakeredis' if fake else f"{os.getenv('REDIS_HOST', 'localhost')}:{os.getenv('REDIS_PORT', 6379)}",
+    }
+
+def write_results(results: dict, output=None):
+    """Print the results as JSON and optionally save them"""
+    text = json.dumps(results, indent=2)
+    print(text)
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            f.write(text + '\n')
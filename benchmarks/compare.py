@@ -0,0 +1,56 @@
+"""
+Compare two benchmark result files (e.g. from two commits) metric by metric.
+
+Every numeric latency (*_ms, *_us_per_event) and throughput (*_per_sec, *_rps)
+value present in both files is listed with its relative change; changes worse
+than --threshold are flagged and make the exit status non-zero.
+
+Usage (from the repository root):
+    python -m benchmarks.compare old/api_functions.json new/api_functions.json
+"""
+import sys
+import json
+import argparse
+
+LOWER_IS_BETTER = ('_ms', '_us_per_event')
+HIGHER_IS_BETTER = ('_per_sec', '_rps')
+
+def flatten(results, prefix=''):
+    """Map dotted paths to the comparable numeric metrics of a results document"""
+    metrics = {}
+    for key, value in results.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f'{path}.'))
+        elif isinstance(value, (int, float)) and key.endswith(LOWER_IS_BETTER + HIGHER_IS_BETTER):
+            metrics[path] = value
+    return metrics
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline', help='results JSON of the reference run')
+    parser.add_argument('candidate', help='results JSON of the run being checked')
+    parser.add_argument('--threshold', type=float, default=0.10, help='relative slowdown flagged as a regression')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"baseline {baseline.get('commit')}  candidate {candidate.get('commit')}")
+    old, new = flatten(baseline), flatten(candidate)
+    regressions = 0
+    for path in sorted(old.keys() & new.keys()):
+        if not old[path]:
+            continue
+        change = (new[path] - old[path]) / old[path]
+        worse = change > args.threshold if path.endswith(LOWER_IS_BETTER) else change < -args.threshold
+        regressions += worse
+        flag = '  REGRESSION' if worse else ''
+        print(f'{path:70} {old[path]:>12} {new[path]:>12} {change:+8.1%}{flag}')
+
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Compare stored bytes per event and encode/decode time of the event codecs.
+
+Events are taken from sample_analytics_data.json and from the sample data
+generator, wrapped in full stored records (event ID, timestamp, user and
+session). No Redis server is needed.
+
+Usage (from the repository root):
+    python -m benchmarks.event_codec
+    python -m benchmarks.event_codec --events 20000 --repeat 5 --output results.json
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+os.environ.setdefault('LOG_DIR', os.path.join(tempfile.gettempdir(), 'analytics-bench-logs'))
+
+from benchmarks.common import run_metadata, write_results
+
+SAMPLE_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample_analytics_data.json')
+
+def build_events(count: int, seed: int):
+    """Full event records: the sample file's events followed by generated ones"""
+    from app.utils import _generate_event_properties
+    from app.event_store import new_event_id
+
+    rng = random.Random(seed)
+    random.seed(seed)
+    now = datetime.utcnow()
+    pages = ['/dashboard', '/pricing', '/features', '/about', '/contact', '/login', '/signup']
+    event_types = [
+        'page_view', 'button_click', 'form_submit', 'feature_used',
+        'user_registered', 'purchase_completed', 'session_start', 'logout'
+    ]
+
+    with open(SAMPLE_DATA) as f:
+        templates = [(e['event_type'], e['user_id'], e['session_id'], e['properties']) for e in json.load(f)['events']]
+
+    events = []
+    for i in range(count):
+        if i < len(templates):
+            event_type, user_id, session_id, properties = templates[i]
+        else:
+            event_type = rng.choice(event_types)
+            user_id = f'user_{rng.randint(1, 500):05d}'
+            session_id = f'sess_{rng.getrandbits(32):08x}'
+            properties = _generate_event_properties(event_type, pages)
+        event_time = now - timedelta(seconds=rng.randint(0, 86400))
+        events.append({
+            'event_id': new_event_id(event_time),
+            'event_type': event_type,
+            'user_id': user_id,
+            'session_id': session_id,
+            'timestamp': event_time.isoformat(),
+            'properties': properties
+        })
+    return events
+
+def measure(codec, events, repeat: int):
+    """Best-of-repeat encode and decode time per event, plus encoded size"""
+    encoded = [codec.encode(event) for event in events]
+    for original, data in zip(events, encoded):
+        assert codec.decode(data) == json.loads(json.dumps(original)), 'codec round trip mismatch'
+
+    encode_times, decode_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for event in events:
+            codec.encode(event)
+        encode_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for data in encoded:
+            codec.decode(data)
+        decode_times.append(time.perf_counter() - start)
+
+    total_bytes = sum(len(data) for data in encoded)
+    return {
+        'bytes_per_event': round(total_bytes / len(events), 1),
+        'encode_us_per_event': round(min(encode_times) / len(events) * 1e6, 2),
+        'decode_us_per_event': round(min(decode_times) / len(events) * 1e6, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=5000, help='number of events to encode')
+    parser.add_argument('--repeat', type=int, default=3, help='timing repetitions (best is reported)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for generated events')
+    parser.add_argument('--output', help='write the JSON results to this file as well as stdout')
+    args = parser.parse_args()
+
+    from app.event_codec import json_codec, BINARY_CODECS
+
+    events = build_events(args.events, args.seed)
+    results = run_metadata('event_codec', fake=True)
+    del results['redis']
+    results['events'] = len(events)
+    results['json'] = measure(json_codec, events, args.repeat)
+    for version, codec in BINARY_CODECS.items():
+        results[f'binary_v{version}'] = measure(codec, events, args.repeat)
+        results[f'binary_v{version}']['size_vs_json'] = round(
+            results[f'binary_v{version}']['bytes_per_event'] / results['json']['bytes_per_event'], 3
+        )
+    write_results(results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+HTTP load generator replaying sample_analytics_data.json against the API.
+
+Requests are issued open-loop at a fixed target rate: request i is due at
+start + i / rate, whether or not earlier requests have finished. Latency is
+measured from that due time, so a slow server shows up as queueing delay
+instead of silently lowering the offered load; service time (from the moment
+the request was actually sent) is reported alongside. A --read-ratio share
+of requests read the dashboard instead of posting an event.
+
+By default the Flask app runs in-process (pair with --fake for a self-contained
+run); pass --url to load a running server instead. A throwaway API key with a
+high rate limit is created through the admin API and revoked afterwards, so
+the run exercises the normal authentication path without hitting 429s.
+
+Usage (from the repository root):
+    python -m benchmarks.http_load --fake
+    python -m benchmarks.http_load --url http://localhost:5000 --rate 200 --duration 30 --concurrency 32
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import itertools
+import threading
+from collections import Counter, defaultdict
+
+os.environ.setdefault('LOG_DIR', os.path.join(tempfile.gettempdir(), 'analytics-bench-logs'))
+
+from benchmarks.common import add_redis_arguments, use_fake_redis, latency_summary, run_metadata, write_results
+
+SAMPLE_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample_analytics_data.json')
+
+class InProcessTransport:
+    """Sends requests to the Flask app through one test client per thread"""
+
+    def __init__(self):
+        from app import create_app
+        self._app = create_app()
+        self._local = threading.local()
+
+    def request(self, method, path, headers, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        response = client.open(path, method=method, headers=headers, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+class HTTPTransport:
+    """Sends requests to a running server through one keep-alive session per thread"""
+
+    def __init__(self, base_url: str):
+        import requests
+        self._requests = requests
+        self._base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method, path, headers, body=None):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        response = session.request(method, self._base_url + path, headers=headers, json=body, timeout=30)
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        return response.status_code, payload
+
+def build_plan(count: int, read_ratio: float, seed: int):
+    """The request sequence: sample events replayed in order, interleaved with dashboard reads"""
+    with open(SAMPLE_DATA) as f:
+        events = json.load(f)['events']
+    rng = random.Random(seed)
+    replay = itertools.cycle(events)
+    plan = []
+    for _ in range(count):
+        if rng.random() < read_ratio:
+            plan.append(('GET', '/analytics/', None))
+        else:
+            event = next(replay)
+            plan.append(('POST', '/events/', {
+                'event_type': event['event_type'],
+                'user_id': event['user_id'],
+                'session_id': event['session_id'],
+                'properties': event['properties']
+            }))
+    return plan
+
+def run_load(transport, headers, plan, rate: float, concurrency: int):
+    """Issue the plan at the target rate; returns (samples, errors, elapsed seconds)"""
+    samples = []
+    errors = Counter()
+    next_index = itertools.count()
+    start = time.perf_counter() + 0.05
+
+    def worker():
+        while True:
+            index = next(next_index)
+            if index >= len(plan):
+                return
+            method, path, body = plan[index]
+            due = start + index / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            sent = time.perf_counter()
+            try:
+                status, _ = transport.request(method, path, headers, body)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+                continue
+            done = time.perf_counter()
+            samples.append((f'{method} {path}', status, done - due, done - sent, done))
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    elapsed = (max(sample[4] for sample in samples) - start) if samples else 0.0
+    return samples, errors, elapsed
+
+def create_load_key(transport, admin_key: str):
+    """Create an API key with read/write access and an effectively unlimited rate limit"""
+    status, payload = transport.request('POST', '/admin/api-keys', {'X-API-Key': admin_key}, {
+        'name': 'http-load-benchmark',
+        'permissions': ['read', 'write'],
+        'rate_limit': 10 ** 9
+    })
+    if status != 201:
+        raise SystemExit(f'Could not create a benchmark API key ({status}): {payload}')
+    return payload['api_key'], payload['key_info']['key_id']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_redis_arguments(parser)
+    parser.add_argument('--url', help='base URL of a running server (default: in-process app)')
+    parser.add_argument('--rate', type=float, default=100, help='target requests per second')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load at the target rate')
+    parser.add_argument('--concurrency', type=int, default=16, help='maximum requests in flight')
+    parser.add_argument('--read-ratio', type=float, default=0.1, help='share of requests that read /analytics/')
+    parser.add_argument('--warmup', type=int, default=50, help='untimed requests sent first')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for the request mix')
+    parser.add_argument('--admin-key', default=os.getenv('ANALYTICS_ADMIN_KEY', 'dev-key-analytics-2024'))
+    args = parser.parse_args()
+
+    if args.url and args.fake:
+        parser.error('--fake only applies to the in-process app')
+    if args.fake:
+        use_fake_redis(parser)
+    transport = HTTPTransport(args.url) if args.url else InProcessTransport()
+
+    api_key, key_id = create_load_key(transport, args.admin_key)
+    headers = {'X-API-Key': api_key}
+    try:
+        if args.warmup:
+            run_load(transport, headers, build_plan(args.warmup, args.read_ratio, args.seed + 1), args.rate, args.concurrency)
+        plan = build_plan(int(args.rate * args.duration), args.read_ratio, args.seed)
+        samples, errors, elapsed = run_load(transport, headers, plan, args.rate, args.concurrency)
+    finally:
+        transport.request('DELETE', f'/admin/api-keys/{key_id}', {'X-API-Key': args.admin_key})
+
+    by_endpoint = defaultdict(list)
+    for endpoint, _, latency, _, _ in samples:
+        by_endpoint[endpoint].append(latency)
+
+    results = {
+        **run_metadata('http_load', args.fake),
+        'target': args.url or 'in-process',
+        'target_rps': args.rate,
+        'concurrency': args.concurrency,
+        'requests': len(plan),
+        'completed': len(samples),
+        'errors': dict(errors),
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        'status_counts': dict(Counter(str(sample[1]) for sample in samples)),
+        'latency': latency_summary([sample[2] for sample in samples]),
+        'service_time': latency_summary([sample[3] for sample in samples]),
+        'endpoints': {endpoint: latency_summary(latencies) for endpoint, latencies in sorted(by_endpoint.items())},
+    }
+    write_results(results, args.output)
+
+if __name__ == '__main__':
+    main()
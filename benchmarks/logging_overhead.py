@@ -0,0 +1,111 @@
+"""
+Measure the logging cost paid by the request thread per ingested event.
+
+Each simulated request emits what POST /events/ logs: the per-event "stored"
+INFO line from app.utils and the access log record from log_request_info.
+The same workload runs against three pipelines built by setup_logging:
+
+    synchronous   handlers write to stdout and the rotating files in the
+                  request thread (LOG_ASYNC=false, the previous behaviour)
+    queued        records are handed to the listener thread (LOG_ASYNC=true)
+    queued+sample queued, with per-message rate sampling (LOG_SAMPLE_PER_SECOND)
+
+Console output goes to /dev/null and log files to a temporary LOG_DIR. The
+time the listener needs afterwards to drain its queue is reported separately,
+since it is spent off the request thread, as are records dropped while the
+queue was full (the workload runs faster than the handlers can write). No
+Redis server is needed.
+
+Usage (from the repository root):
+    python -m benchmarks.logging_overhead
+    python -m benchmarks.logging_overhead --requests 50000 --output results/logging.json
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+
+os.environ.setdefault('LOG_DIR', os.path.join(tempfile.gettempdir(), 'analytics-bench-logs'))
+
+from benchmarks.common import latency_summary, run_metadata, write_results
+
+MODES = {
+    'synchronous': {'LOG_ASYNC': False, 'LOG_SAMPLE_PER_SECOND': 0},
+    'queued': {'LOG_ASYNC': True, 'LOG_SAMPLE_PER_SECOND': 0},
+    'queued_sampled': {'LOG_ASYNC': True, 'LOG_SAMPLE_PER_SECOND': 20},
+}
+
+def count_lines(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'rb') as f:
+        return sum(1 for _ in f)
+
+def run_mode(settings: dict, requests: int, flask_app) -> dict:
+    """Emit one request's log records `requests` times under the given pipeline settings"""
+    from app import logging_config
+
+    log_dir = tempfile.mkdtemp(prefix='analytics-bench-logs-')
+    os.environ['LOG_DIR'] = log_dir
+    for name, value in settings.items():
+        setattr(logging_config, name, value)
+
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        logging_config.setup_logging()
+        utils_logger = logging.getLogger('app.utils')
+        samples = []
+        with flask_app.test_request_context('/events/', method='POST', headers={'User-Agent': 'bench'}):
+            from flask import request
+            request.api_key_info = {'name': 'Benchmark Key'}
+            for i in range(requests):
+                start = time.perf_counter()
+                utils_logger.info("Event %s stored successfully for user %s", f'evt_{i:08d}', f'user_{i % 500:05d}')
+                logging_config.log_request_info(request, 201, 1.25)
+                samples.append(time.perf_counter() - start)
+
+        queue_handler = logging_config._log_queue_handler if settings['LOG_ASYNC'] else None
+        dropped = queue_handler.dropped if queue_handler is not None else 0
+        start = time.perf_counter()
+        logging_config.stop_log_listener()
+        drain_seconds = time.perf_counter() - start
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    return {
+        'per_request': latency_summary(samples),
+        'requests_per_sec': round(len(samples) / sum(samples), 1),
+        'listener_drain_ms': round(drain_seconds * 1000, 3),
+        'records_dropped': dropped,
+        'app_log_lines': count_lines(os.path.join(log_dir, 'analytics_app.log')),
+        'access_log_lines': count_lines(os.path.join(log_dir, 'access.log')),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000, help='simulated requests per pipeline')
+    parser.add_argument('--output', help='write the JSON results to this file as well as stdout')
+    args = parser.parse_args()
+
+    from flask import Flask
+    from app import logging_config
+
+    flask_app = Flask(__name__)
+    defaults = {name: getattr(logging_config, name) for name in ('LOG_ASYNC', 'LOG_SAMPLE_PER_SECOND')}
+    results = run_metadata('logging_overhead', fake=True)
+    del results['redis']
+    results['requests'] = args.requests
+    try:
+        for mode, settings in MODES.items():
+            results[mode] = run_mode(settings, args.requests, flask_app)
+    finally:
+        for name, value in defaults.items():
+            setattr(logging_config, name, value)
+    write_results(results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Gunicorn configuration for the Analytics Platform API.
+
+    gunicorn -c gunicorn.conf.py run:app
+
+Each worker records metrics into mmap-backed files in PROMETHEUS_MULTIPROC_DIR
+(default /tmp/analytics-metrics) and /metrics merges them (see app/metrics.py).
+The variable is set here, before any worker imports the app, so per-worker
+counters are never served on their own.
+"""
+import os
+import shutil
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/analytics-metrics')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+
+def on_starting(server):
+    """Start from an empty metrics directory so counters from a previous run are not merged in"""
+    metrics_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    """Drop an exited worker's live gauges (pool connections) from /metrics"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)